@@ -1,15 +1,29 @@
 import os
-from write_utils import write_and_commit_file
+from write_utils import write_and_commit_file, file_lock
+from commit_batcher import flush_commits
 from github_utils import (
     push_file_to_repo,
     comment_on_issue,
     get_open_issues
 )
-from gpt_utils import (
-    call_ollama,
-    call_gpt_and_parse_json
-)
+from gpt_utils import call_ollama
 from readme_generator import generate_readme
+from project_state import get_state_store, load_project_state
+from json_schemas import CODE_FILE_SCHEMA
+from context_assembler import ContextAssembler, log_report
+from repo_index import get_repo_index, format_snippets
+from prompt_templates import get_agent_session, build_user_prompt
+from metrics import agent_entry
+
+# Stabiler Teil der Prompts – steht im System-Prompt und damit im wiederverwendbaren Präfix
+BACKEND_ROLE = "Du bist ein Flutter-Backend-Entwickler."
+CODE_FILE_FORMAT = """Gib den Code als JSON zurück:
+
+{
+  "file": "lib/services/my_service.dart",
+  "code": "<der vollständige Dart-Code>"
+}"""
+API_DOCS_FORMAT = "Erweitere die Markdown-API-Doku, wenn nötig. Gib die **neue api_docs.md** komplett zurück."
 
 def log(msg):
     print(f"🔧 [backend_agent] {msg}")
@@ -21,80 +35,74 @@ def load_api(local_path):
             return f.read()
     return ""
 
-def update_api_docs(issue, repo, local_path, readme_context, open_issues):
-    api_path = os.path.join(local_path, "docs", "api_docs.md")
-    current_api = load_api(local_path)
+def load_readme(local_path):
+    readme_path = os.path.join(local_path, "README.md")
+    if os.path.exists(readme_path):
+        with open(readme_path, "r", encoding="utf-8") as f:
+            return f.read()
+    return ""
 
+def assemble_context(issue, readme, api, open_issues_str, local_path, api_required=False):
+    query = f"{issue['title']}\n{issue.get('body', '')}"
+    snippets = get_repo_index(local_path).query(query, k=6)
+    assembler = ContextAssembler(query)
+    assembler.add("api", api, required=api_required)
+    assembler.add("readme", readme)
+    assembler.add("code", format_snippets(snippets))
+    assembler.add("issues", open_issues_str, split="lines")
+    texts, report = assembler.assemble()
+    log_report(report, "backend_agent")
+    return texts
+
+def update_api_docs(issue, repo, local_path, readme_context, open_issues):
     title = issue["title"]
     description = issue.get("body", "")
 
-    prompt = f"""
-Du bist ein Flutter-Backend-Entwickler. Hier ist die Projektübersicht:
-
-{readme_context}
-
-Derzeitige API-Dokumentation:
-{current_api}
-
-Offene Issues:
-{open_issues}
-
-Neue Backend-Funktion:
-Titel: {title}
-Beschreibung:
-\"\"\"
-{description}
-\"\"\"
-
-Erweitere die Markdown-API-Doku, wenn nötig. Gib die **neue api_docs.md** komplett zurück.
-"""
-    new_md = call_ollama(prompt)
-    write_and_commit_file(repo, local_path, "docs/api_docs.md", new_md, "📄 API-Dokumentation aktualisiert")
-
+    # Lesen, Generieren und Schreiben unter einer Sperre – sonst gewinnt bei parallelen
+    # Backend-Schritten der letzte Schreiber und die Doku des anderen Issues geht verloren
+    with file_lock(local_path, "docs/api_docs.md"):
+        # Die API-Doku wird komplett neu geschrieben und darf daher nicht gekürzt werden
+        context = assemble_context(issue, readme_context, load_api(local_path), open_issues, local_path, api_required=True)
+        readme_context = context["readme"]
+        current_api = context["api"]
+        open_issues = context["issues"]
+
+        new_md = get_agent_session("backend_agent", BACKEND_ROLE, API_DOCS_FORMAT, task="docs").ask([
+            ("Projektübersicht", readme_context),
+            ("Derzeitige API-Dokumentation", current_api),
+            ("Offene Issues", open_issues),
+            ("Neue Backend-Funktion", f"Titel: {title}\nBeschreibung:\n\"\"\"\n{description}\n\"\"\""),
+        ])
+        write_and_commit_file(repo, local_path, "docs/api_docs.md", new_md, "📄 API-Dokumentation aktualisiert")
+
+@agent_entry("backend_agent")
 def run_backend_agent_for_issue(issue, repo, local_path):
     number = issue["issue_number"]
     title = issue["title"]
     description = issue.get("body", "")
 
     # Lade Kontext
-    readme_path = os.path.join(local_path, "README.md")
-    readme_context = ""
-    if os.path.exists(readme_path):
-        with open(readme_path, "r", encoding="utf-8") as f:
-            readme_context = f.read()
-
+    readme_full = load_readme(local_path)
     open_issues = get_open_issues(repo)
     open_issues_str = "\n".join(f"- {i['title']}" for i in open_issues)
+    context = assemble_context(issue, readme_full, load_api(local_path), open_issues_str, local_path)
+    readme_context = context["readme"]
 
     log(f"🧠 Starte Backend-Code für Issue #{number}: {title}")
 
-    prompt = f"""
-Du bist ein Flutter-Backend-Entwickler. Hier ist die Projektübersicht:
-
-{readme_context}
-
-Aktuelle API-Dokumentation:
-{load_api(local_path)}
-
-Derzeitige offene Issues:
-{open_issues_str}
-
-Bearbeite diese Aufgabe:
-Titel: {title}
-Beschreibung:
-\"\"\"
-{description}
-\"\"\"
-
-Gib den Code als JSON zurück:
-
-{{
-  "file": "lib/services/my_service.dart",
-  "code": "<der vollständige Dart-Code>"
-}}
-"""
+    session = get_agent_session("backend_agent", BACKEND_ROLE, CODE_FILE_FORMAT, task="code")
+    sections = [
+        ("Projektübersicht", readme_context),
+        ("Aktuelle API-Dokumentation", context["api"]),
+        ("Relevanter bestehender Code aus dem Repository", context["code"]),
+        ("Derzeitige offene Issues", context["issues"]),
+        ("Bearbeite diese Aufgabe", f"Titel: {title}\nBeschreibung:\n\"\"\"\n{description}\n\"\"\""),
+    ]
 
-    response = call_gpt_and_parse_json("backend_agent", prompt)
+    try:
+        response = session.ask_json(sections, schema=CODE_FILE_SCHEMA)
+    except ValueError as e:
+        response = str(e)
 
     # Fehlerbehandlung
     if not isinstance(response, dict) or "file" not in response or "code" not in response:
@@ -104,10 +112,10 @@ Ich habe vom GPT folgendes Response bekommen, das kein valides JSON war:
 {response}
 
 Prompt war:
-{prompt}
+{build_user_prompt(sections)}
 
 Wie würdest du dieses Issue auf GitHub kommentieren?
-""")
+""", agent_name="backend_agent", task="comment")
         comment_on_issue(repo, number, comment)
         return None
 
@@ -116,13 +124,15 @@ Wie würdest du dieses Issue auf GitHub kommentieren?
 
     write_and_commit_file(repo, local_path, filepath, code, f"💻 Backend-Code für Issue #{number}")
     log(f"✅ Datei geschrieben: {filepath}")
+    get_state_store().record_file(filepath, number, "backend", repo)
 
     # Aktualisiere API-Doku
-    update_api_docs(issue, repo, local_path, readme_context, open_issues_str)
+    update_api_docs(issue, repo, local_path, readme_full, open_issues_str)
 
     # README aktualisieren
-    from project_state import load_project_state  # Falls getrennt
     generate_readme(load_project_state(), local_path, repo)
 
+    # Code, API-Doku und README als ein Commit
+    flush_commits(repo)
     return filepath
 
@@ -2,37 +2,23 @@
 import os
 import json
 import re
-import requests
 from dotenv import load_dotenv
-from gpt_logger import log_gpt_interaction
+from gpt_utils import call_ollama
+from metrics import agent_entry
+from github_utils import create_github_issue
 
 
 load_dotenv()
 
-OLLAMA_URL = os.getenv("OPENAI_API_BASE", "http://localhost:11434")
-OLLAMA_MODEL = os.getenv("OPENAI_MODEL", "deepseek-coder:6.7b")
 GITHUB_USERNAME = os.getenv("GITHUB_USERNAME")
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-HEADERS = {
-    "Authorization": f"token " + GITHUB_TOKEN,
-    "Accept": "application/vnd.github+json"
-}
 
 def log(msg):
     print(f"🎨 [design_agent] {msg}")
 
 def ollama_chat(prompt):
     log("🤖 Anfrage an GPT wird gestellt...")
-    response = requests.post(
-        f"{OLLAMA_URL}/api/generate",
-        json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}
-    )
-    if response.ok:
-        answer = response.json().get("response", "").strip()
-        log_gpt_interaction("🎨 [design_agent]", prompt, answer)
-        return response.json().get("response", "").strip()
-    else:
-        raise Exception(f"Ollama-Fehler: {response.status_code} - {response.text}")
+    answer = call_ollama(prompt, agent_name="design_agent", task="design")
+    return answer
 
 def extract_json_from_text(text):
     try:
@@ -48,10 +34,10 @@ def extract_json_from_text(text):
     return None
 
 def create_design_issue(repo, title, body, labels=["design", "frontend", "open"]):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/issues"
-    data = {"title": title, "body": body, "labels": labels}
-    requests.post(url, headers=HEADERS, json=data)
+    # Über github_utils, damit das Issue auch gleich im Issue-Index steht
+    create_github_issue(repo, title, body, labels)
 
+@agent_entry("design_agent")
 def run_design_agent(repo_name, feature_title, feature_description):
     log(f"🧠 Starte Design-Agent für: {feature_title}")
     prompt = f"""
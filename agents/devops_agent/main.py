@@ -1,26 +1,22 @@
 import os
-import requests
 import re
 
 from dotenv import load_dotenv
+from github_utils import github_request
+from metrics import agent_entry
 
 load_dotenv()
 
 GITHUB_USERNAME = os.getenv("GITHUB_USERNAME")
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 PROJECT_ID = "HA_Offizier"
 REPO_NAME = PROJECT_ID
-HEADERS = {
-    "Authorization": f"token {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github+json"
-}
 
 ARTIFACTS_DIR = os.path.join(os.path.dirname(__file__), "artifacts")
 ARTIFACTS = ["app-release.apk", "web.zip"]
 
 def get_next_version(repo):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/releases"
-    r = requests.get(url, headers=HEADERS)
+    url = f"repos/{GITHUB_USERNAME}/{repo}/releases"
+    r = github_request("get_next_version", "GET", url)
     if r.status_code != 200:
         print(f"⚠️ Fehler beim Abrufen der Releases: {r.status_code}")
         return "v1.0.0"
@@ -44,12 +40,12 @@ def get_next_version(repo):
 
 
 def get_latest_commit_sha(repo):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/commits/main"
-    r = requests.get(url, headers=HEADERS)
+    url = f"repos/{GITHUB_USERNAME}/{repo}/commits/main"
+    r = github_request("get_latest_commit_sha", "GET", url)
     return r.json()["sha"] if r.status_code == 200 else None
 
 def create_release(repo, tag_name, release_name, body="Automatisch erstellt"):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/releases"
+    url = f"repos/{GITHUB_USERNAME}/{repo}/releases"
     data = {
         "tag_name": tag_name,
         "target_commitish": "main",
@@ -58,7 +54,7 @@ def create_release(repo, tag_name, release_name, body="Automatisch erstellt"):
         "draft": False,
         "prerelease": False
     }
-    r = requests.post(url, json=data, headers=HEADERS)
+    r = github_request("create_release", "POST", url, json=data)
     if r.status_code == 201:
         print(f"🚀 Release {tag_name} erstellt.")
         return r.json()["upload_url"].split("{")[0]  # Nur den Upload-Teil
@@ -68,36 +64,42 @@ def create_release(repo, tag_name, release_name, body="Automatisch erstellt"):
 
 def upload_asset(upload_url, filepath):
     filename = os.path.basename(filepath)
-    headers = HEADERS.copy()
-    headers["Content-Type"] = "application/octet-stream"
+    headers = {"Content-Type": "application/octet-stream"}
 
     with open(filepath, "rb") as f:
         data = f.read()
 
     params = {"name": filename}
     url = f"{upload_url}?name={filename}"
-    r = requests.post(url, headers=headers, data=data)
+    r = github_request("upload_asset", "POST", url, headers=headers, data=data, timeout=300)
 
     if r.status_code == 201:
         print(f"📦 Datei '{filename}' erfolgreich hochgeladen.")
     else:
         print(f"❌ Fehler beim Hochladen von '{filename}': {r.status_code} – {r.text}")
 
-if __name__ == "__main__":
+@agent_entry("devops_agent")
+def run_devops_agent(repo, project_id=None):
+    """
+    Erstellt ein Release für den neuesten Commit und lädt vorhandene Artefakte hoch.
+    :return: Upload-URL des Releases oder None
+    """
     print("🔧 DevOps-Agent mit Anhang-Upload gestartet...")
-    sha = get_latest_commit_sha(REPO_NAME)
-
-    if sha:
-        version = get_next_version(REPO_NAME)
-        upload_url = create_release(REPO_NAME, version, f"{PROJECT_ID} – Erstveröffentlichung")
-
-        if upload_url:
-            for artifact in ARTIFACTS:
-                path = os.path.join(ARTIFACTS_DIR, artifact)
-                if os.path.isfile(path):
-                    upload_asset(upload_url, path)
-                else:
-                    print(f"⚠️ Datei fehlt: {artifact}")
-    else:
+    sha = get_latest_commit_sha(repo)
+    if not sha:
         print("⚠️ Kein Commit gefunden.")
+        return None
 
+    version = get_next_version(repo)
+    upload_url = create_release(repo, version, f"{project_id or repo} – Erstveröffentlichung")
+    if upload_url:
+        for artifact in ARTIFACTS:
+            path = os.path.join(ARTIFACTS_DIR, artifact)
+            if os.path.isfile(path):
+                upload_asset(upload_url, path)
+            else:
+                print(f"⚠️ Datei fehlt: {artifact}")
+    return upload_url
+
+if __name__ == "__main__":
+    run_devops_agent(REPO_NAME, PROJECT_ID)
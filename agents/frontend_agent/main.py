@@ -1,20 +1,35 @@
 
 import os
 from write_utils import write_and_commit_file
+from commit_batcher import flush_commits
 from github_utils import (
     push_file_to_repo,
-    comment_on_issue
+    comment_on_issue,
     get_open_issues
 )
-from gpt_utils import (
-    call_ollama    
-    call_gpt_and_parse_json
-)
+from gpt_utils import call_ollama
 from readme_generator import generate_readme
+from project_state import get_state_store, load_project_state
+from json_schemas import CODE_FILE_SCHEMA
+from context_assembler import ContextAssembler, log_report
+from repo_index import get_repo_index, format_snippets
+from prompt_templates import get_agent_session, build_user_prompt
+from metrics import agent_entry
+
+FRONTEND_ROLE = "Du bist ein Flutter-Frontend-Entwickler."
+CODE_FILE_FORMAT = """Gib den Code innerhalb eines JSON-Objekt mit folgenden Feldern zurück:
+
+{
+  "file": "lib/screens/login_screen.dart",
+  "code": "..."
+}
+
+Der filepfad soll sinnvoll zur Funktion passen (z. B. lib/screens/, lib/widgets/, lib/services/)."""
 
 def log(msg):
     print(f"🎨 [frontend_agent] {msg}")
 
+@agent_entry("frontend_agent")
 def run_frontend_agent_for_issue(issue, repo, local_path):
     number = issue["issue_number"]
     title = issue["title"]
@@ -30,48 +45,44 @@ def run_frontend_agent_for_issue(issue, repo, local_path):
         with open(readme_path, "r", encoding="utf-8") as f:
             readme_context = f.read()
 
+    # Kontext auf das Tokenbudget zuschneiden – nur die für das Issue relevanten Teile
+    open_issues_str = "\n".join(f"- #{i['issue_number']} {i['title']} {i['labels']}" for i in open_issues)
+    query = f"{title}\n{description}"
+    snippets = get_repo_index(local_path).query(query, k=6)
+    assembler = ContextAssembler(query)
+    assembler.add("readme", readme_context)
+    assembler.add("code", format_snippets(snippets))
+    assembler.add("issues", open_issues_str, split="lines")
+    context, report = assembler.assemble()
+    log_report(report, "frontend_agent")
+
     log(f"🧠 Starte Frontend-Code Generation für Issue #{number}: {title}")
     
-    prompt = f"""
-Du bist ein Flutter-Frontend-Entwickler. Hier ist eine Projektübersicht:
-
-{readme_context}
-
-derzeit sind folgende Issues offen
-{open_issues}
-
-Bearbeite diese Aufgabe:
-Titel: {title}
-Beschreibung:
-""" 
-{description}
-"""
-
-Implementiere das Feature.
-Gib den Code innerhalb eines JSON-Objekt mit folgenden Feldern zurück:
-
-{{
-  "file": "lib/screens/login_screen.dart",
-  "code": "..."
-}}
-
-Der filepfad soll sinnvoll zur Funktion passen (z. B. lib/screens/, lib/widgets/, lib/services/).
-"""
-    response = call_gpt_and_parse_json("frontend_agent", prompt)
+    session = get_agent_session("frontend_agent", FRONTEND_ROLE, CODE_FILE_FORMAT, task="code")
+    sections = [
+        ("Projektübersicht", context["readme"]),
+        ("Relevanter bestehender Code aus dem Repository", context["code"]),
+        ("Derzeit offene Issues", context["issues"]),
+        ("Bearbeite diese Aufgabe", f"Titel: {title}\nBeschreibung:\n\"\"\"\n{description}\n\"\"\"\n\nImplementiere das Feature."),
+    ]
+    try:
+        response = session.ask_json(sections, schema=CODE_FILE_SCHEMA)
+    except ValueError as e:
+        response = {"error": str(e)}
 
-    filepath=response["file"]
-    code = response["code"]
+    filepath = response.get("file")
+    code = response.get("code")
 
     if not filepath or not code:
-        code = extract_dart_code(response)
-        if not code
-            comment = call_ollama( "ich habe folgenden Respone bekommen {response} zu folgendem prompt {prompt} Wie würdest du den issue kommentieren um beim nächsten mal sinnvollen code erstellt zu bekommen")
-            comment_on_issue(repo, number, comment)
+        comment = call_ollama(f"ich habe folgenden Respone bekommen {response} zu folgendem prompt {build_user_prompt(sections)} Wie würdest du den issue kommentieren um beim nächsten mal sinnvollen code erstellt zu bekommen", agent_name="frontend_agent", task="comment")
+        comment_on_issue(repo, number, comment)
         return None
 
     write_and_commit_file(repo, local_path, filepath, code, f"💻 Frontend-Code für Issue #{number}")
     log(f"✅ Datei geschrieben: {filepath}")
+    get_state_store().record_file(filepath, number, "frontend", repo)
 
     # README aktualisieren
     generate_readme(load_project_state(), local_path, repo)
+    flush_commits(repo)
     return filepath
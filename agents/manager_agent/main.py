@@ -3,41 +3,43 @@ import os
 import json
 import time
 from dotenv import load_dotenv
-from gpt_utils import call_gpt_and_parse_json
+from gpt_utils import call_gpt_and_parse_json, call_ollama, get_timing_report, LLMCallAbandoned
+from retry_policy import get_retry_policy
+from llm_cache import get_llm_cache
+from metrics import agent_entry, timed, write_run_report
+from tracing import span, write_trace
+from json_schemas import FEATURE_LIST_SCHEMA, PLAN_SCHEMA, AGENT_NAMES
+from scheduler import DagScheduler, add_issue_steps
+from rule_planner import PLANNER_FAST_PATH, plan_by_rules, finished_issues
+from task_queue import get_task_queue
+from project_state import get_state_store, load_project_state, save_project_state, export_project_state
 
 from github_utils import (
     create_or_update_repo,
-    create_github_issue,
+    bulk_create_issues,
     get_open_issues,
-    update_issue_labels,
-    push_file_to_repo
+    get_issue,
 )
+from commit_batcher import stage_file, commit_step, push_commits
+from event_queue import get_event_queue
 from readme_generator import generate_readme
 
 load_dotenv()
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
-PROJECT_STATE_FILE = "project_state.json"
+# Mit Webhooks wartet jede weitere Runde auf Ereignisse statt die Issues erneut abzufragen
+WEBHOOK_ENABLED = os.getenv("WEBHOOK_ENABLED", "0") == "1"
+WEBHOOK_WAIT = float(os.getenv("WEBHOOK_WAIT", "300"))  # danach Rückfall auf Polling
 
 
 def log(msg):
     print(f"🧠 [manager_agent] {msg}")
 
-def push_template_file(repo, rel_path, target_path):
+def push_template_file(repo, rel_path, target_path, local_path=None):
     full_path = os.path.join(TEMPLATE_DIR, rel_path)
     log(f"📋 Übertrage Template: {rel_path} → {target_path}")
     with open(full_path, "r") as f:
         content = f.read()
-    push_file_to_repo(repo, target_path, content, f"Add {target_path}")
-
-def load_project_state():
-    if os.path.exists(PROJECT_STATE_FILE):
-        with open(PROJECT_STATE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {"features": [], "description": ""}
-
-def save_project_state(state):
-    with open(PROJECT_STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+    stage_file(repo, target_path, content, f"Add {target_path}", local_path)
 
 def generate_feature_list(description):
     log("📃 Featureliste wird generiert...")
@@ -58,17 +60,36 @@ Format:
   ...
 ]
 """
-    return call_gpt_and_parse_json("manager_agent", prompt)
+    return call_gpt_and_parse_json("manager_agent", prompt, schema=FEATURE_LIST_SCHEMA, task="plan")
 
-def generate_feature_tasks(feature_title, feature_description):
+def generate_feature_tasks(feature_title, feature_description, repo=None):
     log(f"🧩 Erzeuge Tasks für Feature: {feature_title}")
     from agents.planner_agent.main import generate_feature_tasks
-    return generate_feature_tasks(feature_title, feature_description)
+    return generate_feature_tasks(feature_title, feature_description, repo)
+
+def plan_next_actions(issues, repo):
+    """
+    Nächste Schritte: eindeutig gelabelte Issues über den Regelweg (rule_planner), nur der Rest
+    – ohne oder mit widersprüchlichen Labels – über das LLM. Jeder Schritt trägt in "source",
+    welcher Weg ihn geplant hat.
+    """
+    steps = []
+    if PLANNER_FAST_PATH:
+        with timed("plan.rules"):
+            steps, issues = plan_by_rules(issues, repo)
+        log(f"📏 Regelweg: {len(steps)} Schritt(e) ohne LLM, {len(issues)} Issue(s) für das LLM")
+        for issue in issues:
+            log(f"   ↗️ #{issue['issue_number']} {issue['title']}: {issue['escalation']}")
+    else:
+        # Auch ohne Regelweg: bereits erledigte Issues nicht erneut vorlegen (siehe rule_planner)
+        finished = finished_issues(repo)
+        issues = [i for i in issues if i["issue_number"] not in finished or i.get("new_comment")]
+    if not issues:
+        return steps
 
-def plan_next_actions(issues):
     log("🧠 GPT plant die nächsten Schritte...")
-    prompt_base = f"""
-Du bist ein KI-Projektleiter. Entscheide anhand dieser offenen Aufgaben (Titel, Labels, Priorität), welche als Nächstes bearbeitet werden sollen. Gib die nächsten 3–5 Schritte zurück:
+    prompt = f"""
+Du bist ein KI-Projektleiter. Entscheide anhand dieser offenen Aufgaben (Titel, Labels, Priorität, ggf. neuer Kommentar, ggf. warum die Labels nicht eindeutig sind), welche als Nächstes bearbeitet werden sollen. Gib die nächsten 3–5 Schritte zurück:
 
 {json.dumps(issues, indent=2)}
 
@@ -80,46 +101,180 @@ Format:
   }}
 ]
 """
-    prompt = prompt_base
-
-    for attempt in range(3):
-        result = call_gpt_and_parse_json("manager_agent", prompt)
-
-        if isinstance(result, list) and all("agent" in r and "issue_number" in r for r in result):
-            return result
-
-        log(f"⚠️ Versuch {attempt+1}/3 fehlgeschlagen – Anfrage wird neu gestellt.")
-
-        prompt = f"""
-Die vorherige Antwort war kein gültiges JSON im folgenden Format:
-
-[
-  {{
-    "agent": "frontend" | "backend" | "qa" | "devops",
-    "issue_number": int
-  }}
-]
-
-Hier sind die offenen Aufgaben:
-{json.dumps(issues, indent=2)}
-Bitte antworte **nur** mit einer gültigen JSON-Liste wie oben.
-"""
-
-    log("❌ GPT konnte keinen gültigen Plan liefern.")
-    return []
-
-
-def call_agent_by_name(agent, repo, local_path):
-    log(f"🤝 Übergabe an Agent: {agent}")
+    # Das Schema erzwingt das Format schon beim Dekodieren – eine eigene Wiederholungsschleife ist unnötig
     try:
-        module = __import__(f"agents.{agent}_agent.main", fromlist=["run"])
-        if agent == "qa":
-            module.run_qa_agent(repo, local_path)
-        else:
-            getattr(module, f"run_{agent}_agent")(repo)
+        plan = call_gpt_and_parse_json("manager_agent", prompt, schema=PLAN_SCHEMA, task="plan")
+    except ValueError:
+        log("❌ GPT konnte keinen gültigen Plan liefern.")
+        return steps
+    # Nur Issues, die dem LLM vorgelegt wurden – erfundene Nummern fallen weg
+    allowed = {i["issue_number"] for i in issues}
+    return steps + [dict(s, source="llm") for s in plan if s["issue_number"] in allowed]
+
+
+def wait_for_events(repo, local_path):
+    """
+    Offene Issues, die laut Webhook-Ereignissen neue Arbeit bedeuten (neu, umgelabelt oder
+    kommentiert). Ein fehlgeschlagener CI-Lauf startet direkt den QA-Agenten. Kommt innerhalb
+    von WEBHOOK_WAIT Sekunden nichts, werden wie bisher alle offenen Issues abgefragt.
+    """
+    work = get_event_queue().wait_for_work(repo, WEBHOOK_WAIT)
+    if not work:
+        log("⌛ Keine Ereignisse – Rückfall auf Abfrage der offenen Issues")
+        return get_open_issues(repo)
+
+    touched, comments = set(), {}
+    for item in work:
+        if item["type"] in ("issue", "comment"):
+            touched.add(item["issue_number"])
+        if item["type"] == "comment":
+            comments[item["issue_number"]] = f"{item['author']}: {item['body'][:500]}"
+        elif item["type"] == "ci" and item["conclusion"] == "failure":
+            log(f"🔴 CI-Lauf '{item['name']}' fehlgeschlagen: {item['url']}")
+            call_agent_by_name("qa", repo, local_path)
+        elif item["type"] == "push":
+            log(f"📌 Push auf {item['ref']} ({item['commits']} Commit(s))")
+
+    issues = [i for i in get_open_issues(repo) if i["issue_number"] in touched]
+    for issue in issues:
+        if issue["issue_number"] in comments:
+            issue["new_comment"] = comments[issue["issue_number"]]
+    log(f"📬 {len(work)} Ereignis(se) → {len(issues)} Issue(s) mit neuer Arbeit")
+    return issues
+
+def call_agent_by_name(agent, repo, local_path, issue_number=None):
+    """
+    Führt einen Agenten für ein Issue aus (QA ohne issue_number: alle offenen QA-Issues).
+    :return: True, wenn der Agent erfolgreich war
+    """
+    log(f"🤝 Übergabe an Agent: {agent}" + (f" (Issue #{issue_number})" if issue_number else ""))
+    # Eigener Commit-Batch pro Schritt; veröffentlicht wird am Ende des Blocks
+    with commit_step(f"{agent}:{issue_number or 'alle'}"):
+        return _call_agent(agent, repo, local_path, issue_number)
+
+def _call_agent(agent, repo, local_path, issue_number):
+    try:
+        with span("manager.call_agent", agent=agent, issue=issue_number):
+            module = __import__(f"agents.{agent}_agent.main", fromlist=["run"])
+            if agent == "qa":
+                ok = module.run_qa_agent(repo, local_path, [issue_number] if issue_number else None)
+            elif agent == "devops":
+                ok = module.run_devops_agent(repo) is not None
+            else:
+                issue = get_issue(repo, issue_number)
+                if issue is None:
+                    log(f"⚠️ Issue #{issue_number} nicht gefunden")
+                    return False
+                ok = getattr(module, f"run_{agent}_agent_for_issue")(issue, repo, local_path) is not None
+            if issue_number:
+                get_state_store().upsert_task(repo, issue_number, agent=agent, state="erledigt" if ok else "fehlgeschlagen")
+            return ok
     except Exception as e:
         log(f"❌ Fehler beim Agent '{agent}': {e}")
+        if issue_number:
+            get_state_store().upsert_task(repo, issue_number, agent=agent, state="fehlgeschlagen")
         suggest_fix_with_gpt(agent, str(e))
+        return False
+
+def agent_for_labels(labels):
+    """Der erste Agent, dessen Name als Label gesetzt ist (frontend, backend, qa, devops)."""
+    return next((label for label in labels if label in AGENT_NAMES), None)
+
+def plan_feature(feature, repo):
+    """
+    Aufgaben eines Features planen und als Issues anlegen.
+    :return: Schritte {"agent", "issue_number", "labels", "depends_on"} – landen als Ergebnis in
+             der Warteschlange, ein fortgesetzter Lauf plant das Feature daher nicht neu
+    """
+    title = feature["title"]
+    with span("manager.feature", feature=title):
+        log(f"🚀 Bearbeite Feature: {title}")
+        tasks = [t for t in generate_feature_tasks(title, feature["description"], repo) if "title" in t and "labels" in t]
+
+        open_issues = {i["title"]: i["issue_number"] for i in get_open_issues(repo)}
+        new_tasks = [t for t in tasks if t["title"] not in open_issues]
+        # Alle Aufgaben des Features mit einem Aufruf anlegen statt einem POST pro Issue
+        results = bulk_create_issues(repo, new_tasks)
+        numbers = dict(open_issues)
+        numbers.update({t["title"]: r["issue_number"] for t, r in zip(new_tasks, results) if r["ok"]})
+
+        steps = []
+        store = get_state_store()
+        for t in tasks:
+            agent = agent_for_labels(t["labels"])
+            if t["title"] not in numbers or agent is None:
+                continue  # ohne eindeutiges Agenten-Label entscheidet die nächste Planungsrunde
+            steps.append({
+                "agent": agent,
+                "issue_number": numbers[t["title"]],
+                "labels": t["labels"],
+                "depends_on": [numbers[d] for d in t.get("depends_on", []) if d in numbers],
+            })
+            store.upsert_task(repo, numbers[t["title"]], feature=title, title=t["title"], agent=agent, labels=t["labels"])
+        return steps
+
+def add_queued_steps(scheduler, steps, repo, local_path, group, after=(), prefix=""):
+    """
+    Hängt Issue-Schritte an den DAG und trägt sie in die dauerhafte Warteschlange ein. Was dort
+    schon erledigt ist, wird übersprungen; bereite Schritte können auch queue_worker.py-Prozesse
+    übernehmen – der Knoten wartet dann auf deren Ergebnis.
+    :param prefix: unterscheidet Folgerunden, die dasselbe Issue erneut bearbeiten
+    :return: IDs der angelegten Knoten
+    """
+    queue = get_task_queue()
+
+    def run_step(step):
+        return queue.run(
+            repo, prefix + step["node_id"], step["agent"],
+            lambda: call_agent_by_name(step["agent"], repo, local_path, step["issue_number"]),
+        )
+
+    node_ids = add_issue_steps(scheduler, steps, run_step, group, after)
+    for node_id in node_ids:
+        step = scheduler.nodes[node_id]["meta"]["step"]
+        queue.enqueue(
+            repo, prefix + node_id, step["agent"],
+            {"issue_number": step["issue_number"], "local_path": local_path},
+            [prefix + d for d in step["deps"]], scheduler.nodes[node_id]["priority"],
+        )
+    return node_ids
+
+def finish_feature(feature, repo, local_path):
+    store = get_state_store()
+    states = [t["state"] for t in store.tasks(repo=repo, feature=feature["title"])]
+    status = "erledigt" if states and all(s == "erledigt" for s in states) else "in Arbeit"
+    store.update_feature(feature["title"], status=status)
+    generate_readme(load_project_state(), local_path, repo)
+    push_commits(repo)
+    log(f"📌 Feature '{feature['title']}' wurde verarbeitet – Status: {status}")
+
+def add_feature(scheduler, feature, repo, local_path):
+    feature_id = f"feature:{feature['title']}"
+    priority = feature.get("priority", 3)
+
+    def plan_and_finish():
+        steps = get_task_queue().run(repo, feature_id, "planner", lambda: plan_feature(feature, repo), priority=priority)
+        if steps is False:
+            return False
+        step_ids = add_queued_steps(scheduler, steps, repo, local_path, group=feature["title"], after=[feature_id])
+        # README und Push, sobald alle Issues des Features durch sind – auch bei Fehlschlägen
+        scheduler.add(
+            f"finish:{feature['title']}", "readme",
+            lambda: finish_feature(feature, repo, local_path),
+            step_ids + [feature_id], always=True,
+        )
+
+    scheduler.add(feature_id, "planner", plan_and_finish, priority=priority)
+
+def plan_round(repo, local_path):
+    """Schritte einer Folgerunde; das Ergebnis wird in der Warteschlange festgehalten."""
+    issues = wait_for_events(repo, local_path) if WEBHOOK_ENABLED else get_open_issues(repo)
+    plan = plan_next_actions(issues, repo) if issues else []
+    labels = {i["issue_number"]: i["labels"] for i in issues}
+    return list({
+        (s["agent"], s["issue_number"]): dict(s, labels=labels.get(s["issue_number"], []))
+        for s in plan
+    }.values())
 
 def suggest_fix_with_gpt(agent_name, error_msg):
     log("📡 Anfrage an GPT zur Fehlerdiagnose...")
@@ -131,10 +286,15 @@ Fehlermeldung: {error_msg}
 
 Was ist wahrscheinlich die Ursache und wie kann ich es beheben?
 """
-    result = call_gpt_and_parse_json("manager_agent", prompt)
+    try:
+        result = call_ollama(prompt, cache=False, agent_name="manager_agent", task="diagnosis")
+    except LLMCallAbandoned as e:
+        log(f"⏭️ Keine Fehlerdiagnose: {e.reason}")
+        return
     print("💡 GPT-Vorschlag zur Fehlerbehebung:")
-    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(result)
 
+@agent_entry("manager_agent")
 def setup_project():
     log("🚀 Initialisiere Projekt...")
     repo = input("📦 Projektname: ").strip()
@@ -145,8 +305,13 @@ def setup_project():
         log("❌ Repo konnte nicht erstellt oder aktualisiert werden.")
         return
 
-    push_template_file(repo, "workflows/flutter.yml", ".github/workflows/flutter.yml")
-    push_template_file(repo, "workflows/test.yml", ".github/workflows/test.yml")
+    if WEBHOOK_ENABLED:
+        from webhook_server import start_webhook_server
+        start_webhook_server()
+
+    push_template_file(repo, "workflows/flutter.yml", ".github/workflows/flutter.yml", local_path)
+    push_template_file(repo, "workflows/test.yml", ".github/workflows/test.yml", local_path)
+    push_commits(repo)
 
     # Lade oder erzeuge Projektstatus
     project_state = load_project_state()
@@ -158,42 +323,59 @@ def setup_project():
         project_state["description"] = description
         save_project_state(project_state)
 
-    # Iteriere über ALLE Features – keine Statusprüfung
-    for f in project_state["features"]:
-        title = f["title"]
-        desc = f["description"]
-
-        log(f"🚀 Bearbeite Feature: {title}")
-        tasks = generate_feature_tasks(title, desc)
-
-        for round_think in range(max_rounds):
-            for t in tasks:
-                if "title" in t and "labels" in t:
-                    create_github_issue(repo, t["title"], t.get("body", ""), t.get("labels", []))
-                else:
-                    print(f"[WARN] Ungültige Aufgabe übersprungen: {t}")
-
-            issues = get_open_issues(repo)
-            plan = plan_next_actions(issues)
-
-            for step in plan:
-                log(f"🔁 Starte Agent {step['agent']} für Issue #{step['issue_number']}")
-                for round_num in range(max_rounds):
-                    call_agent_by_name(step["agent"], repo, local_path)
-
-                    if step["agent"] == "qa":
-                        if qa_agent_detected_issues():
-                            log("🔁 QA meldet Fehler – neue Iteration")
-                        else:
-                            log("✅ QA erfolgreich – Schleife abgeschlossen")
-                            break  # QA war erfolgreich → zur nächsten Planungseinheit
-
-        save_project_state(project_state)
-        generate_readme(project_state, local_path, repo)
+    queue = get_task_queue()
+    progress = queue.summary(repo)
+    if progress:
+        log(f"⏯️ Setze früheren Lauf fort: {progress} (Neustart: python task_queue.py reset {repo})")
 
-        log(f"📌 Feature '{title}' wurde verarbeitet – Status bitte manuell prüfen.")
+    # Alle Features als DAG: unabhängige Features und Issues laufen parallel
+    scheduler = DagScheduler()
+    for f in project_state["features"]:
+        add_feature(scheduler, f, repo, local_path)
+    scheduler.run()
+
+    # Folgerunden für alles, was noch offen ist (Bug-Issues aus QA, neue Kommentare, …)
+    for round_think in range(1, max_rounds):
+        with span("manager.round", round=round_think):
+            plan_id = f"plan:round{round_think}"
+            steps = queue.run(repo, plan_id, "planner", lambda: plan_round(repo, local_path))
+            if not steps:
+                # Ein leerer Plan wird nicht festgehalten – nach einem Neustart kann es wieder Arbeit geben
+                queue.forget(repo, plan_id)
+                log("✅ Keine weiteren Schritte geplant.")
+                break
+            scheduler = DagScheduler()
+            add_queued_steps(
+                scheduler, steps, repo, local_path,
+                group=f"round{round_think}", prefix=f"round{round_think}:",
+            )
+            scheduler.run()
+            # Lokal gesammelte Commits der Runde mit einem Push veröffentlichen
+            push_commits(repo)
+
+    # Kompatibilität: project_state.json im alten Format einmal am Ende schreiben
+    export_project_state()
+
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        log(f"🗄️ LLM-Cache: {llm_cache.summary()}")
+
+    report = get_retry_policy().report()
+    log(f"🔁 LLM-Versuche: {report['run_attempts']} ({report['run_tokens']} Tokens), pro Agent: {report['agent_attempts']}")
+    for item in report["abandoned"]:
+        log(f"⛔ Abgebrochen ({item['agent']}): {item['reason']}")
+
+    for agent_name, timing in get_timing_report().items():
+        log(
+            f"⏱️ {agent_name}: {timing['calls']} Aufrufe, Prefill Ø {timing['avg_prefill_ms']} ms, "
+            f"Decode Ø {timing['avg_decode_ms']} ms, Präfix wiederverwendet: {timing['prefix_reuse']:.0%}"
+        )
 
     
     
 if __name__ == "__main__":
-    setup_project()
+    try:
+        setup_project()
+    finally:
+        write_run_report()
+        write_trace()
@@ -3,43 +3,44 @@ import os
 import json
 from dotenv import load_dotenv
 from gpt_utils import call_gpt_and_parse_json
-from github_utils import get_open_issues, update_issue_labels
+from github_utils import get_open_issues, bulk_update_labels
+from json_schemas import TASK_LIST_SCHEMA, PRIORITY_LIST_SCHEMA
+from prompt_templates import get_agent_session
+from metrics import agent_entry
 
 load_dotenv()
 
+PLANNER_ROLE = """Du bist Planer für die Entwicklung einer Flutter App.
+Du zerlegst Features eines Softwareprojekts in die nächsten wichtigen und sinnvoll zu implementierenden Aufgaben."""
+TASK_LIST_FORMAT = """Erzeuge für das Feature notwendige Aufgaben die implementiert werden müssen und noch kein Issue haben, mit einer ausführlichen und klaren Beschreibung.
+Erstelle nur neue Aufgaben, falls nötig. Jede Aufgabe soll Titel, Beschreibung und ein passendes Label (frontend, backend, qa oder devops) enthalten.
+Setzt eine Aufgabe eine andere voraus, trage deren Titel unter "depends_on" ein (sonst leere Liste).
+
+Format:
+[
+  {
+    "title": "...",
+    "body": "...",
+    "labels": ["frontend"],
+    "depends_on": []
+  },
+  ...
+]"""
+
 def log(msg):
     print(f"📌 [planner_agent] {msg}")
 
+@agent_entry("planner_agent")
 def generate_feature_tasks(feature_title, feature_description, repo_name=None):
     log(f"🧠 Erstelle Aufgaben für Feature: {feature_title}")
     existing_issues = get_open_issues(repo_name) if repo_name else []
     existing_issues_text = json.dumps(existing_issues, indent=2) if existing_issues else "[]"
 
-    prompt = f"""
-Du bist Planer für die Entwicklung einer Flutter App
-Was wäre die nächste wichtigste und sinnvolle  zu implentieren...
-für folgendes Feature eines Softwareprojekts:
-
-Titel: {feature_title}
-Beschreibung: {feature_description}
-
-Diese Aufgaben existieren bereits im Projekt:
-{existing_issues_text}
-
-Erzeuge daraus notwendige Aufgaben die implementiert werden müssen und noch kein Issue haben, mit einer ausführlichen und klaren Beschreibung.
-Erstelle nur neue Aufgaben, falls nötig. Jede Aufgabe soll Titel, Beschreibung und ein passendes Label (frontend, backend, qa oder devops) enthalten.
-
-Format:
-[
-  {{
-    "title": "...",
-    "body": "...",
-    "labels": ["frontend"]
-  }},
-  ...
-]
-"""
-    aufgaben = call_gpt_and_parse_json("planner_agent", prompt)
+    session = get_agent_session("planner_agent", PLANNER_ROLE, TASK_LIST_FORMAT, task="plan")
+    aufgaben = session.ask_json([
+        ("Diese Aufgaben existieren bereits im Projekt", existing_issues_text),
+        ("Feature", f"Titel: {feature_title}\nBeschreibung: {feature_description}"),
+    ], schema=TASK_LIST_SCHEMA)
     # ✅ Rückgabe prüfen und nur gültige Aufgaben weitergeben
     def is_valid_task(task):
         return isinstance(task, dict) and "title" in task and "labels" in task
@@ -57,6 +58,7 @@ Format:
     return valid_tasks
     return 
 
+@agent_entry("planner_agent")
 def prioritize_issues(repo):
     issues = get_open_issues(repo)
     if not issues:
@@ -79,15 +81,17 @@ Format:
 ]
 """
 
-    prioritized = call_gpt_and_parse_json("planner_agent", prompt)
+    prioritized = call_gpt_and_parse_json("planner_agent", prompt, schema=PRIORITY_LIST_SCHEMA, task="plan")
+    updates = {}
     for item in prioritized:
-        number = item["number"]
         labels = item["labels"]
         prio = item["priority"]
         if f"prio{prio}" not in labels:
             labels.append(f"prio{prio}")
-        update_issue_labels(repo, number, labels)
-        log(f"✅ Issue #{number} aktualisiert mit Labels: {labels}")
+        updates[item["number"]] = labels
+    for number, result in zip(updates, bulk_update_labels(repo, updates)):
+        if result["ok"]:
+            log(f"✅ Issue #{number} aktualisiert mit Labels: {updates[number]}")
 
 # Für CLI-Test
 if __name__ == "__main__":
@@ -3,67 +3,79 @@ import os
 import json
 import subprocess
 from dotenv import load_dotenv
-from gpt_utils import call_ollama, extract_code_block, log_gpt_interaction
+from gpt_utils import extract_code_block
+from json_schemas import BUG_ISSUE_SCHEMA
+from repo_index import get_repo_index, format_snippets
+from prompt_templates import get_agent_session
+from write_utils import read_repo_file
+from metrics import agent_entry, timed
 from github_utils import (
     get_open_issues,
-    get_file_from_repo,
     push_file_to_repo,
     create_github_issue,
+    comment_on_issue,
     close_issue,
     update_issue_labels
 )
 
 load_dotenv()
 
+QA_ROLE = "Du bist ein Flutter-Testentwickler. Du schreibst vollständige Testdateien mit `flutter_test`."
+TEST_CODE_FORMAT = """Verwende `testWidgets`, prüfe auf sichtbare Texte, Buttons, Eingabefelder.
+Gib **nur den Dart-Testcode** zurück."""
+
 def log(msg):
     print(f"🧪 [qa_agent] {msg}")
 
-def generate_test_code(title, code):
-    prompt = f"""
-Du bist ein Flutter-Testentwickler.
-Erstelle eine vollständige Testdatei mit `flutter_test`, um dieses Widget zu testen:
-
-Titel: {title}
-
-Widget-Quellcode:
-```dart
-{code}
-```
-
-Verwende `testWidgets`, prüfe auf sichtbare Texte, Buttons, Eingabefelder.
-Gib **nur den Dart-Testcode** zurück.
-"""
-    result = call_ollama(prompt)
-    log_gpt_interaction("qa_agent", prompt, result)
+def generate_test_code(title, code, related_code=""):
+    session = get_agent_session("qa_agent", QA_ROLE, TEST_CODE_FORMAT, task="test")
+    sections = [
+        ("Verwandter Code aus dem Repository (zur Orientierung)", related_code or "-"),
+        ("Widget-Quellcode", f"```dart\n{code}\n```"),
+        ("Erstelle eine vollständige Testdatei für dieses Widget", f"Titel: {title}"),
+    ]
+    result = session.ask(sections, stop_when="fence")
     return extract_code_block(result, "dart")
 
 def run_flutter_tests(project_path):
     log("▶️ Starte `flutter test`...")
     try:
-        result = subprocess.run(
-            ["flutter", "test"],
-            cwd=project_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            timeout=90
-        )
+        with timed("flutter.test") as m:
+            result = subprocess.run(
+                ["flutter", "test"],
+                cwd=project_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=90
+            )
+            m["bytes_received"] = len(result.stdout)
+            m["errors"] = int(result.returncode != 0)
         print(result.stdout)
         return "All tests passed" in result.stdout
     except Exception as e:
         log(f"❌ Fehler beim Ausführen von Tests: {e}")
         return False
 
-def run_qa_agent(repo_name, local_path):
+@agent_entry("qa_agent")
+def run_qa_agent(repo_name, local_path, issue_numbers=None):
+    """
+    Testet offene QA-Issues; Fehlschläge werden kommentiert und als Bug-Issue angelegt.
+    :param issue_numbers: nur diese Issues prüfen (Scheduler), sonst alle offenen QA-Issues
+    :return: True, wenn alle Tests bestanden haben (oder nichts zu prüfen war)
+    """
     issues = get_open_issues(repo_name)
     review_issues = [i for i in issues if "qa" in i["labels"] and "done" not in i["labels"]]
+    if issue_numbers:
+        review_issues = [i for i in review_issues if i["issue_number"] in issue_numbers]
 
     if not review_issues:
         log("✅ Keine offenen QA-Issues.")
-        return
+        return True
 
     all_passed = True
     results = []
+    open_titles = {i["title"] for i in issues}
 
     for issue in review_issues:
         number = issue["issue_number"]
@@ -73,26 +85,42 @@ def run_qa_agent(repo_name, local_path):
         test_path = os.path.join(local_path, "test", filename.replace(".dart", "_test.dart"))
 
         log(f"🧪 Erzeuge Test für: {title} (#{number})")
-        code = get_file_from_repo(repo_name, widget_path)
+        index = get_repo_index(local_path)
+        code = read_repo_file(repo_name, local_path, widget_path)
+        if not code:
+            # Der Dateiname ist nur aus dem Titel geraten – im Repository-Index nach der Datei suchen
+            matches = [m for m in index.query(title, k=5, extensions=[".dart"]) if m["path"].startswith("lib/")]
+            if matches:
+                widget_path = matches[0]["path"]
+                with open(os.path.join(local_path, widget_path), "r", encoding="utf-8") as f:
+                    code = f.read()
+                log(f"🔎 Datei über den Index gefunden: {widget_path}")
         if not code:
+            # Ungeprüft ist nicht bestanden – sonst gälte der Task als erledigt und würde nie neu geplant
             log(f"⚠️ Datei nicht gefunden: {widget_path}")
+            results.append({"issue": number, "passed": False, "output": f"Datei nicht gefunden: {widget_path}"})
+            all_passed = False
             continue
 
-        test_code = generate_test_code(title, code)
+        related = [s for s in index.query(f"{title}\n{code[:1000]}", k=4) if s["path"] != widget_path]
+        test_code = generate_test_code(title, code, format_snippets(related[:3]))
 
         os.makedirs(os.path.dirname(test_path), exist_ok=True)
         with open(test_path, "w", encoding="utf-8") as f:
             f.write(test_code)
 
         log("▶️ Führe Tests aus...")
-        result = subprocess.run(
-            ["flutter", "test"],
-            cwd=local_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            timeout=90
-        )
+        with timed("flutter.test") as m:
+            result = subprocess.run(
+                ["flutter", "test"],
+                cwd=local_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=90
+            )
+            m["bytes_received"] = len(result.stdout)
+            m["errors"] = int(result.returncode != 0)
         passed = "All tests passed" in result.stdout
         results.append({"issue": number, "passed": passed, "output": result.stdout})
         all_passed = all_passed and passed
@@ -100,6 +128,9 @@ def run_qa_agent(repo_name, local_path):
         if passed:
             log(f"✅ Tests bestanden – schließe Issue #{number}")
             close_issue(repo_name, number)
+        elif "bug" in issue["labels"]:
+            # Ein früherer Lauf (z. B. vor dem Fortsetzen) hat den Fehler schon gemeldet
+            log(f"❌ Tests fehlgeschlagen – Bug für #{number} ist bereits gemeldet")
         else:
             log(f"❌ Tests fehlgeschlagen – Kommentiere & Bug-Issue wird erstellt")
 
@@ -122,10 +153,14 @@ Format:
   "body": "...",
   "labels": ["bug"]
 }}
-""")
+""", schema=BUG_ISSUE_SCHEMA, task="comment")
 
             if isinstance(bug, dict) and "title" in bug:
-                create_github_issue(repo_name, bug["title"], bug["body"], bug.get("labels", ["bug"]))
+                if bug["title"] in open_titles:
+                    log(f"🔁 Bug-Issue '{bug['title']}' existiert bereits")
+                else:
+                    create_github_issue(repo_name, bug["title"], bug["body"], bug.get("labels", ["bug"]))
+                    open_titles.add(bug["title"])
                 update_issue_labels(repo_name, number, ["qa", "bug"])
 
     # QA-Report speichern
@@ -138,6 +173,7 @@ Format:
         json.dump(report, f, indent=2)
 
     log("📄 QA-Report gespeichert.")
+    return all_passed
 
 if __name__ == "__main__":
     run_qa_agent("dein_repo_name", "/pfad/zum/projekt")
@@ -0,0 +1,118 @@
+"""
+Durchsatz-Benchmark der GitHub-Schicht gegen das lokale Backend (local_github).
+
+Misst die Wege, die die Agenten tatsächlich benutzen – Issues anlegen, Labels setzen,
+kommentieren, schließen, Abfragen über den Issue-Index und gebündelte Commits – und gibt
+Operationen pro Sekunde sowie p50/p95 aus den Metriken aus.
+
+    python benchmark_github.py --issues 5000 --threads 8
+    python benchmark_github.py --db /tmp/bench.db --keep
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import github_utils
+from github_utils import (
+    create_or_update_repo,
+    create_github_issue,
+    update_issue_labels,
+    comment_on_issue,
+    close_issue,
+    bulk_create_issues,
+    bulk_update_labels,
+    get_issue_index,
+    get_open_issues,
+    IssueIndex,
+    commit_files,
+    push_file_to_repo,
+)
+from local_github import LocalGitHub
+from metrics import get_metrics
+
+
+def log(msg):
+    print(f"🏁 [benchmark_github] {msg}")
+
+def measure(name, count, func, threads=1, batch=False):
+    """
+    Ruft func(i) für i in range(count) auf und gibt Operationen pro Sekunde aus.
+    :param batch: func() einmal aufrufen, die count Operationen stecken darin (Sammel-Operationen)
+    """
+    started = time.perf_counter()
+    # Die Schleife soll das Backend messen, nicht das Konsolen-Logging
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if batch:
+            func()
+        elif threads > 1:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(func, range(count)))
+        else:
+            for i in range(count):
+                func(i)
+    elapsed = time.perf_counter() - started
+    log(f"{name:<28} {count:>7} Ops in {elapsed:6.2f} s → {count / elapsed:9.0f} Ops/s")
+    return count / elapsed
+
+def run(issues, threads, db_path):
+    github_utils.set_github_client(LocalGitHub(db_path, owner=github_utils.GITHUB_USERNAME))
+    repo = f"bench_{int(time.time())}"
+    create_or_update_repo(repo, "Benchmark")
+    push_file_to_repo(repo, "README.md", "# Benchmark\n", "Initial commit")
+
+    numbers = []
+    numbers_lock = threading.Lock()
+
+    def create(i):
+        res = create_github_issue(repo, f"Aufgabe {i}", "Beschreibung " * 20, ["backend" if i % 2 else "frontend", "open"])
+        with numbers_lock:
+            numbers.append(res.json()["number"])
+
+    measure("Issue anlegen", issues, create, threads)
+    measure("Labels setzen", issues, lambda i: update_issue_labels(repo, numbers[i], ["backend", "prio1"]), threads)
+    measure("Kommentieren", issues, lambda i: comment_on_issue(repo, numbers[i], "✅ erledigt"), threads)
+
+    measure("Index-Sync (kalt, paginiert)", issues, lambda: IssueIndex(repo).refresh(force=True), batch=True)
+    index = get_issue_index(repo)
+    index.refresh(force=True)
+    measure("Index-Sync (304)", 200, lambda i: index.refresh(force=True))
+    measure("Abfrage Labels (Cache)", issues, lambda i: get_open_issues(repo, ["prio1"]), 1)
+
+    half = issues // 2
+    bulk = [{"title": f"Bulk {i}", "body": "", "labels": ["qa"]} for i in range(half)]
+    measure("bulk_create_issues", half, lambda: bulk_create_issues(repo, bulk), batch=True)
+    updates = {n: ["qa", "done"] for n in numbers[:half]}
+    measure("bulk_update_labels", half, lambda: bulk_update_labels(repo, updates), batch=True)
+    measure("Issue schließen", issues, lambda i: close_issue(repo, numbers[i]), threads)
+
+    files = {f"lib/datei_{i}.dart": f"// Datei {i}\n" * 40 for i in range(50)}
+    measure("Commit mit 50 Dateien", 100, lambda i: commit_files(repo, {**files, "lib/zaehler.dart": str(i)}, f"Commit {i}"))
+
+    log("Teuerste Operationen (aus den Metriken):")
+    rows = sorted(get_metrics().summary()["series"], key=lambda r: r["total_ms"], reverse=True)[:8]
+    for row in rows:
+        log(f"   {row['operation']:<32} {row['count']:>7}×  p50 {row['p50_ms']:.0f} ms  p95 {row['p95_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark der GitHub-Schicht gegen das lokale Backend")
+    parser.add_argument("--issues", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--db", help="SQLite-Datei (Standard: temporär)")
+    parser.add_argument("--keep", action="store_true", help="temporäre Datenbank nicht löschen")
+    args = parser.parse_args()
+    github_utils.GITHUB_USERNAME = github_utils.GITHUB_USERNAME or "bench"
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="ki_firma_bench_"), "github.db")
+    try:
+        run(args.issues, args.threads, db_path)
+    finally:
+        if not args.db and not args.keep:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+        log(f"Datenbank: {db_path}" if args.db or args.keep else "Temporäre Datenbank entfernt")
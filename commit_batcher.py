@@ -0,0 +1,230 @@
+"""
+Sammelt geschriebene Dateien und veröffentlicht sie gebündelt als einen Commit pro Schritt
+(siehe github_utils.commit_files) statt einem Contents-API-PUT pro Datei.
+
+Jeder Agentenschritt (commit_step) sammelt in einem eigenen Batch: Laufen mehrere Schritte
+gleichzeitig (DAG-Scheduler), veröffentlicht das Ende des einen nicht die halb geschriebenen
+Dateien der anderen. Außerhalb eines Schritts gibt es einen gemeinsamen Batch pro Repository.
+
+Geleert wird, wenn zu viele Bytes oder Dateien vorgemerkt sind, wenn die älteste Änderung
+COMMIT_BATCH_MAX_AGE Sekunden wartet (eigener Timer), am Ende eines Agentenschritts
+(flush_commits) und spätestens beim Beenden. Schlägt ein Commit fehl, bleiben die Dateien
+vorgemerkt und der Fehler wird nur protokolliert – der nächste Flush versucht es erneut.
+
+Mit GIT_MODE=local wird stattdessen in der lokalen Arbeitskopie committet (siehe local_git);
+push_commits() am Ende einer Runde bzw. eines Features bringt dann alles mit einem Push raus.
+"""
+
+import os
+import time
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+from github_utils import commit_files, push_file_to_repo, GITHUB_BRANCH
+from local_git import local_mode, get_working_copy
+
+COMMIT_BATCH_MAX_BYTES = int(os.getenv("COMMIT_BATCH_MAX_BYTES", str(2 * 1024 * 1024)))
+COMMIT_BATCH_MAX_FILES = int(os.getenv("COMMIT_BATCH_MAX_FILES", "50"))
+COMMIT_BATCH_MAX_AGE = float(os.getenv("COMMIT_BATCH_MAX_AGE", "120"))
+
+# Aktueller Agentenschritt (siehe commit_step); None = gemeinsamer Batch
+_current_step = contextvars.ContextVar("commit_step", default=None)
+
+
+def log(msg):
+    print(f"📦 [commit_batcher] {msg}")
+
+
+class CommitBatcher:
+    def __init__(self, repo, branch=GITHUB_BRANCH, local_path=None):
+        self.repo = repo
+        self.branch = branch
+        self.local_path = local_path
+        self.files = {}     # rel_path -> content (None = löschen); spätere Änderungen überschreiben frühere
+        self.messages = []
+        self.size = 0
+        self.first_staged = None
+        self._timer = None
+        self._lock = threading.RLock()
+        # Hält die Commits eines Batches in Reihenfolge, ohne stage() zu blockieren
+        self._flush_lock = threading.Lock()
+
+    def stage(self, rel_path, content, message):
+        with self._lock:
+            self._put(rel_path, content)
+            if message and message not in self.messages:
+                self.messages.append(message)
+            full = (
+                self.size >= COMMIT_BATCH_MAX_BYTES
+                or len(self.files) >= COMMIT_BATCH_MAX_FILES
+                or time.monotonic() - self.first_staged >= COMMIT_BATCH_MAX_AGE
+            )
+        # Außerhalb der Sperre: der Commit (Netzwerk bzw. git) hält andere Schreiber nicht auf
+        if full:
+            self.try_flush()
+
+    def _put(self, rel_path, content):
+        previous = self.files.get(rel_path)
+        if previous is not None:
+            self.size -= len(previous.encode())
+        self.files[rel_path] = content
+        self.size += len(content.encode()) if content is not None else 0
+        if self.first_staged is None:
+            self.first_staged = time.monotonic()
+            # Auch ohne weitere stage()-Aufrufe nicht länger als COMMIT_BATCH_MAX_AGE warten
+            self._timer = threading.Timer(COMMIT_BATCH_MAX_AGE, self.try_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def try_flush(self):
+        """Wie flush(), aber ein Fehler bricht nichts ab – die Dateien bleiben vorgemerkt."""
+        try:
+            return self.flush()
+        except Exception:
+            return None  # bereits protokolliert
+
+    def _message(self, files, messages):
+        if not messages:
+            return f"📝 Update {len(files)} Dateien"
+        if len(messages) == 1:
+            return messages[0]
+        subject = f"{messages[0]} (+{len(messages) - 1} weitere Änderungen)"
+        return subject + "\n\n" + "\n".join(f"- {m}" for m in messages[1:])
+
+    def flush(self):
+        """Veröffentlicht alle vorgemerkten Dateien als einen Commit. Gibt die Commit-sha zurück."""
+        with self._flush_lock:
+            # Stand übernehmen und leeren; der Commit läuft ohne self._lock
+            with self._lock:
+                if not self.files:
+                    return None
+                files, messages = dict(self.files), list(self.messages)
+                self._reset()
+            message = self._message(files, messages)
+            try:
+                return self._commit(files, message)
+            except Exception as e:
+                log(f"❌ Commit fehlgeschlagen, Dateien bleiben vorgemerkt: {e}")
+                self._restore(files, messages)
+                raise
+
+    def _commit(self, files, message):
+        if local_mode():
+            committed = get_working_copy(self.repo, self.local_path).commit(files, message)
+            if committed:
+                log(f"✅ {len(files)} Datei(en) lokal committet.")
+            return "local" if committed else None
+        sha = commit_files(self.repo, files, message, self.branch)
+        if sha is None:
+            # Leeres Repository: der erste Commit geht nur über die Contents-API
+            log("ℹ️ Repository noch leer – Dateien werden einzeln angelegt.")
+            failed = []
+            for rel_path, content in files.items():
+                if content is not None:
+                    res = push_file_to_repo(self.repo, rel_path, content, message.splitlines()[0], self.branch)
+                    if res.status_code not in (200, 201):
+                        failed.append(f"{rel_path} (HTTP {res.status_code})")
+            if failed:
+                raise RuntimeError(f"Anlegen fehlgeschlagen: {', '.join(failed)}")
+        else:
+            log(f"✅ {len(files)} Datei(en) in einem Commit veröffentlicht ({sha[:7]}).")
+        return sha
+
+    def _restore(self, files, messages):
+        # Was seit dem Flush neu vorgemerkt wurde, ist neuer und gewinnt
+        with self._lock:
+            for rel_path, content in files.items():
+                if rel_path not in self.files:
+                    self._put(rel_path, content)
+            self.messages[:0] = [m for m in messages if m not in self.messages]
+
+    def pending(self):
+        with self._lock:
+            return bool(self.files)
+
+    def _reset(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.files.clear()
+        self.messages.clear()
+        self.size = 0
+        self.first_staged = None
+
+
+_batchers = {}  # (repo, Schritt) -> CommitBatcher
+_local_paths = {}  # repo -> Projektverzeichnis, für push_commits auch nach dem Ende der Schritte
+_batchers_lock = threading.Lock()
+
+
+def get_commit_batcher(repo, local_path=None):
+    """Der Batch des aktuellen Agentenschritts (siehe commit_step) für dieses Repository."""
+    key = (repo, _current_step.get())
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = CommitBatcher(repo)
+        if local_path:
+            _batchers[key].local_path = local_path
+            _local_paths[repo] = local_path
+        elif repo in _local_paths:
+            _batchers[key].local_path = _local_paths[repo]
+        return _batchers[key]
+
+def _select(repo=None, all_steps=False):
+    step = _current_step.get()
+    with _batchers_lock:
+        return [
+            b for (r, s), b in _batchers.items()
+            if (repo is None or r == repo) and (all_steps or s == step)
+        ]
+
+@contextmanager
+def commit_step(step_id):
+    """
+    Alles, was innerhalb des Blocks vorgemerkt wird, landet im eigenen Batch des Schritts und
+    wird am Ende veröffentlicht. Schlägt das fehl, bleibt der Batch bis zum nächsten Versuch
+    (spätestens beim Beenden) erhalten.
+    """
+    token = _current_step.set(step_id)
+    try:
+        yield
+    finally:
+        flush_commits()
+        with _batchers_lock:
+            for key in [k for k, b in _batchers.items() if k[1] == step_id and not b.pending()]:
+                del _batchers[key]
+        _current_step.reset(token)
+
+def stage_file(repo, rel_path, content, message=None, local_path=None):
+    """:param local_path: Projektverzeichnis – im lokalen Git-Modus die Arbeitskopie"""
+    get_commit_batcher(repo, local_path).stage(rel_path, content, message or f"📝 Update {rel_path}")
+
+def flush_commits(repo=None, all_steps=False):
+    """
+    Am Ende eines Agentenschritts aufrufen; ohne repo werden alle Repositories geleert.
+    Geleert wird nur der Batch des aktuellen Schritts (siehe commit_step), mit all_steps alle.
+    Ein fehlgeschlagener Commit bricht den Lauf nicht ab – die Dateien bleiben vorgemerkt.
+    """
+    for batcher in _select(repo, all_steps):
+        batcher.try_flush()
+
+def push_commits(repo=None, all_steps=False):
+    """
+    Am Ende einer Runde bzw. eines Features: leert den eigenen Batch und pusht lokale Commits.
+    Noch laufende Schritte committen erst an ihrem Ende – gepusht wird nur Fertiges.
+    """
+    flush_commits(repo, all_steps)
+    if not local_mode():
+        return
+    with _batchers_lock:
+        copies = [(r, p) for r, p in _local_paths.items() if repo is None or r == repo]
+    for name, local_path in copies:
+        try:
+            get_working_copy(name, local_path).push()
+        except Exception as e:
+            log(f"❌ Push fehlgeschlagen, Commits bleiben lokal: {e}")
+
+@atexit.register
+def _flush_on_exit():
+    push_commits(all_steps=True)
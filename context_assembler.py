@@ -0,0 +1,180 @@
+import os
+import re
+import math
+from collections import Counter
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2500"))
+MIN_TRUNCATED_TOKENS = 48
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_TERM_RE = re.compile(r"[A-Za-zÄÖÜäöüß][A-Za-zÄÖÜäöüß0-9]+")
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def log(msg):
+    print(f"📏 [context_assembler] {msg}")
+
+def count_tokens(text):
+    """
+    Näherung für die Tokenzahl ohne Tokenizer-Abhängigkeit: Wörter plus Satzzeichen,
+    mit Aufschlag für die Zerlegung längerer Wörter in mehrere BPE-Tokens.
+    """
+    if not text:
+        return 0
+    return int(len(_TOKEN_RE.findall(text)) * 1.3) + 1
+
+def terms(text):
+    """Suchbegriffe: kleingeschrieben, camelCase/snake_case zerlegt."""
+    result = []
+    for word in _TERM_RE.findall(text or ""):
+        parts = _CAMEL_RE.sub(" ", word).replace("_", " ").split()
+        result.extend(p.lower() for p in parts if len(p) > 1)
+        if len(parts) > 1:
+            result.append(word.lower())
+    return result
+
+def split_sections(text, mode):
+    """
+    :param mode: "markdown" (an Überschriften), "lines" (jede Zeile) oder None (ein Abschnitt)
+    """
+    if not text:
+        return []
+    if mode == "lines":
+        return [line for line in text.splitlines() if line.strip()]
+    if mode == "markdown":
+        sections, current = [], []
+        in_fence = False
+        for line in text.splitlines():
+            if line.startswith("```"):
+                in_fence = not in_fence
+            if line.startswith("#") and current and not in_fence:
+                sections.append("\n".join(current))
+                current = []
+            current.append(line)
+        if current:
+            sections.append("\n".join(current))
+        return [s for s in sections if s.strip()]
+    return [text]
+
+
+class ContextAssembler:
+    """
+    Baut den Prompt-Kontext für eine Aufgabe innerhalb eines Tokenbudgets zusammen.
+
+    Quellen (README, API-Doku, offene Issues, …) werden in Abschnitte zerlegt, nach Relevanz
+    zur Aufgabe bewertet (BM25 über die Abschnitte) und der Reihe nach aufgenommen. Was nicht
+    mehr passt, wird auf die relevantesten Zeilen gekürzt oder verworfen – und im Report vermerkt.
+    """
+
+    def __init__(self, query, budget=CONTEXT_TOKEN_BUDGET):
+        self.query_terms = set(terms(query))
+        self.budget = budget
+        self.sources = []
+        self.sections = []
+
+    def add(self, name, text, split="markdown", required=False):
+        """
+        :param required: vollständig aufnehmen (zählt trotzdem gegen das Budget), z. B. wenn
+                         das Modell den Text komplett neu schreiben soll
+        """
+        self.sources.append(name)
+        parts = [text] if required else split_sections(text, split)
+        for index, part in enumerate(parts):
+            self.sections.append({
+                "source": name,
+                "index": index,
+                "text": part,
+                "tokens": count_tokens(part),
+                "required": required,
+            })
+        return self
+
+    def _scores(self):
+        docs = [Counter(terms(s["text"])) for s in self.sections]
+        if not docs:
+            return []
+        avg_len = sum(sum(d.values()) for d in docs) / len(docs) or 1.0
+        k1, b = 1.2, 0.75
+        df = {term: sum(1 for d in docs if term in d) for term in self.query_terms}
+        scores = []
+        for doc in docs:
+            length = sum(doc.values())
+            score = 0.0
+            for term in self.query_terms:
+                tf = doc.get(term, 0)
+                if not tf:
+                    continue
+                idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+            scores.append(score)
+        return scores
+
+    def _truncate(self, text, max_tokens):
+        """Extraktive Kurzfassung: die relevantesten Zeilen in Originalreihenfolge."""
+        lines = text.splitlines()
+        ranked = sorted(
+            range(len(lines)),
+            key=lambda i: (i > 0, -len(self.query_terms & set(terms(lines[i]))), i),
+        )
+        keep, used = set(), count_tokens("[… gekürzt]")
+        for i in ranked:
+            cost = count_tokens(lines[i])
+            if used + cost > max_tokens:
+                continue
+            keep.add(i)
+            used += cost
+        kept = [lines[i] for i in sorted(keep)]
+        return "\n".join(kept + ["[… gekürzt]"]), used
+
+    def assemble(self):
+        """
+        :return: (texts, report) – texts bildet jeden Quellnamen auf seinen gekürzten Text ab
+                 (Abschnitte in Originalreihenfolge), report beschreibt Auswahl und Verluste.
+        """
+        scores = self._scores()
+        order = sorted(
+            range(len(self.sections)),
+            key=lambda i: (not self.sections[i]["required"], -scores[i], self.sections[i]["index"]),
+        )
+
+        remaining = self.budget
+        chosen = {}
+        report = {"budget": self.budget, "used": 0, "included": [], "truncated": [], "dropped": []}
+        for i in order:
+            section = self.sections[i]
+            first_line = section["text"].strip().splitlines()[0] if section["text"].strip() else ""
+            label = f"{section['source']}: {first_line[:40]}"
+            if section["required"] or section["tokens"] <= remaining:
+                chosen[i] = section["text"]
+                remaining -= section["tokens"]
+                report["included"].append(label)
+            elif remaining >= MIN_TRUNCATED_TOKENS and scores[i] > 0:
+                text, used = self._truncate(section["text"], remaining)
+                chosen[i] = text
+                remaining -= used
+                report["truncated"].append({"section": label, "tokens": section["tokens"], "kept": used})
+            else:
+                report["dropped"].append({"section": label, "tokens": section["tokens"]})
+
+        report["used"] = self.budget - remaining
+        texts = {}
+        for name in self.sources:
+            parts = [chosen[i] for i, s in enumerate(self.sections) if s["source"] == name and i in chosen]
+            texts[name] = "\n".join(parts)
+        return texts, report
+
+def _describe(sections, limit=5):
+    if not sections:
+        return "nichts"
+    names = ", ".join(s["section"] for s in sections[:limit])
+    if len(sections) > limit:
+        names += f" (+{len(sections) - limit} weitere)"
+    return names
+
+def log_report(report, agent_name):
+    dropped = _describe(report["dropped"])
+    truncated = _describe(report["truncated"])
+    log(
+        f"{agent_name}: {report['used']}/{report['budget']} Tokens, "
+        f"gekürzt: {truncated}, verworfen: {dropped}"
+    )
@@ -0,0 +1,167 @@
+"""
+Interne Arbeits-Queue für GitHub-Ereignisse.
+
+Der Webhook-Empfänger (webhook_server) und das Replay-Werkzeug (replay_events) übersetzen
+Issue-, Kommentar-, Push- und workflow_run-Ereignisse mit translate_event() in Arbeitseinträge
+und legen sie pro Repository hier ab. Der Manager holt sie sich mit wait_for_work(); kommt
+nichts, fragt er wie bisher die offenen Issues ab (Polling als Rückfallebene).
+
+Ein Arbeitseintrag ist ein Dict mit "type" ("issue", "comment", "push", "ci"), "repo" und je
+nach Typ "issue_number", "labels", "body", "author", "ref", "conclusion" oder "url".
+"""
+
+import os
+import json
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from github_utils import get_issue_index, OWN_COMMENT_IDS
+
+WEBHOOK_EVENT_DIR = os.getenv("WEBHOOK_EVENT_DIR", "logs/events")
+# Nach dem ersten Ereignis noch so lange auf weitere warten (Labels kommen z. B. als Einzelereignisse)
+WEBHOOK_SETTLE = float(os.getenv("WEBHOOK_SETTLE", "2"))
+
+ISSUE_ACTIONS = {"opened", "reopened", "edited", "labeled", "unlabeled"}
+
+
+def log(msg):
+    print(f"📬 [event_queue] {msg}")
+
+
+def translate_event(event, payload):
+    """
+    Übersetzt ein GitHub-Ereignis in Arbeitseinträge (meist null oder einer).
+    Nebenbei wird der Issue-Index aus dem mitgelieferten Issue aktualisiert – dafür ist kein
+    weiterer API-Aufruf nötig.
+    :param event: Wert des Headers X-GitHub-Event
+    """
+    repo = (payload.get("repository") or {}).get("name")
+    action = payload.get("action")
+    if not repo:
+        return []
+
+    if event in ("issues", "issue_comment") and "issue" in payload:
+        get_issue_index(repo).apply(payload["issue"])
+
+    if event == "issues" and action in ISSUE_ACTIONS:
+        issue = payload["issue"]
+        return [{
+            "type": "issue",
+            "repo": repo,
+            "issue_number": issue["number"],
+            "labels": [l["name"] for l in issue.get("labels", [])],
+        }]
+
+    if event == "issue_comment" and action == "created":
+        comment = payload["comment"]
+        sender = payload.get("sender") or {}
+        if comment["id"] in OWN_COMMENT_IDS or sender.get("type") == "Bot":
+            return []
+        if payload["issue"].get("state") != "open" or "pull_request" in payload["issue"]:
+            return []
+        return [{
+            "type": "comment",
+            "repo": repo,
+            "issue_number": payload["issue"]["number"],
+            "body": comment.get("body", ""),
+            "author": (comment.get("user") or {}).get("login"),
+        }]
+
+    if event == "push" and not payload.get("deleted"):
+        return [{
+            "type": "push",
+            "repo": repo,
+            "ref": payload.get("ref"),
+            "commits": len(payload.get("commits", [])),
+        }]
+
+    if event == "workflow_run" and action == "completed":
+        run = payload["workflow_run"]
+        return [{
+            "type": "ci",
+            "repo": repo,
+            "name": run.get("name"),
+            "conclusion": run.get("conclusion"),
+            "url": run.get("html_url"),
+        }]
+
+    return []
+
+
+def record_event(event, delivery, payload):
+    """Hängt das rohe Ereignis an logs/events/events_<Datum>.jsonl an – Grundlage für replay_events."""
+    os.makedirs(WEBHOOK_EVENT_DIR, exist_ok=True)
+    path = os.path.join(WEBHOOK_EVENT_DIR, f"events_{datetime.now().strftime('%Y%m%d')}.jsonl")
+    line = json.dumps({
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "event": event,
+        "delivery": delivery,
+        "payload": payload,
+    }, ensure_ascii=False)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+class EventQueue:
+    """Eine Queue pro Repository; doppelt zugestellte Ereignisse (gleiche Delivery-ID) zählen einmal."""
+
+    def __init__(self, remember=1000):
+        self._queues = {}
+        self._seen = set()
+        self._seen_order = deque()
+        self._remember = remember
+        self._lock = threading.Lock()
+        self.received = 0
+
+    def _queue(self, repo):
+        with self._lock:
+            if repo not in self._queues:
+                self._queues[repo] = queue.Queue()
+            return self._queues[repo]
+
+    def _is_duplicate(self, delivery):
+        if not delivery:
+            return False
+        with self._lock:
+            if delivery in self._seen:
+                return True
+            self._seen.add(delivery)
+            self._seen_order.append(delivery)
+            if len(self._seen_order) > self._remember:
+                self._seen.discard(self._seen_order.popleft())
+            return False
+
+    def submit(self, event, payload, delivery=None):
+        """:return: die erzeugten Arbeitseinträge (leer bei Duplikaten und irrelevanten Ereignissen)"""
+        if self._is_duplicate(delivery):
+            return []
+        self.received += 1
+        work = translate_event(event, payload)
+        for item in work:
+            self._queue(item["repo"]).put(item)
+        return work
+
+    def wait_for_work(self, repo, timeout):
+        """
+        Wartet bis zu timeout Sekunden auf das erste Ereignis und sammelt dann alles ein, was
+        innerhalb von WEBHOOK_SETTLE Sekunden nachkommt.
+        :return: Liste von Arbeitseinträgen, leer nach Ablauf von timeout
+        """
+        q = self._queue(repo)
+        try:
+            items = [q.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                items.append(q.get(timeout=WEBHOOK_SETTLE))
+            except queue.Empty:
+                return items
+
+
+_event_queue = EventQueue()
+
+
+def get_event_queue():
+    return _event_queue
@@ -2,8 +2,15 @@
 import os
 import json
 import base64
+import time
+import random
+import threading
+import contextvars
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from metrics import timed
 
 # Lade Umgebungsvariablen aus zentraler .env
 load_dotenv()
@@ -11,87 +18,673 @@ load_dotenv()
 GITHUB_USERNAME = os.getenv("GITHUB_USERNAME")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
-HEADERS = {
-    "Authorization": f"token {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github+json"
-}
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+# "http" = echtes GitHub (bzw. GITHUB_API_URL), "local" = SQLite-Ersatz im Prozess (siehe local_github)
+GITHUB_BACKEND = os.getenv("GITHUB_BACKEND", "http")
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "30"))
+GITHUB_POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", "10"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "4"))
+GITHUB_BACKOFF_BASE = float(os.getenv("GITHUB_BACKOFF_BASE", "1.0"))
+GITHUB_BACKOFF_MAX = float(os.getenv("GITHUB_BACKOFF_MAX", "60"))
+# Ab so wenigen verbleibenden Anfragen wird bis zum Reset des Kontingents gewartet
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "20"))
+# Mindestabstand zwischen schreibenden Aufrufen (GitHub empfiehlt 1 s gegen sekundäre Limits)
+GITHUB_WRITE_INTERVAL = float(os.getenv("GITHUB_WRITE_INTERVAL", "1.0"))
+GITHUB_BRANCH = os.getenv("GITHUB_BRANCH", "main")
+# Kleinere Dateien gehen direkt als Inhalt in den Tree (spart den Blob-Aufruf pro Datei)
+GITHUB_INLINE_BLOB_BYTES = int(os.getenv("GITHUB_INLINE_BLOB_BYTES", str(64 * 1024)))
+# So lange beantwortet der Issue-Index Abfragen, ohne bei GitHub nachzufragen
+ISSUE_INDEX_TTL = float(os.getenv("ISSUE_INDEX_TTL", "30"))
+# Sammel-Operationen: GraphQL-Mutationen pro Anfrage; GITHUB_GRAPHQL=0 erzwingt REST
+GITHUB_GRAPHQL = os.getenv("GITHUB_GRAPHQL", "1") != "0"
+GITHUB_GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", f"{GITHUB_API_URL.rstrip('/')}/graphql")
+GITHUB_GRAPHQL_BATCH = int(os.getenv("GITHUB_GRAPHQL_BATCH", "20"))
+
+# Unsere PATCH-Aufrufe setzen absolute Werte (Labels, Status) und dürfen daher wiederholt werden
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "PATCH"}
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+RETRY_STATUS = {500, 502, 503, 504}
+
+
+def log(msg):
+    print(f"🐙 [github_utils] {msg}")
+
+
+class GitHubClient:
+    """
+    Eine Keep-Alive-Session für alle GitHub-Aufrufe. Liest X-RateLimit-Remaining/-Reset
+    und Retry-After mit, bremst vor Erreichen des Limits selbst ab, hält Abstand zwischen
+    schreibenden Aufrufen und wiederholt Aufrufe bei Rate-Limits, 5xx und Verbindungsfehlern
+    mit exponentiellem Backoff – nicht-idempotente Aufrufe nur, wenn GitHub sie sicher
+    abgelehnt hat (Rate-Limit).
+    """
+
+    def __init__(self, token=GITHUB_TOKEN, base_url=GITHUB_API_URL, timeout=GITHUB_TIMEOUT,
+                 pool_size=GITHUB_POOL_SIZE, max_retries=GITHUB_MAX_RETRIES):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/vnd.github+json"})
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self.remaining = None
+        self.reset_at = None
+        self.blocked_until = 0.0
+        self.last_write = 0.0
+
+    def url(self, path):
+        return path if path.startswith("http") else f"{self.base_url}/{path.lstrip('/')}"
+
+    def _throttle(self, method):
+        with self._lock:
+            now = time.time()
+            wait = self.blocked_until - now
+            if self.remaining is not None and self.remaining <= GITHUB_RATE_LIMIT_RESERVE and self.reset_at:
+                wait = max(wait, self.reset_at - now + 1)
+            if method in WRITE_METHODS:
+                wait = max(wait, self.last_write + GITHUB_WRITE_INTERVAL - now)
+                self.last_write = now + max(wait, 0)
+        if wait > 0:
+            if wait > 5:
+                log(f"⏳ Rate-Limit: warte {wait:.0f} s (noch {self.remaining} Anfragen)")
+            time.sleep(wait)
+
+    def _update_limits(self, res):
+        with self._lock:
+            if "X-RateLimit-Remaining" in res.headers:
+                self.remaining = int(res.headers["X-RateLimit-Remaining"])
+                self.reset_at = float(res.headers.get("X-RateLimit-Reset", 0)) or None
+
+    def _rate_limit_delay(self, res):
+        """Wartezeit, wenn die Antwort ein (primäres oder sekundäres) Rate-Limit meldet, sonst None."""
+        if res.status_code not in (403, 429):
+            return None
+        if "Retry-After" in res.headers:
+            return float(res.headers["Retry-After"])
+        if res.headers.get("X-RateLimit-Remaining") == "0":
+            return max(1.0, float(res.headers.get("X-RateLimit-Reset", time.time())) - time.time() + 1)
+        if res.status_code == 429 or "secondary rate limit" in res.text.lower():
+            return 60.0
+        return None  # normales 403: fehlende Berechtigung, Wiederholen hilft nicht
+
+    def _backoff(self, attempt):
+        delay = min(GITHUB_BACKOFF_MAX, GITHUB_BACKOFF_BASE * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def request(self, operation, method, path, **kwargs):
+        """
+        :param operation: Name für Metriken/Tracing ("github.<operation>")
+        :param path: Pfad relativ zur API (z. B. "repos/x/y/issues") oder absolute URL
+        """
+        method = method.upper()
+        url = self.url(path)
+        kwargs.setdefault("timeout", self.timeout)
+        with timed(f"github.{operation}") as m:
+            for attempt in range(self.max_retries + 1):
+                self._throttle(method)
+                try:
+                    res = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if method not in IDEMPOTENT_METHODS or attempt == self.max_retries:
+                        raise
+                    delay = self._backoff(attempt)
+                    log(f"🔁 {operation}: {e.__class__.__name__} – neuer Versuch in {delay:.1f} s")
+                else:
+                    self._update_limits(res)
+                    m["bytes_sent"] = m.get("bytes_sent", 0) + len(res.request.body or b"")
+                    m["bytes_received"] = m.get("bytes_received", 0) + len(res.content)
+                    delay = self._rate_limit_delay(res)
+                    if delay is not None:
+                        with self._lock:
+                            self.blocked_until = max(self.blocked_until, time.time() + delay)
+                        log(f"🚦 {operation}: Rate-Limit ({res.status_code}) – neuer Versuch in {delay:.0f} s")
+                        delay = 0  # _throttle wartet bis blocked_until
+                    elif res.status_code in RETRY_STATUS and method in IDEMPOTENT_METHODS:
+                        delay = self._backoff(attempt)
+                        log(f"🔁 {operation}: HTTP {res.status_code} – neuer Versuch in {delay:.1f} s")
+                    else:
+                        if res.status_code >= 400:
+                            m["errors"] = 1
+                        return res
+                    if attempt == self.max_retries:
+                        m["errors"] = 1
+                        return res
+                m["retries"] = attempt + 1
+                time.sleep(delay)
+        return res
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_github_client():
+    """
+    Das Backend für alle GitHub-Aufrufe. Jedes Backend bietet
+    request(operation, method, path, **kwargs) und liefert ein Objekt mit der Schnittstelle
+    von requests.Response (status_code, headers, links, json(), text, raise_for_status()).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            if GITHUB_BACKEND == "local":
+                from local_github import LocalGitHub
+                _client = LocalGitHub()
+                log(f"🏠 Lokales GitHub-Backend: {_client.path}")
+            else:
+                _client = GitHubClient()
+        return _client
+
+def set_github_client(client):
+    """Backend austauschen, z. B. für Benchmarks oder Tests mit einer eigenen Datenbank."""
+    global _client
+    with _client_lock:
+        _client = client
+
+def github_request(operation, method, path, **kwargs):
+    """Einstieg für alle Module, die GitHub direkt ansprechen (z. B. design_agent, devops_agent)."""
+    return get_github_client().request(operation, method, path, **kwargs)
 
 def create_or_update_repo(repo_name, description="KI-Projekt"):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo_name}"
-    res = requests.get(url, headers=HEADERS)
+    url = f"repos/{GITHUB_USERNAME}/{repo_name}"
+    res = github_request("create_or_update_repo", "GET", url)
     if res.status_code == 200:
         repo_info = res.json()
         if repo_info.get("description", "") != description:
-            patch = requests.patch(url, headers=HEADERS, json={"description": description})
+            patch = github_request("create_or_update_repo", "PATCH", url, json={"description": description})
         return True
     data = {"name": repo_name, "description": description, "private": False}
-    r = requests.post("https://api.github.com/user/repos", json=data, headers=HEADERS)
+    r = github_request("create_or_update_repo", "POST", "user/repos", json=data)
     return r.status_code == 201
 
+# --- Issues: Index mit bedingten Abfragen ---------------------------------------------------
+
+class IssueIndex:
+    """
+    Alle Issues eines Repositories im Speicher, damit Abfragen nach Status und Labels
+    ohne Netzwerkzugriff beantwortet werden.
+
+    Die erste Synchronisation lädt alle Seiten (state=all). Danach wird höchstens alle
+    ISSUE_INDEX_TTL Sekunden nur das Delta seit einem festen Zeitstempel abgefragt – mit
+    If-None-Match, sodass "nichts geändert" als 304 zurückkommt und kein Kontingent kostet.
+    Eigene Anlage-, Label- und Schließ-Aufrufe schreiben ihre Antwort direkt in den Index.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.issues = {}        # Nummer -> Issue (siehe _store)
+        self.since = None       # Zeitstempel für die Delta-Abfragen
+        self.etag = None        # ETag der ersten Delta-Seite
+        self.synced_at = None   # time.monotonic() der letzten Abfrage
+        self._lock = threading.RLock()
+
+    def _store(self, raw):
+        if "pull_request" in raw:
+            return
+        self.issues[raw["number"]] = {
+            "issue_number": raw["number"],
+            "node_id": raw.get("node_id"),
+            "title": raw["title"],
+            "body": raw.get("body") or "",
+            "labels": [l["name"] for l in raw.get("labels", [])],
+            "state": raw.get("state", "open"),
+            "updated_at": raw.get("updated_at", ""),
+        }
+
+    def _fetch(self, params, etag=None):
+        """
+        Lädt alle Seiten der Abfrage (Link-Header rel="next").
+        :return: (Issues, ETag der ersten Seite, Seitenanzahl) oder None bei 304
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        url = f"repos/{GITHUB_USERNAME}/{self.repo}/issues"
+        res = github_request("list_issues", "GET", url, params=params, headers=headers)
+        if res.status_code == 304:
+            return None
+        res.raise_for_status()
+        first_etag = res.headers.get("ETag")
+        items, pages = res.json(), 1
+        while "next" in res.links:
+            res = github_request("list_issues", "GET", res.links["next"]["url"])
+            res.raise_for_status()
+            items.extend(res.json())
+            pages += 1
+        return items, first_etag, pages
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and self.synced_at is not None and time.monotonic() - self.synced_at < ISSUE_INDEX_TTL:
+                return
+            params = {"state": "all", "per_page": 100, "sort": "updated", "direction": "desc"}
+            if self.since:
+                params["since"] = self.since
+            try:
+                result = self._fetch(params, self.etag)
+            except requests.RequestException as e:
+                # Lieber mit dem bekannten Stand weiterarbeiten als den Lauf abzubrechen
+                log(f"⚠️ Issues von {self.repo} konnten nicht geladen werden: {e}")
+                return
+            self.synced_at = time.monotonic()
+            if result is None:
+                return  # 304: seit der letzten Abfrage unverändert
+            items, etag, pages = result
+            for raw in items:
+                self._store(raw)
+            newest = max((i["updated_at"] for i in self.issues.values()), default=None)
+            if self.since is None or (pages > 1 and newest != self.since):
+                # Delta passt nicht mehr auf eine Seite: Zeitstempel nachziehen. Bis dahin bleibt
+                # er fest, denn nur für dieselbe URL liefert GitHub 304.
+                self.since = newest
+                self.etag = None
+                log(f"🔄 {len(self.issues)} Issues von {self.repo} geladen ({pages} Seite(n))")
+            else:
+                # Sortiert nach updated_at landet jede Änderung auf der ersten Seite – deren ETag reicht
+                self.etag = etag
+
+    def apply(self, raw):
+        """Übernimmt ein Issue aus der Antwort eines eigenen schreibenden Aufrufs."""
+        with self._lock:
+            self._store(raw)
+
+    def query(self, state="open", labels=None):
+        """
+        :param state: "open", "closed" oder "all"
+        :param labels: nur Issues, die alle diese Labels tragen
+        :return: Issues, neueste zuerst
+        """
+        self.refresh()
+        with self._lock:
+            issues = [
+                dict(i) for i in self.issues.values()
+                if (state == "all" or i["state"] == state) and all(l in i["labels"] for l in labels or [])
+            ]
+        return sorted(issues, key=lambda i: i["issue_number"], reverse=True)
+
+    def get(self, issue_number):
+        self.refresh()
+        with self._lock:
+            issue = self.issues.get(issue_number)
+            return dict(issue) if issue else None
+
+
+_issue_indexes = {}
+_issue_indexes_lock = threading.Lock()
+
+
+def get_issue_index(repo):
+    with _issue_indexes_lock:
+        if repo not in _issue_indexes:
+            _issue_indexes[repo] = IssueIndex(repo)
+        return _issue_indexes[repo]
+
+def _apply_issue_response(repo, res):
+    if res.status_code in (200, 201):
+        get_issue_index(repo).apply(res.json())
+
 def create_github_issue(repo, title, body="", labels=None):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/issues"
+    url = f"repos/{GITHUB_USERNAME}/{repo}/issues"
     data = {"title": title, "body": body, "labels": labels or ["open"]}
-    return requests.post(url, headers=HEADERS, json=data)
+    res = github_request("create_github_issue", "POST", url, json=data)
+    _apply_issue_response(repo, res)
+    return res
+
+# IDs der Kommentare, die die Agenten selbst geschrieben haben (Webhooks sollen darauf nicht reagieren)
+OWN_COMMENT_IDS = set()
 
 def comment_on_issue(repo, issue_number, comment_text):
-    github_token = os.getenv("GITHUB_TOKEN")
-    if not github_token:
-        raise EnvironmentError("GITHUB_TOKEN nicht gesetzt")
-
-    url = f"https://api.github.com/repos/{repo}/issues/{issue_number}/comments"
-    headers = {
-        "Authorization": f"Bearer {github_token}",
-        "Accept": "application/vnd.github+json"
-    }
+    url = f"repos/{GITHUB_USERNAME}/{repo}/issues/{issue_number}/comments"
     data = {
         "body": comment_text
     }
 
-    response = requests.post(url, headers=headers, json=data)
+    response = github_request("comment_on_issue", "POST", url, json=data)
     if response.status_code == 201:
+        OWN_COMMENT_IDS.add(response.json().get("id"))
         print(f"💬 Kommentar zu Issue #{issue_number} erfolgreich erstellt.")
     else:
         print(f"⚠️ Fehler beim Kommentieren: {response.status_code} – {response.text}")
 
+def get_open_issues(repo, labels=None):
+    """Offene Issues aus dem Index (ohne Body, damit Prompts klein bleiben)."""
+    return [
+        {"issue_number": i["issue_number"], "title": i["title"], "labels": i["labels"]}
+        for i in get_issue_index(repo).query("open", labels)
+    ]
 
-def get_open_issues(repo):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/issues"
-    res = requests.get(url, headers=HEADERS, params={"state": "open"})
-    issues = []
-    if res.status_code == 200:
-        for i in res.json():
-            if "pull_request" not in i:
-                labels = [l["name"] for l in i.get("labels", [])]
-                issues.append({
-                    "issue_number": i["number"],
-                    "title": i["title"],
-                    "labels": labels
-                })
-    return issues
-
-def get_all_issues(repo):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/issues"
-    res = requests.get(url, headers=HEADERS)
-    return res.json() if res.status_code == 200 else []
+def get_all_issues(repo, labels=None):
+    """Alle Issues (offen und geschlossen) inklusive Body und Status."""
+    return get_issue_index(repo).query("all", labels)
+
+def get_issue(repo, issue_number):
+    return get_issue_index(repo).get(issue_number)
 
 def update_issue_labels(repo, issue_number, labels):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/issues/{issue_number}"
-    requests.patch(url, headers=HEADERS, json={"labels": labels})
+    url = f"repos/{GITHUB_USERNAME}/{repo}/issues/{issue_number}"
+    res = github_request("update_issue_labels", "PATCH", url, json={"labels": labels})
+    _apply_issue_response(repo, res)
+    return res
 
-def push_file_to_repo(repo, path, content, message):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/contents/{path}"
+def get_file_sha(repo, path, branch=GITHUB_BRANCH):
+    url = f"repos/{GITHUB_USERNAME}/{repo}/contents/{path}"
+    res = github_request("get_file_sha", "GET", url, params={"ref": branch})
+    return res.json().get("sha") if res.status_code == 200 else None
+
+def push_file_to_repo(repo, path, content, message, branch=GITHUB_BRANCH):
+    """Einzelne Datei über die Contents-API; bestehende Dateien brauchen die sha des alten Blobs."""
+    url = f"repos/{GITHUB_USERNAME}/{repo}/contents/{path}"
     encoded = base64.b64encode(content.encode()).decode()
-    data = {"message": message, "content": encoded}
-    return requests.put(url, headers=HEADERS, json=data)
+    data = {"message": message, "content": encoded, "branch": branch}
+    sha = get_file_sha(repo, path, branch)
+    if sha:
+        data["sha"] = sha
+    return github_request("push_file_to_repo", "PUT", url, json=data)
+
+# --- Git-Data-API: mehrere Dateien in einem Commit ----------------------------------------
+
+def get_branch_head(repo, branch=GITHUB_BRANCH):
+    """
+    :return: (commit_sha, tree_sha) oder None, wenn das Repository noch keinen Commit hat
+    :raises requests.HTTPError: bei allen anderen Fehlern (Auth, Rate-Limit, Serverfehler)
+    """
+    res = github_request("get_branch_head", "GET", f"repos/{GITHUB_USERNAME}/{repo}/git/ref/heads/{branch}")
+    if res.status_code == 409:
+        return None  # GitHub: "Git Repository is empty"
+    if res.status_code == 404:
+        # Branch fehlt – nur ein leeres Repository, wenn es das Repository selbst gibt
+        repo_res = github_request("get_repo", "GET", f"repos/{GITHUB_USERNAME}/{repo}")
+        if repo_res.status_code == 200:
+            return None
+        repo_res.raise_for_status()
+    res.raise_for_status()
+    commit_sha = res.json()["object"]["sha"]
+    res = github_request("get_commit", "GET", f"repos/{GITHUB_USERNAME}/{repo}/git/commits/{commit_sha}")
+    res.raise_for_status()
+    return commit_sha, res.json()["tree"]["sha"]
+
+def create_blob(repo, content):
+    data = {"content": base64.b64encode(content.encode()).decode(), "encoding": "base64"}
+    res = github_request("create_blob", "POST", f"repos/{GITHUB_USERNAME}/{repo}/git/blobs", json=data)
+    res.raise_for_status()
+    return res.json()["sha"]
+
+def _tree_entry(repo, path, content):
+    if content is None:
+        return {"path": path, "mode": "100644", "type": "blob", "sha": None}  # löscht die Datei
+    if len(content.encode()) <= GITHUB_INLINE_BLOB_BYTES:
+        return {"path": path, "mode": "100644", "type": "blob", "content": content}
+    return {"path": path, "mode": "100644", "type": "blob", "sha": create_blob(repo, content)}
+
+def commit_files(repo, files, message, branch=GITHUB_BRANCH, max_attempts=3):
+    """
+    Veröffentlicht mehrere Dateien als genau einen Commit: Blobs → Tree → Commit → Ref.
+    Legt Dateien neu an oder aktualisiert sie; Inhalt None löscht die Datei.
+    Hat sich der Branch in der Zwischenzeit bewegt, wird auf den neuen Stand aufgesetzt.
+
+    :param files: {rel_path: content}
+    :return: sha des neuen Commits oder None, wenn das Repository noch leer ist
+             (dann bleibt nur die Contents-API, siehe push_file_to_repo)
+    """
+    entries = [_tree_entry(repo, path, content) for path, content in files.items()]
+    for attempt in range(max_attempts):
+        head = get_branch_head(repo, branch)
+        if head is None:
+            return None
+        parent_sha, base_tree = head
+        res = github_request(
+            "create_tree", "POST", f"repos/{GITHUB_USERNAME}/{repo}/git/trees",
+            json={"base_tree": base_tree, "tree": entries},
+        )
+        res.raise_for_status()
+        data = {"message": message, "tree": res.json()["sha"], "parents": [parent_sha]}
+        res = github_request("create_commit", "POST", f"repos/{GITHUB_USERNAME}/{repo}/git/commits", json=data)
+        res.raise_for_status()
+        commit_sha = res.json()["sha"]
+        res = github_request(
+            "update_ref", "PATCH", f"repos/{GITHUB_USERNAME}/{repo}/git/refs/heads/{branch}", json={"sha": commit_sha}
+        )
+        if res.status_code == 200:
+            return commit_sha
+        if res.status_code != 422 or attempt == max_attempts - 1:
+            res.raise_for_status()
+        log(f"🔀 {branch} wurde zwischenzeitlich verschoben – Commit wird neu aufgesetzt")
+    return None
 
 def get_file_from_repo(repo, path):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/contents/{path}"
-    res = requests.get(url, headers=HEADERS)
+    url = f"repos/{GITHUB_USERNAME}/{repo}/contents/{path}"
+    res = github_request("get_file_from_repo", "GET", url)
     if res.status_code == 200:
         content = res.json().get("content", "")
         return base64.b64decode(content).decode()
     return ""
 
 def close_issue(repo, issue_number):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo}/issues/{issue_number}"
-    requests.patch(url, headers=HEADERS, json={"state": "closed"})
+    url = f"repos/{GITHUB_USERNAME}/{repo}/issues/{issue_number}"
+    res = github_request("close_issue", "PATCH", url, json={"state": "closed"})
+    _apply_issue_response(repo, res)
+    return res
+
+# --- Sammel-Operationen für Issues ---------------------------------------------------------
+#
+# Bis zu GITHUB_GRAPHQL_BATCH Mutationen gehen als eine GraphQL-Anfrage raus (jeweils mit
+# eigenem Alias, GitHub führt sie nacheinander aus). Lehnt der Server GraphQL ab (z. B. fehlende
+# Berechtigung oder Enterprise ohne GraphQL), wird für den Rest des Laufs auf parallele
+# REST-Aufrufe umgeschaltet. Ergebnis ist immer eine Liste in Eingabereihenfolge:
+# {"ok": bool, "issue_number": int | None, "error": str | None}
+
+ISSUE_FIELDS = """
+fragment IssueFields on Issue {
+  id number title body state updatedAt
+  labels(first: 100) { nodes { name } }
+}
+"""
+
+_graphql_available = GITHUB_GRAPHQL
+_repo_labels = {}  # repo -> {"id": Repository-Node-ID, "labels": {Name: Label-Node-ID}}
+
+
+class GraphQLUnavailable(Exception):
+    def __init__(self, message, done=None):
+        super().__init__(message)
+        self.done = done or []  # Ergebnisse der Blöcke, die vorher schon durchgelaufen sind
+
+
+def github_graphql(operation, query, variables=None):
+    """
+    :return: (data, errors) – errors ist die Liste aus der Antwort (Teilfehler einzelner Aliase)
+    :raises GraphQLUnavailable: wenn der Server die Anfrage als Ganzes abgelehnt hat
+    """
+    res = github_request(operation, "POST", GITHUB_GRAPHQL_URL, json={"query": query, "variables": variables or {}})
+    try:
+        body = res.json()
+    except ValueError:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+    if res.status_code != 200 or body.get("data") is None:
+        raise GraphQLUnavailable(f"HTTP {res.status_code}: {body.get('errors') or body.get('message') or res.text[:200]}")
+    return body["data"], body.get("errors") or []
+
+def _issue_from_graphql(node):
+    """GraphQL-Issue in die Form der REST-Antwort bringen (für IssueIndex.apply)."""
+    return {
+        "node_id": node["id"],
+        "number": node["number"],
+        "title": node["title"],
+        "body": node.get("body") or "",
+        "state": node["state"].lower(),
+        "updated_at": node.get("updatedAt", ""),
+        "labels": [{"name": l["name"]} for l in node["labels"]["nodes"]],
+    }
+
+def _repo_metadata(repo):
+    """Node-ID des Repositories und seiner Labels (einmal pro Lauf geladen)."""
+    if repo not in _repo_labels:
+        data, errors = github_graphql("graphql_repo_labels", """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) { id labels(first: 100) { nodes { id name } } }
+}""", {"owner": GITHUB_USERNAME, "name": repo})
+        repository = data.get("repository")
+        if repository is None:
+            raise GraphQLUnavailable(f"Repository {GITHUB_USERNAME}/{repo} nicht gefunden: {errors}")
+        _repo_labels[repo] = {"id": repository["id"], "labels": {l["name"]: l["id"] for l in repository["labels"]["nodes"]}}
+    return _repo_labels[repo]
+
+def _label_ids(repo, names):
+    """Node-IDs der Labels; fehlende Labels werden angelegt (anders als REST tut GraphQL das nicht)."""
+    known = _repo_metadata(repo)["labels"]
+    for name in names:
+        if name in known:
+            continue
+        res = github_request(
+            "create_label", "POST", f"repos/{GITHUB_USERNAME}/{repo}/labels", json={"name": name, "color": "ededed"}
+        )
+        if res.status_code == 201:
+            known[name] = res.json()["node_id"]
+            continue
+        # z. B. 422, weil ein anderer Prozess das Label gerade angelegt hat – neu laden
+        del _repo_labels[repo]
+        known = _repo_metadata(repo)["labels"]
+        if name not in known:
+            raise GraphQLUnavailable(f"Label '{name}' konnte nicht angelegt werden (HTTP {res.status_code})")
+    return [known[name] for name in names]
+
+def _run_graphql_batch(repo, mutation, input_type, inputs):
+    """Führt eine Mutation für alle inputs in Blöcken zu GITHUB_GRAPHQL_BATCH aus."""
+    results = []
+    for start in range(0, len(inputs), GITHUB_GRAPHQL_BATCH):
+        chunk = inputs[start:start + GITHUB_GRAPHQL_BATCH]
+        variables = ", ".join(f"$i{n}: {input_type}!" for n in range(len(chunk)))
+        fields = "\n".join(f"  m{n}: {mutation}(input: $i{n}) {{ issue {{ ...IssueFields }} }}" for n in range(len(chunk)))
+        query = f"mutation({variables}) {{\n{fields}\n}}\n{ISSUE_FIELDS}"
+        try:
+            data, errors = github_graphql(f"graphql_{mutation}", query, {f"i{n}": item for n, item in enumerate(chunk)})
+        except GraphQLUnavailable as e:
+            raise GraphQLUnavailable(str(e), done=results) from e
+        failed = {e["path"][0]: e.get("message", "") for e in errors if e.get("path")}
+        index = get_issue_index(repo)
+        for n in range(len(chunk)):
+            payload = data.get(f"m{n}")
+            if payload and payload.get("issue"):
+                index.apply(_issue_from_graphql(payload["issue"]))
+                results.append({"ok": True, "issue_number": payload["issue"]["number"], "error": None})
+            else:
+                results.append({"ok": False, "issue_number": None, "error": failed.get(f"m{n}", "keine Antwort")})
+    return results
+
+def _run_rest_concurrently(calls):
+    """
+    Fallback: die einzelnen REST-Aufrufe parallel über den Verbindungspool. Schreibende Aufrufe
+    hält der Client trotzdem GITHUB_WRITE_INTERVAL auseinander – parallel laufen nur die Wartezeiten.
+    :param calls: Liste von (issue_number, Funktion ohne Argumente, die die Response liefert)
+    """
+    def run(number, call):
+        try:
+            res = call()
+        except requests.RequestException as e:
+            return {"ok": False, "issue_number": number, "error": str(e)}
+        if res.status_code in (200, 201):
+            return {"ok": True, "issue_number": res.json().get("number", number), "error": None}
+        return {"ok": False, "issue_number": number, "error": f"HTTP {res.status_code}: {res.text[:200]}"}
+
+    with ThreadPoolExecutor(max_workers=GITHUB_POOL_SIZE, thread_name_prefix="github-bulk") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, run, number, call) for number, call in calls]
+        return [f.result() for f in futures]
+
+def _bulk(repo, operation, build_graphql, rest_calls):
+    global _graphql_available
+    if _graphql_available and getattr(get_github_client(), "supports_graphql", True):
+        try:
+            results = build_graphql()
+        except GraphQLUnavailable as e:
+            # Der Server hat die Anfrage als Ganzes abgelehnt – ausgeführt sind nur die Blöcke davor
+            log(f"⚠️ GraphQL nicht verfügbar, weiter über REST: {e}")
+            _graphql_available = False
+            return _report_bulk(operation, e.done + _run_rest_concurrently(rest_calls()[len(e.done):]))
+        if results is not None:
+            return _report_bulk(operation, results)
+    return _report_bulk(operation, _run_rest_concurrently(rest_calls()))
+
+def _report_bulk(operation, results):
+    failed = [r for r in results if not r["ok"]]
+    log(f"📦 {operation}: {len(results) - len(failed)}/{len(results)} erfolgreich")
+    for r in failed:
+        log(f"   ❌ #{r['issue_number'] or '?'}: {r['error']}")
+    return results
+
+def _issue_node_ids(repo, numbers):
+    """Node-IDs aus dem Issue-Index; None, wenn eine davon unbekannt ist (dann REST)."""
+    index = get_issue_index(repo)
+    ids = [(index.get(n) or {}).get("node_id") for n in numbers]
+    return ids if all(ids) else None
+
+def bulk_create_issues(repo, issues):
+    """
+    :param issues: Liste von {"title": ..., "body": ..., "labels": [...]}
+    :return: Ergebnis pro Issue (siehe oben), issue_number ist die neu vergebene Nummer
+    """
+    if not issues:
+        return []
+
+    def graphql():
+        repository_id = _repo_metadata(repo)["id"]
+        inputs = [
+            {
+                "repositoryId": repository_id,
+                "title": i["title"],
+                "body": i.get("body", ""),
+                "labelIds": _label_ids(repo, i.get("labels") or ["open"]),
+            }
+            for i in issues
+        ]
+        return _run_graphql_batch(repo, "createIssue", "CreateIssueInput", inputs)
+
+    def rest():
+        return [
+            (None, lambda i=i: create_github_issue(repo, i["title"], i.get("body", ""), i.get("labels")))
+            for i in issues
+        ]
+
+    return _bulk(repo, "bulk_create_issues", graphql, rest)
+
+def bulk_update_labels(repo, updates):
+    """
+    Setzt die Labels mehrerer Issues (ersetzt die bisherigen, wie update_issue_labels).
+    :param updates: {issue_number: [labels]}
+    """
+    if not updates:
+        return []
+    numbers = list(updates)
+
+    def graphql():
+        node_ids = _issue_node_ids(repo, numbers)
+        if node_ids is None:
+            return None
+        inputs = [{"id": node_id, "labelIds": _label_ids(repo, updates[n])} for n, node_id in zip(numbers, node_ids)]
+        return _run_graphql_batch(repo, "updateIssue", "UpdateIssueInput", inputs)
+
+    def rest():
+        return [(n, lambda n=n: update_issue_labels(repo, n, updates[n])) for n in numbers]
+
+    return _bulk(repo, "bulk_update_labels", graphql, rest)
+
+def bulk_close_issues(repo, issue_numbers):
+    if not issue_numbers:
+        return []
+    numbers = list(issue_numbers)
+
+    def graphql():
+        node_ids = _issue_node_ids(repo, numbers)
+        if node_ids is None:
+            return None
+        inputs = [{"id": node_id, "state": "CLOSED"} for node_id in node_ids]
+        return _run_graphql_batch(repo, "updateIssue", "UpdateIssueInput", inputs)
+
+    def rest():
+        return [(n, lambda n=n: close_issue(repo, n)) for n in numbers]
+
+    return _bulk(repo, "bulk_close_issues", graphql, rest)
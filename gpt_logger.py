@@ -1,16 +1,177 @@
+"""
+Protokoll aller LLM-Aufrufe als JSONL unter logs/gpt/.
+
+Jeder Aufruf wird ein "call"-Datensatz (Agent, Modell, Prompt-Hash, Latenz, Tokens, Versuch,
+Antwort). Prompt-Texte stehen nur einmal pro Datei als "prompt"-Datensatz darin – Wiederholungen
+desselben mehrere KB langen Prompts verweisen nur noch auf den Hash. Geschrieben wird gesammelt
+in einem Hintergrund-Thread; wird die Datei zu groß, wird sie rotiert und mit gzip komprimiert.
+"""
+
 import os
+import gzip
+import json
+import queue
+import atexit
+import shutil
+import hashlib
+import threading
 from datetime import datetime
 
-LOG_PATH = "logs/gpt/gpt_log.txt"
+GPT_LOG_DIR = os.getenv("GPT_LOG_DIR", "logs/gpt")
+GPT_LOG_FILE = os.path.join(GPT_LOG_DIR, "gpt_log.jsonl")
+GPT_LOG_MAX_BYTES = int(os.getenv("GPT_LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+GPT_LOG_BACKUPS = int(os.getenv("GPT_LOG_BACKUPS", "5"))
+GPT_LOG_FLUSH_INTERVAL = float(os.getenv("GPT_LOG_FLUSH_INTERVAL", "1.0"))
+GPT_LOG_BATCH_SIZE = 200
+
+_STOP = object()
+
+
+def log(msg):
+    print(f"📝 [gpt_logger] {msg}")
+
+def prompt_hash(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+class GPTLogWriter:
+    """Schreibt Datensätze aus einer Queue in Batches; alle Dateizugriffe nur im Writer-Thread."""
+
+    def __init__(self, path=GPT_LOG_FILE, max_bytes=GPT_LOG_MAX_BYTES, backups=GPT_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.Queue()
+        self.seen_prompts = set()
+        self._file = None
+        self._thread = threading.Thread(target=self._run, name="gpt-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record, texts=None):
+        """
+        :param texts: {hash: text} – Prompt-Texte, die nur geschrieben werden, wenn der Hash in
+                      der aktuellen Datei noch nicht vorkommt
+        """
+        self.queue.put((record, texts or {}))
+
+    def close(self):
+        self.queue.put(_STOP)
+        self._thread.join(timeout=10)
+
+    # --- Writer-Thread ------------------------------------------------------------------
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            if self._file.tell() == 0:
+                self.seen_prompts.clear()
+            elif not self.seen_prompts:
+                self._load_seen_prompts()
+        return self._file
+
+    def _load_seen_prompts(self):
+        # Nach einem Neustart in die bestehende Datei weiterschreiben, ohne Prompts zu wiederholen
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if line.startswith('{"type": "prompt"'):
+                    try:
+                        self.seen_prompts.add(json.loads(line)["hash"])
+                    except (ValueError, KeyError):
+                        continue
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}.gz"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}.gz")
+        if self.backups > 0:
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        self.seen_prompts.clear()
+
+    def _write_batch(self, batch):
+        f = self._open()
+        lines = []
+        for record, texts in batch:
+            for digest, text in texts.items():
+                if digest not in self.seen_prompts:
+                    self.seen_prompts.add(digest)
+                    lines.append(json.dumps({"type": "prompt", "hash": digest, "text": text}, ensure_ascii=False))
+            lines.append(json.dumps(record, ensure_ascii=False))
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        if self.max_bytes and f.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=GPT_LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= GPT_LOG_BATCH_SIZE:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except OSError as e:
+                    log(f"⚠️ Schreiben fehlgeschlagen, {len(batch)} Einträge verworfen: {e}")
+        if self._file is not None:
+            self._file.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_gpt_log_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = GPTLogWriter()
+        return _writer
 
-def log_gpt_interaction(agent_name, prompt, response):
-    os.makedirs("logs/gpt", exist_ok=True)
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write("=" * 80 + "\n")
-        f.write(f"[{timestamp}] Agent: {agent_name}\n")
-        f.write(">>> PROMPT:\n")
-        f.write(prompt.strip() + "\n\n")
-        f.write(">>> RESPONSE:\n")
-        f.write(response.strip() + "\n\n")
+@atexit.register
+def _close_writer():
+    if _writer is not None:
+        _writer.close()
 
+def log_gpt_interaction(agent_name, prompt, response, model=None, system=None, latency_ms=None,
+                        prompt_tokens=None, completion_tokens=None, attempt=None, **fields):
+    """
+    Legt einen Aufruf ins Protokoll; kehrt sofort zurück, geschrieben wird im Hintergrund.
+    :param fields: weitere Felder für den Datensatz, z. B. cached=True oder task="code"
+    """
+    texts = {prompt_hash(prompt): prompt}
+    record = {
+        "type": "call",
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "agent": agent_name,
+        "model": model,
+        "prompt_hash": prompt_hash(prompt),
+        "latency_ms": latency_ms,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "attempt": attempt,
+        "response": response,
+    }
+    if system:
+        record["system_hash"] = prompt_hash(system)
+        texts[record["system_hash"]] = system
+    record.update(fields)
+    get_gpt_log_writer().submit(record, texts)
@@ -1,81 +1,652 @@
 import os
 import json
 import re
+import asyncio
+import time
+import threading
+import contextvars
 import requests
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from llm_cache import cache_key, get_llm_cache
+from gpt_logger import log_gpt_interaction
+from metrics import record as record_metric
+from tracing import span
+from llm_concurrency import get_llm_limiter, SlotCancelled
+from json_schemas import validate
+from json_repair import repair_json
+from retry_policy import get_retry_policy, LLMCallAbandoned
+from model_router import route, tier_for, tier_slot, log_fallback, TIER_CONCURRENCY
 
 OLLAMA_URL = os.getenv("OPENAI_API_BASE", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OPENAI_MODEL", "deepseek-coder:6.7b")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "600"))
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "8"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Spekulatives Sampling für JSON-Antworten: so viele Kandidaten gleichzeitig, 0/1 = aus
+LLM_SPECULATIVE_SAMPLES = int(os.getenv("LLM_SPECULATIVE_SAMPLES", "0"))
+SPECULATIVE_TEMPERATURES = (0.2, 0.6, 0.9, 0.4, 1.0)
 
-LOG_PATH = "logs/gpt/gpt_log.txt"
-os.makedirs("logs/gpt", exist_ok=True)
-
-def log_gpt_interaction(agent_name, prompt, response):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write("=" * 80 + "\n")
-        f.write(f"[{timestamp}] Agent: {agent_name}\n")
-        f.write(">>> PROMPT:\n")
-        f.write(prompt.strip() + "\n\n")
-        f.write(">>> RESPONSE:\n")
-        f.write(response.strip() + "\n\n")
-
-def extract_json_from_text(text):
-    try:
-        match = re.search(r"```json\s*(\[.*?\])\s*```", text, re.DOTALL)
-        if match:
-            return json.loads(match.group(1))
-        start = text.find("[")
-        end = text.rfind("]")
-        if start != -1 and end != -1:
-            return json.loads(text[start:end+1])
-    except Exception:
-        pass
-    return None
+def extract_json_from_text(text, schema=None):
+    """
+    Lokale Reparatur vor jedem erneuten LLM-Aufruf: findet den besten (ggf. reparierten)
+    JSON-Wert im Text, siehe json_repair.
+    """
+    return repair_json(text, schema)
 
 def extract_code_block(text, language=None):
     pattern = r"```" + (language if language else "") + r"\s*(.*?)```"
     match = re.search(pattern, text, re.DOTALL)
     return match.group(1).strip() if match else text.strip()
 
-def call_ollama(prompt):
-    response = requests.post(
-        f"{OLLAMA_URL}/api/generate",
-        json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}
+class OllamaError(Exception):
+    pass
+
+
+class StreamStopDetector:
+    """
+    Erkennt im Token-Stream, wann die eigentliche Antwort vollständig ist.
+
+    :param mode: "json" (vollständiger JSON-Wert), "fence" (schließender Codeblock) oder None
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.text = ""
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._fence_open = -1
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self.mode == "json":
+            return self._scan_json()
+        if self.mode == "fence":
+            return self._scan_fence()
+        return False
+
+    def _scan_json(self):
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            if self._depth == 0:
+                if ch in "[{":
+                    self._start = self._pos
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    # Nur echte JSON-Werte zählen – "[WARN]" o. ä. im Fließtext nicht
+                    try:
+                        json.loads(text[self._start:self._pos + 1])
+                        self._pos += 1
+                        return True
+                    except ValueError:
+                        self._start = -1
+            self._pos += 1
+        return False
+
+    def _scan_fence(self):
+        if self._fence_open == -1:
+            idx = self.text.find("```")
+            if idx == -1:
+                return False
+            newline = self.text.find("\n", idx)
+            if newline == -1:
+                return False
+            self._fence_open = newline + 1
+        return self.text.find("```", self._fence_open) != -1
+
+
+class OllamaClient:
+    """
+    Hält eine Keep-Alive-Session zum Ollama-Server und streamt Antworten von /api/generate
+    bzw. /api/chat. Sobald die erwartete Antwort vollständig ist (stop_when), wird der Stream
+    geschlossen und die Generierung damit serverseitig abgebrochen.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, model=OLLAMA_MODEL, timeout=OLLAMA_TIMEOUT, pool_size=OLLAMA_POOL_SIZE,
+                 keep_alive=OLLAMA_KEEP_ALIVE):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _payload(self, model, options, format):
+        payload = {"model": model or self.model, "stream": True}
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        if options:
+            payload["options"] = options
+        if format:
+            payload["format"] = format
+        return payload
+
+    def generate(self, prompt, model=None, options=None, stop_when=None, cancel_event=None, format=None):
+        """
+        Streamt eine Antwort und gibt ein Dict im Format der Ollama-Antwort zurück
+        ("response", "model", "prompt_eval_count", "eval_count", ...), ergänzt um
+        "stopped_early", "cancelled" sowie die clientseitig gemessenen Zeiten
+        "ttft_ms", "prefill_ms" und "decode_ms".
+
+        :param stop_when: "json", "fence" oder None (bis zum Ende lesen)
+        :param cancel_event: optionales threading.Event zum Abbrechen von außen
+        :param format: "json" oder JSON-Schema für eingeschränkte Dekodierung
+        """
+        payload = self._payload(model, options, format)
+        payload["prompt"] = prompt
+        return self._stream("/api/generate", payload, lambda data: data.get("response", ""), stop_when, cancel_event)
+
+    def chat(self, messages, model=None, options=None, stop_when=None, cancel_event=None, format=None):
+        """
+        Wie generate, aber über /api/chat. Bleiben die ersten Nachrichten (System-Prompt)
+        zwischen Aufrufen byte-identisch, kann Ollama den KV-Cache für dieses Präfix weiterverwenden.
+        """
+        payload = self._payload(model, options, format)
+        payload["messages"] = messages
+        return self._stream(
+            "/api/chat", payload, lambda data: (data.get("message") or {}).get("content", ""), stop_when, cancel_event
+        )
+
+    def _stream(self, path, payload, extract, stop_when, cancel_event):
+        detector = StreamStopDetector(stop_when)
+        result = {"model": payload["model"], "stopped_early": False, "cancelled": False}
+        chunks = 0
+        started = time.perf_counter()
+        first_token = None
+
+        response = self.session.post(f"{self.base_url}{path}", json=payload, stream=True, timeout=self.timeout)
+        try:
+            if not response.ok:
+                raise OllamaError(f"Ollama-Fehler: {response.status_code} - {response.text}")
+
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if "error" in data:
+                    raise OllamaError(f"Ollama-Fehler: {data['error']}")
+                chunks += 1
+                if first_token is None:
+                    first_token = time.perf_counter()
+                if detector.feed(extract(data)):
+                    result["stopped_early"] = True
+                    break
+                if data.get("done"):
+                    result.update({k: v for k, v in data.items() if k not in ("response", "message", "context")})
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    result["cancelled"] = True
+                    break
+        finally:
+            # Schließen beendet die Verbindung – Ollama bricht die Generierung dann ab
+            response.close()
+
+        finished = time.perf_counter()
+        first_token = first_token or finished
+        result["response"] = detector.text.strip()
+        result.setdefault("eval_count", chunks)
+        result["ttft_ms"] = round((first_token - started) * 1000, 1)
+        # Serverwerte (ns) bevorzugen; bei vorzeitigem Abbruch fehlen sie, dann Clientmessung
+        if "prompt_eval_duration" in result:
+            result["prefill_ms"] = round(result["prompt_eval_duration"] / 1e6, 1)
+        else:
+            result["prefill_ms"] = result["ttft_ms"]
+        if "eval_duration" in result:
+            result["decode_ms"] = round(result["eval_duration"] / 1e6, 1)
+        else:
+            result["decode_ms"] = round((finished - first_token) * 1000, 1)
+        return result
+
+    def embed(self, text, model):
+        response = self.session.post(
+            f"{self.base_url}/api/embeddings", json={"model": model, "prompt": text}, timeout=self.timeout
+        )
+        if not response.ok:
+            raise OllamaError(f"Ollama-Fehler: {response.status_code} - {response.text}")
+        return response.json().get("embedding", [])
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ollama_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
+
+
+def log(msg):
+    print(f"🤖 [gpt_utils] {msg}")
+
+
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def _record_timing(agent_name, prompt_chars, generation):
+    """
+    Prefill vs. Decode pro Agent. Meldet Ollama deutlich weniger neu bewertete Prompt-Tokens
+    als der Prompt lang ist, wurde ein gecachtes Präfix wiederverwendet.
+    """
+    estimated = prompt_chars // 4
+    evaluated = generation.get("prompt_eval_count")
+    with _timings_lock:
+        stats = _timings.setdefault(agent_name, {
+            "calls": 0, "prefill_ms": 0.0, "decode_ms": 0.0, "prompt_tokens": 0, "prompt_tokens_evaluated": 0,
+        })
+        stats["calls"] += 1
+        stats["prefill_ms"] += generation["prefill_ms"]
+        stats["decode_ms"] += generation["decode_ms"]
+        if evaluated is not None:
+            stats["prompt_tokens"] += estimated
+            stats["prompt_tokens_evaluated"] += evaluated
+    evaluated_text = f"{evaluated}/~{estimated}" if evaluated is not None else f"?/~{estimated}"
+    log(
+        f"⏱️ {agent_name} ({generation['model']}): Prefill {generation['prefill_ms']:.0f} ms "
+        f"(Prompt-Tokens neu: {evaluated_text}), Decode {generation['decode_ms']:.0f} ms"
     )
-    if not response.ok:
-        raise Exception(f"Ollama-Fehler: {response.status_code} - {response.text}")
-    return response.json().get("response", "").strip()
 
-def call_gpt_and_parse_json(agent_name, prompt, max_attempts=10):
-    for attempt in range(max_attempts):
-        result = call_ollama(prompt)
-        log_gpt_interaction(agent_name, prompt, result)
+def get_timing_report():
+    """Pro Agent: Aufrufe, mittlere Prefill-/Decode-Zeit und Anteil wiederverwendeter Prompt-Tokens."""
+    report = {}
+    with _timings_lock:
+        for agent_name, stats in _timings.items():
+            calls = stats["calls"] or 1
+            reuse = 0.0
+            if stats["prompt_tokens"]:
+                reuse = max(0.0, 1 - stats["prompt_tokens_evaluated"] / stats["prompt_tokens"])
+            report[agent_name] = {
+                "calls": stats["calls"],
+                "avg_prefill_ms": round(stats["prefill_ms"] / calls, 1),
+                "avg_decode_ms": round(stats["decode_ms"] / calls, 1),
+                "prefix_reuse": round(reuse, 3),
+            }
+    return report
+
+def _cache_key_for(prompt, stop_when, model, options, format=None, system=None):
+    return cache_key(model, prompt, options, stop_when=stop_when, format=format, system=system)
+
+def _candidates(model, task):
+    """Explizit angegebenes Modell gewinnt, sonst entscheidet der Router anhand des Aufgabentyps."""
+    if model:
+        return [(tier_for(task), model)]
+    return route(task)
 
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise SlotCancelled()
+
+def _generate(prompt, agent_name, stop_when=None, model=None, options=None, cache=True, cancel_event=None,
+              format=None, task=None, system=None, attempt=None):
+    """
+    Ein einzelner Versuch: Cache, dann Budget-/Breaker-Prüfung, dann das Modell der passenden
+    Stufe (mit Fallback auf die nächste Stufe). Mit `system` läuft der Aufruf über /api/chat,
+    sodass der stabile System-Prompt als gemeinsames Präfix gecacht werden kann.
+    Über Erfolg oder Misserfolg der Antwort entscheidet der Aufrufer; protokolliert wird jeder
+    Versuch (siehe gpt_logger).
+    """
+    with span("llm.generate", agent=agent_name, task=task, attempt=attempt) as trace_args:
+        return _generate_in_span(
+            trace_args, prompt, agent_name, stop_when, model, options, cache, cancel_event, format, task, system, attempt
+        )
+
+def _generate_in_span(trace_args, prompt, agent_name, stop_when, model, options, cache, cancel_event, format, task,
+                      system, attempt):
+    candidates = _candidates(model, task)
+    llm_cache = get_llm_cache() if cache else None
+    if llm_cache is not None:
+        key = _cache_key_for(prompt, stop_when, candidates[0][1], options, format, system)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            log_gpt_interaction(
+                agent_name, prompt, cached, model=candidates[0][1], system=system, latency_ms=0,
+                attempt=attempt, task=task, cached=True,
+            )
+            record_metric("llm.cache_hit", 0, agent=agent_name)
+            trace_args["cached"] = True
+            return cached
+
+    policy = get_retry_policy()
+    policy.check(agent_name)
+    client = get_ollama_client()
+    started = time.monotonic()
+    for position, (tier, candidate_model) in enumerate(candidates):
         try:
-            return json.loads(result)
-        except json.JSONDecodeError:
-            parsed = extract_json_from_text(result)
-            if parsed:
-                return parsed
+            _check_cancelled(cancel_event)
+            # Stufe zuerst, dann der gemeinsame faire Slot – der wird so nur von Aufrufen
+            # belegt, deren Modell auch tatsächlich rechnen kann
+            with tier_slot(tier, cancel_event), get_llm_limiter().slot(agent_name, cancel_event):
+                # Beim Warten kann z. B. ein anderer Kandidat gewonnen haben – dann keinen Prefill starten
+                _check_cancelled(cancel_event)
+                if system:
+                    generation = client.chat(
+                        [{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+                        model=candidate_model, options=options, stop_when=stop_when,
+                        cancel_event=cancel_event, format=format,
+                    )
+                else:
+                    generation = client.generate(
+                        prompt, model=candidate_model, options=options, stop_when=stop_when,
+                        cancel_event=cancel_event, format=format,
+                    )
+            break
+        except SlotCancelled:
+            # Nie an Ollama geschickt – zählt nicht als Versuch
+            trace_args["cancelled"] = True
+            return ""
+        except (OllamaError, requests.RequestException) as e:
+            policy.record_attempt(agent_name)
+            record_metric("llm.generate", (time.monotonic() - started) * 1000, agent=agent_name, errors=1)
+            if position == len(candidates) - 1:
+                policy.record_failure(agent_name)
+                raise
+            log_fallback(candidate_model, candidates[position + 1][1], e)
 
-            # GPT um Hilfe bitten
-            fallback_prompt = f"""
-Die folgende GPT-Antwort konnte nicht als JSON interpretiert werden.
+    # Bei vorzeitigem Abbruch fehlt prompt_eval_count – grob mit 4 Zeichen pro Token schätzen
+    prompt_chars = len(prompt) + len(system or "")
+    tokens = generation.get("prompt_eval_count", prompt_chars // 4) + generation.get("eval_count", 0)
+    policy.record_attempt(agent_name, tokens)
+    _record_timing(agent_name, prompt_chars, generation)
+    result = generation["response"]
+    latency_ms = (time.monotonic() - started) * 1000
+    completion_tokens = generation.get("eval_count", 0)
+    record_metric(
+        "llm.generate", latency_ms, agent=agent_name,
+        tokens_per_sec=completion_tokens / (generation["decode_ms"] / 1000) if generation["decode_ms"] else None,
+        prompt_tokens=generation.get("prompt_eval_count", prompt_chars // 4), completion_tokens=completion_tokens,
+        bytes_sent=len(prompt.encode("utf-8")) + len((system or "").encode("utf-8")),
+        bytes_received=len(result.encode("utf-8")), retries=1 if attempt and attempt > 1 else 0,
+    )
+    trace_args.update(
+        model=generation["model"], prompt_tokens=generation.get("prompt_eval_count"),
+        completion_tokens=completion_tokens, prefill_ms=generation["prefill_ms"], decode_ms=generation["decode_ms"],
+    )
+    log_gpt_interaction(
+        agent_name, prompt, result, model=generation["model"], system=system,
+        latency_ms=round(latency_ms),
+        prompt_tokens=generation.get("prompt_eval_count"), completion_tokens=generation.get("eval_count"),
+        attempt=attempt, task=task, stopped_early=generation["stopped_early"], cancelled=generation["cancelled"],
+    )
+
+    if llm_cache is not None and result and not generation["cancelled"]:
+        llm_cache.put(key, result)
+    return result
+
+def call_ollama(prompt, stop_when=None, model=None, options=None, cache=True, cancel_event=None, format=None,
+                agent_name="default", task=None, system=None):
+    """
+    :param cache: False für Prompts, deren Antwort absichtlich nicht deterministisch sein soll
+    :param cancel_event: optionales threading.Event, das den laufenden Stream abbricht
+    :param format: "json" oder ein JSON-Schema; Ollama schränkt die Ausgabe dann beim Dekodieren ein
+    :param agent_name: Budget und Circuit Breaker werden pro Agent geführt (siehe retry_policy)
+    :param task: Aufgabentyp für die Modellwahl (siehe model_router.TASK_TIERS), z. B. "summary"
+    :param system: stabiler System-Prompt (siehe prompt_templates); schaltet auf /api/chat um
+    """
+    result = _generate(prompt, agent_name, stop_when, model, options, cache, cancel_event, format, task, system)
+    policy = get_retry_policy()
+    if result:
+        policy.record_success(agent_name)
+    else:
+        policy.record_failure(agent_name)
+    return result
+
+def _parse_json_answer(result, schema=None):
+    """
+    Gibt (parsed, errors) zurück. Ohne Schema gilt wie bisher jede nicht-leere JSON-Antwort.
+    """
+    try:
+        parsed = json.loads(result)
+    except json.JSONDecodeError:
+        parsed = extract_json_from_text(result, schema)
 
-Ursprünglicher Prompt:
+    if schema is None:
+        return (parsed, []) if parsed else (None, ["Antwort ist kein gültiges JSON."])
+    if parsed is None:
+        return None, ["Antwort ist kein gültiges JSON."]
+    errors = validate(parsed, schema)
+    return (None, errors) if errors else (parsed, [])
+
+def _retry_prompt(prompt, result, errors, schema=None):
+    # Immer vom ursprünglichen Prompt ausgehen, damit der Prompt nicht mit jedem Versuch wächst
+    expected = "JSON-Objekt" if schema and schema.get("type") == "object" else "JSON-Array"
+    error_lines = "\n".join(f"- {e}" for e in errors[:5])
+    return f"""{prompt}
+
+Deine vorherige Antwort war ungültig:
+{error_lines}
+
+Anfang der vorherigen Antwort:
 \"\"\"
-{prompt}
+{result[:500]}
 \"\"\"
 
-GPT-Antwort:
+Bitte gib die korrigierte Antwort **ausschließlich** als gültiges {expected} zurück.
+"""
+
+def _repair_prompt(result, errors):
+    error_lines = "\n".join(f"- {e}" for e in errors[:5])
+    return f"""
+Die folgende Antwort sollte gültiges JSON sein, ist es aber nicht:
+{error_lines}
+
 \"\"\"
 {result}
 \"\"\"
 
-Bitte gib die korrigierte Antwort **ausschließlich** als gültiges JSON-Array zurück.
+Korrigiere nur die Syntax bzw. die genannten Fehler und gib **ausschließlich** das korrigierte JSON zurück.
 """
-            prompt = fallback_prompt
 
-    raise ValueError("GPT konnte nach mehreren Versuchen kein gültiges JSON liefern.")
+def _needs_llm_repair(result):
+    # Ohne jede Klammer gibt es nichts zu reparieren – dann lieber neu generieren
+    return "{" in result or "[" in result
+
+def _repair_with_llm(agent_name, result, errors, schema, cache):
+    """Zweite Stufe nach json_repair: ein kleines Modell korrigiert die Antwort statt neu zu generieren."""
+    repair_prompt = _repair_prompt(result, errors)
+    try:
+        repaired = _generate(
+            repair_prompt, agent_name, stop_when="json", cache=cache, format=schema or "json", task="json_repair"
+        )
+    except (OllamaError, requests.RequestException):
+        return None, errors
+    return _parse_json_answer(repaired, schema)
+
+def _forget_answer(prompt, cache, schema=None, task=None, system=None, options=None):
+    # Unbrauchbare Antwort nicht wiederverwenden
+    llm_cache = get_llm_cache() if cache else None
+    if llm_cache is not None:
+        llm_cache.invalidate(_cache_key_for(prompt, "json", _candidates(None, task)[0][1], options, schema, system))
+
+def _speculative_options(index):
+    return {"seed": index + 1, "temperature": SPECULATIVE_TEMPERATURES[index % len(SPECULATIVE_TEMPERATURES)]}
+
+def _speculate(agent_name, prompt, samples, cache, schema, task, system, attempt=None):
+    """
+    Startet `samples` Generierungen gleichzeitig (je eigener Seed und eigene Temperatur) und
+    prüft jede, sobald ihr Stream fertig ist. Die erste gültige Antwort gewinnt, die übrigen
+    Streams werden abgebrochen; noch wartende Kandidaten schicken ihre Anfrage gar nicht erst ab.
+    Mehr Kandidaten, als die Stufe gleichzeitig rechnen darf (TIER_CONCURRENCY), werden nicht gestartet.
+    :return: (parsed, result, errors) – ohne Gewinner die zuerst eingetroffene unbrauchbare Antwort
+    """
+    samples = max(1, min(samples, TIER_CONCURRENCY[tier_for(task)]))
+    cancel_events = [threading.Event() for _ in range(samples)]
+
+    def _sample(index):
+        result = _generate(
+            prompt, agent_name, stop_when="json", options=_speculative_options(index), cache=cache,
+            cancel_event=cancel_events[index], format=schema, task=task, system=system, attempt=attempt,
+        )
+        return result, _parse_json_answer(result, schema)
+
+    failed = None
+    last_error = None
+    executor = ThreadPoolExecutor(max_workers=samples, thread_name_prefix=f"speculate-{agent_name}")
+    # Kontext kopieren, damit die Kandidaten im aktuellen Tracing-Span landen
+    futures = {executor.submit(contextvars.copy_context().run, _sample, index): index for index in range(samples)}
+    try:
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result, (parsed, errors) = future.result()
+            except (OllamaError, requests.RequestException, LLMCallAbandoned) as e:
+                last_error = e
+                continue
+            if not errors:
+                log(f"🏁 {agent_name}: Kandidat {index + 1}/{samples} gültig – restliche Streams abgebrochen")
+                return parsed, result, []
+            _forget_answer(prompt, cache, schema, task, system, _speculative_options(index))
+            failed = failed or (result, errors)
+    finally:
+        for event in cancel_events:
+            event.set()
+        executor.shutdown(wait=False)
+
+    if failed is None:
+        raise last_error
+    return None, failed[0], failed[1]
+
+def call_gpt_and_parse_json(agent_name, prompt, max_attempts=None, cache=True, schema=None, task=None, system=None,
+                            speculative=None):
+    """
+    :param max_attempts: Versuche für diesen Aufruf (Standard: LLM_CALL_MAX_ATTEMPTS);
+                         Lauf- und Agentenbudget gelten zusätzlich.
+    :param schema: JSON-Schema der erwarteten Antwort (siehe json_schemas). Es wird als
+                   `format` an Ollama übergeben und die Antwort lokal dagegen validiert.
+    :param task: Aufgabentyp für die Modellwahl; Reparaturen laufen immer als "json_repair"
+    :param system: stabiler System-Prompt; Wiederholungen ändern nur die Nutzer-Nachricht
+    :param speculative: Anzahl gleichzeitiger Kandidaten pro Versuch (Standard: LLM_SPECULATIVE_SAMPLES);
+                        die erste gültige Antwort gewinnt, siehe _speculate
+    """
+    policy = get_retry_policy()
+    max_attempts = max_attempts or policy.call_max_attempts
+    samples = LLM_SPECULATIVE_SAMPLES if speculative is None else speculative
+    current_prompt = prompt
+    last_error = "kein gültiges JSON"
+    for attempt in range(max_attempts):
+        time.sleep(policy.backoff_delay(attempt))
+        try:
+            if samples > 1:
+                parsed, result, errors = _speculate(
+                    agent_name, current_prompt, samples, cache, schema, task, system, attempt + 1
+                )
+            else:
+                result = _generate(
+                    current_prompt, agent_name, stop_when="json", cache=cache, format=schema, task=task,
+                    system=system, attempt=attempt + 1,
+                )
+                parsed, errors = _parse_json_answer(result, schema)
+        except (OllamaError, requests.RequestException) as e:
+            last_error = str(e)
+            continue
+
+        if errors and _needs_llm_repair(result):
+            parsed, errors = _repair_with_llm(agent_name, result, errors, schema, cache)
+        if not errors:
+            policy.record_success(agent_name)
+            return parsed
+
+        policy.record_failure(agent_name)
+        _forget_answer(current_prompt, cache, schema, task, system)
+        current_prompt = _retry_prompt(prompt, result, errors, schema)
+        last_error = errors[0]
+
+    raise policy.give_up(agent_name, f"kein gültiges JSON nach {max_attempts} Versuchen ({last_error})")
+
+
+# --- Asynchrone Variante -------------------------------------------------------------
+
+async def _agenerate(prompt, agent_name, **kwargs):
+    # Den Slot holt _generate selbst (prozessweiter Limiter); wird die Coroutine abgebrochen,
+    # gibt der Thread einen noch wartenden Platz frei bzw. beendet den Stream
+    cancel_event = threading.Event()
+    try:
+        return await asyncio.to_thread(_generate, prompt, agent_name, cancel_event=cancel_event, **kwargs)
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+
+async def acall_ollama(prompt, agent_name="default", stop_when=None, model=None, options=None, cache=True,
+                       format=None, task=None, system=None):
+    """
+    Wie call_ollama, aber als Coroutine. Die Anzahl gleichzeitiger Generierungen ist auf
+    OLLAMA_NUM_PARALLEL begrenzt; wartende Aufrufe werden reihum pro Agent bedient.
+    Wird die Coroutine abgebrochen, bricht auch der Stream zum Ollama-Server ab.
+    """
+    result = await _agenerate(
+        prompt, agent_name, stop_when=stop_when, model=model, options=options, cache=cache, format=format,
+        task=task, system=system,
+    )
+    policy = get_retry_policy()
+    if result:
+        policy.record_success(agent_name)
+    else:
+        policy.record_failure(agent_name)
+    return result
+
+async def acall_gpt_and_parse_json(agent_name, prompt, max_attempts=None, cache=True, schema=None, task=None,
+                                   system=None):
+    policy = get_retry_policy()
+    max_attempts = max_attempts or policy.call_max_attempts
+    current_prompt = prompt
+    last_error = "kein gültiges JSON"
+    for attempt in range(max_attempts):
+        await asyncio.sleep(policy.backoff_delay(attempt))
+        try:
+            result = await _agenerate(
+                current_prompt, agent_name, stop_when="json", cache=cache, format=schema, task=task, system=system,
+                attempt=attempt + 1,
+            )
+        except (OllamaError, requests.RequestException) as e:
+            last_error = str(e)
+            continue
+
+        parsed, errors = _parse_json_answer(result, schema)
+        if errors and _needs_llm_repair(result):
+            parsed, errors = await asyncio.to_thread(_repair_with_llm, agent_name, result, errors, schema, cache)
+        if not errors:
+            policy.record_success(agent_name)
+            return parsed
+
+        policy.record_failure(agent_name)
+        _forget_answer(current_prompt, cache, schema, task, system)
+        current_prompt = _retry_prompt(prompt, result, errors, schema)
+        last_error = errors[0]
+
+    raise policy.give_up(agent_name, f"kein gültiges JSON nach {max_attempts} Versuchen ({last_error})")
+
+def run_sync(coro):
+    """Führt eine Coroutine aus synchronem Code heraus aus (eigene Event-Loop pro Aufruf)."""
+    return asyncio.run(coro)
+
+def call_ollama_parallel(prompts, agent_name="default", **kwargs):
+    """Synchroner Wrapper: schickt mehrere Prompts gleichzeitig ab, Ergebnisse in Eingabereihenfolge."""
+    async def _gather():
+        return await asyncio.gather(*(acall_ollama(p, agent_name=agent_name, **kwargs) for p in prompts))
+    return run_sync(_gather())
 
+def call_gpt_and_parse_json_parallel(agent_name, prompts, **kwargs):
+    async def _gather():
+        return await asyncio.gather(*(acall_gpt_and_parse_json(agent_name, p, **kwargs) for p in prompts))
+    return run_sync(_gather())
@@ -0,0 +1,280 @@
+"""
+Deterministische Reparatur von fast-gültigem JSON aus LLM-Antworten.
+
+Ein Tokenizer läuft einmal über den Text, sammelt alle balancierten Objekte/Arrays als
+Kandidaten und baut sie als gültiges JSON neu auf. Dabei werden die typischen Fehler
+kleiner Modelle behoben: Fließtext und Codeblöcke um das JSON, Kommas vor `}`/`]`,
+fehlende Kommas, einfache Anführungszeichen, unquotierte Schlüssel, Python-Literale,
+Kommentare, rohe Zeilenumbrüche und unmaskierte Anführungszeichen in Strings (z. B. im
+"code"-Feld) sowie abgeschnittene Antworten. Gewinner ist der größte Kandidat, der zum
+erwarteten Schema passt.
+"""
+
+import re
+import json
+from json_schemas import validate
+
+_NUMBER = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_IDENT = re.compile(r"[A-Za-z_$][\w$\-]*")
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/", "\\": "\\", '"': '"', "'": "'"}
+_CLOSERS = {"{": "}", "[": "]"}
+_VALUE_END = ("string", "number", "literal", "close")
+_VALUE_START = ("string", "number", "literal", "open")
+# Was nach einem Komma folgen muss, damit ein Anführungszeichen davor einen Objekt-Wert beendet:
+# ein Schlüssel – unquotiert nur, wenn danach ein JSON-Wert beginnt (sonst z. B. Darts `style: TextStyle(`)
+_KEY_AHEAD = re.compile(
+    r"""\s*(?:"(?:[^"\\\n]|\\.)*"\s*:|'(?:[^'\\\n]|\\.)*'\s*:"""
+    r"""|[A-Za-z_$][\w$\-]*\s*:\s*(?:["'{\[\d\-]|true\b|false\b|null\b))"""
+)
+
+
+def _next_significant(text, pos):
+    while pos < len(text) and text[pos] in " \t\r\n":
+        pos += 1
+    return text[pos] if pos < len(text) else ""
+
+def _closes_string(text, pos, role):
+    """
+    Ob das Anführungszeichen vor pos den String beendet.
+    :param role: "key" (Schlüssel im Objekt), "value" (Wert im Objekt) oder "item" (sonst)
+    """
+    nxt = _next_significant(text, pos)
+    if nxt == "":
+        return True
+    if role == "value":
+        # Dart-Code im "code"-Feld enthält oft `foo("a", "b")` oder `{"a": 1}` – ein Wert endet nur
+        # vor dem Ende der Struktur oder vor Komma plus nächstem Schlüssel
+        if nxt in "}]":
+            # `{"a": "b"};` im Code: nach der Klammer geht es mit Dart weiter, nicht mit JSON
+            return _next_significant(text, text.index(nxt, pos) + 1) not in (";", ")", ".")
+        if nxt == ",":
+            comma = text.index(",", pos)
+            return _next_significant(text, comma + 1) in ("}", "") or bool(_KEY_AHEAD.match(text, comma + 1))
+        # Fehlendes Komma: direkt der nächste Schlüssel
+        return nxt in "\"'" and bool(_KEY_AHEAD.match(text, pos))
+    return nxt in (",", ":", "}", "]")
+
+def _read_string(text, pos, quote, role="item"):
+    """
+    Liest einen String ab pos (hinter dem öffnenden Anführungszeichen).
+    Ein Anführungszeichen schließt den String nur, wenn danach die Struktur weitergeht (siehe
+    _closes_string) – sonst gehört es zum Inhalt (typisch für Dart-Code im "code"-Feld).
+    """
+    chars = []
+    while pos < len(text):
+        ch = text[pos]
+        if ch == "\\" and pos + 1 < len(text):
+            nxt = text[pos + 1]
+            if nxt == "u" and re.fullmatch(r"[0-9a-fA-F]{4}", text[pos + 2:pos + 6]):
+                chars.append(chr(int(text[pos + 2:pos + 6], 16)))
+                pos += 6
+                continue
+            if nxt in _ESCAPES:
+                chars.append(_ESCAPES[nxt])
+            else:
+                chars.append(ch + nxt)  # unbekannte Escapes (z. B. Regex im Code) wörtlich übernehmen
+            pos += 2
+            continue
+        if ch == quote and _closes_string(text, pos + 1, role):
+            return "".join(chars), pos + 1
+        chars.append(ch)
+        pos += 1
+    return "".join(chars), pos  # abgeschnittener String
+
+def iter_tokens(text):
+    """
+    Streamender Tokenizer: liefert (kind, value) mit kind in
+    open, close, colon, comma, string, number, literal, ident.
+    Außerhalb von Klammern wird alles außer `{`/`[` als Fließtext übersprungen.
+    """
+    stack = []  # offene Klammern, um Schlüssel und Werte zu unterscheiden
+    prev = None
+    pos = 0
+    length = len(text)
+    while pos < length:
+        ch = text[pos]
+        if ch in "{[":
+            stack.append(ch)
+            prev = "open"
+            yield "open", ch
+            pos += 1
+            continue
+        if not stack:
+            pos += 1
+            continue
+        if ch in "}]":
+            stack.pop()
+            prev = "close"
+            yield "close", ch
+            pos += 1
+        elif ch == ":":
+            prev = "colon"
+            yield "colon", ch
+            pos += 1
+        elif ch == ",":
+            prev = "comma"
+            yield "comma", ch
+            pos += 1
+        elif ch == '"' or (ch == "'" and prev in ("open", "comma", "colon")):
+            if stack[-1] != "{":
+                role = "item"
+            else:
+                role = "value" if prev == "colon" else "key"
+            value, pos = _read_string(text, pos + 1, ch, role)
+            prev = "string"
+            yield "string", value
+        elif text.startswith("//", pos):
+            newline = text.find("\n", pos)
+            pos = length if newline == -1 else newline
+        elif text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            pos = length if end == -1 else end + 2
+        elif ch in "-.0123456789":
+            match = _NUMBER.match(text, pos)
+            if match:
+                prev = "number"
+                yield "number", match.group(0)
+                pos = match.end()
+            else:
+                pos += 1
+        elif ch.isalpha() or ch in "_$":
+            match = _IDENT.match(text, pos)
+            word = match.group(0)
+            pos = match.end()
+            if word in _LITERALS:
+                prev = "literal"
+                yield "literal", word
+            else:
+                prev = "ident"
+                yield "ident", word
+        else:
+            pos += 1
+
+def iter_candidates(text):
+    """Liefert die Token-Listen aller balancierten Objekte/Arrays (auch verschachtelte)."""
+    tokens = []
+    starts = []
+    for kind, value in iter_tokens(text):
+        if kind == "open":
+            if not starts:
+                tokens = []
+            starts.append(len(tokens))
+            tokens.append((kind, value))
+        elif kind == "close":
+            if not starts:
+                continue
+            tokens.append((kind, value))
+            start = starts.pop()
+            yield tokens[start:]
+        elif starts:
+            tokens.append((kind, value))
+    if starts:
+        # Abgeschnittene Antwort: den äußersten offenen Wert trotzdem versuchen
+        yield tokens[starts[0]:]
+
+def rebuild(tokens):
+    """Setzt Tokens zu einem JSON-String zusammen und korrigiert dabei Struktur-Fehler."""
+    out = []
+    stack = []
+    prev = None
+    for index, (kind, value) in enumerate(tokens):
+        next_kind = tokens[index + 1][0] if index + 1 < len(tokens) else None
+
+        if kind == "ident":
+            if next_kind != "colon":
+                continue  # Fließtext innerhalb der Klammern verwerfen
+            kind, value = "string", value
+
+        if kind == "comma":
+            if prev in _VALUE_END and next_kind not in ("close", "comma", None):
+                out.append(",")
+                prev = "comma"
+            continue
+
+        if kind == "colon":
+            if prev == "string":
+                out.append(":")
+                prev = "colon"
+            continue
+
+        if kind == "close":
+            if not stack:
+                continue
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(_CLOSERS[stack.pop()])
+            prev = "close"
+            continue
+
+        if kind in _VALUE_START and prev in _VALUE_END:
+            out.append(",")  # fehlendes Komma zwischen zwei Werten
+
+        if kind == "open":
+            stack.append(value)
+            out.append(value)
+        elif kind == "string":
+            out.append(json.dumps(value, ensure_ascii=False))
+        elif kind == "number":
+            out.append(value)
+        elif kind == "literal":
+            out.append(json.dumps(_LITERALS[value]))
+        prev = kind
+
+    if out and out[-1] in (",", ":"):
+        out.pop()
+        if out and prev == "colon":
+            out.pop()  # verwaister Schlüssel am Ende
+    while stack:
+        out.append(_CLOSERS[stack.pop()])
+    return "".join(out)
+
+def repair_json(text, schema=None):
+    """
+    Sucht im Text den besten reparierbaren JSON-Wert und gibt ihn zurück (oder None).
+
+    :param schema: optionales JSON-Schema; ist es angegeben, kommen nur Kandidaten in Frage,
+                   die dagegen validieren.
+    """
+    if not text:
+        return None
+
+    best = None
+    best_size = -1
+    for tokens in iter_candidates(text):
+        try:
+            value = json.loads(rebuild(tokens))
+        except ValueError:
+            continue
+        if not isinstance(value, (dict, list)):
+            continue
+        if schema is not None and validate(value, schema):
+            continue
+        if len(tokens) > best_size:
+            best, best_size = value, len(tokens)
+    return best
+
+
+# Typische kaputte Antworten und das erwartete Ergebnis – `python json_repair.py` prüft sie
+REPAIR_CHECKS = [
+    ("Hier: ```json\n{'a': 1, b: 'x',}\n``` fertig", {"a": 1, "b": "x"}),
+    ('[{"title": "A", "labels": ["qa"]} {"title": "B" "labels": []}]',
+     [{"title": "A", "labels": ["qa"]}, {"title": "B", "labels": []}]),
+    ('{"a": "x", "b": [1, 2', {"a": "x", "b": [1, 2]}),
+    # Unmaskierte Anführungszeichen im Dart-Code
+    ('{"file": "lib/a.dart", "code": "foo("a", "b");"}', {"file": "lib/a.dart", "code": 'foo("a", "b");'}),
+    ('{"file": "lib/a.dart", "code": "Text("hi", style: TextStyle());"}',
+     {"file": "lib/a.dart", "code": 'Text("hi", style: TextStyle());'}),
+    ('{"code": "final m = {"a": "b"};", "file": "x"}', {"code": 'final m = {"a": "b"};', "file": "x"}),
+]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for text, expected in REPAIR_CHECKS:
+        result = repair_json(text)
+        if result != expected:
+            failed += 1
+            print(f"❌ {text!r}\n   erwartet {expected!r}\n   erhalten {result!r}")
+    print(f"{len(REPAIR_CHECKS) - failed}/{len(REPAIR_CHECKS)} Reparaturen korrekt")
+    raise SystemExit(1 if failed else 0)
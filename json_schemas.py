@@ -0,0 +1,140 @@
+"""
+JSON-Schemata für alle strukturierten LLM-Antworten.
+
+Die Schemata werden über das `format`-Feld an Ollama übergeben, sodass die Ausgabe schon
+beim Dekodieren eingeschränkt wird. validate() prüft das Ergebnis anschließend lokal
+(nur die hier benötigte Teilmenge von JSON Schema).
+"""
+
+AGENT_NAMES = ["frontend", "backend", "qa", "devops"]
+
+FEATURE_LIST_SCHEMA = {
+    "type": "array",
+    "minItems": 1,
+    "items": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string", "minLength": 1},
+            "description": {"type": "string"},
+            "priority": {"type": "integer", "minimum": 1},
+        },
+        "required": ["title", "description", "priority"],
+    },
+}
+
+TASK_LIST_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string", "minLength": 1},
+            "body": {"type": "string"},
+            "labels": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+            "depends_on": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["title", "body", "labels"],
+    },
+}
+
+PLAN_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "agent": {"type": "string", "enum": AGENT_NAMES},
+            "issue_number": {"type": "integer"},
+        },
+        "required": ["agent", "issue_number"],
+    },
+}
+
+PRIORITY_LIST_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "number": {"type": "integer"},
+            "priority": {"type": "integer", "minimum": 1, "maximum": 3},
+            "labels": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["number", "priority", "labels"],
+    },
+}
+
+CODE_FILE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "file": {"type": "string", "minLength": 1},
+        "code": {"type": "string", "minLength": 1},
+    },
+    "required": ["file", "code"],
+}
+
+BUG_ISSUE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "minLength": 1},
+        "body": {"type": "string"},
+        "labels": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["title", "body", "labels"],
+}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def _matches_type(value, type_name):
+    if type_name in ("integer", "number") and isinstance(value, bool):
+        return False
+    return isinstance(value, _TYPES[type_name])
+
+def validate(value, schema, path="$"):
+    """
+    Prüft value gegen schema und gibt eine Liste von Fehlermeldungen zurück (leer = gültig).
+    """
+    errors = []
+
+    expected = schema.get("type")
+    if expected:
+        types = expected if isinstance(expected, list) else [expected]
+        if not any(_matches_type(value, t) for t in types):
+            return [f"{path}: erwartet {'/'.join(types)}, erhalten {type(value).__name__}"]
+
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: {value!r} ist keiner von {schema['enum']}")
+
+    if isinstance(value, str) and len(value) < schema.get("minLength", 0):
+        errors.append(f"{path}: Text zu kurz")
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if "minimum" in schema and value < schema["minimum"]:
+            errors.append(f"{path}: {value} < {schema['minimum']}")
+        if "maximum" in schema and value > schema["maximum"]:
+            errors.append(f"{path}: {value} > {schema['maximum']}")
+
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: Feld '{key}' fehlt")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate(value[key], sub_schema, f"{path}.{key}"))
+
+    if isinstance(value, list):
+        if len(value) < schema.get("minItems", 0):
+            errors.append(f"{path}: mindestens {schema['minItems']} Einträge erwartet")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            errors.append(f"{path}: höchstens {schema['maxItems']} Einträge erlaubt")
+        if "items" in schema:
+            for index, item in enumerate(value):
+                errors.extend(validate(item, schema["items"], f"{path}[{index}]"))
+
+    return errors
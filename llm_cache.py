@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+LLM_CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "256"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+
+def log(msg):
+    print(f"🗄️ [llm_cache] {msg}")
+
+def cache_key(model, prompt, options=None, **extra):
+    """
+    Inhaltsadresse einer LLM-Anfrage: Hash über Modell, Optionen und Prompt.
+    Weitere Parameter, die die Antwort beeinflussen (z. B. format), gehen über extra ein.
+    """
+    material = json.dumps(
+        {"model": model, "options": options or {}, "prompt": prompt, **extra},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Zweistufiger Antwort-Cache: LRU im Speicher, darunter eine Datei pro Eintrag auf der Platte.
+    Die Platte wird auf max_bytes begrenzt; verdrängt werden die am längsten ungenutzten Einträge.
+    """
+
+    def __init__(self, directory=LLM_CACHE_DIR, memory_items=LLM_CACHE_MEMORY_ITEMS, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)["value"]
+            os.utime(path)  # mtime dient als LRU-Zeitstempel für die Plattenverdrängung
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self.stats["disk_hits"] += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"value": value}, ensure_ascii=False)
+        # Eindeutiger Temp-Name – auch mehrere Prozesse teilen sich das Cache-Verzeichnis
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        previous = self._file_size(path)  # überschriebener Eintrag zählt nicht doppelt
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.stats["stores"] += 1
+            self._remember(key, value)
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data.encode("utf-8")) - previous
+        self._evict_disk()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+        path = self._path(key)
+        size = self._file_size(path)
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+
+    @staticmethod
+    def _file_size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _disk_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict_disk(self):
+        with self._lock:
+            if self._disk_bytes is not None and self._disk_bytes <= self.max_bytes:
+                return
+            entries = self._disk_entries()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                # Auf 90 % verkleinern, damit nicht jeder weitere put erneut scannt
+                target = int(self.max_bytes * 0.9)
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+                    self.stats["evictions"] += 1
+                    self._memory.pop(os.path.basename(path)[:-len(".json")], None)
+            self._disk_bytes = total
+
+    def summary(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Gibt den prozessweiten Cache zurück oder None, wenn er per LLM_CACHE_ENABLED=0 abgeschaltet ist."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -0,0 +1,99 @@
+import os
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+# Wie oft Wartende mit cancel_event nachsehen, ob sie abgebrochen wurden
+CANCEL_POLL_SECONDS = 0.2
+
+
+class SlotCancelled(Exception):
+    """Der Aufruf wurde abgebrochen, während er noch auf einen Slot wartete."""
+
+
+class FairLimiter:
+    """
+    Semaphor mit fairer Warteschlange: Ist das Limit erreicht, wird jeder frei werdende
+    Slot reihum an den nächsten wartenden Agenten vergeben. So kann ein Agent mit vielen
+    Anfragen die anderen nicht aushungern.
+
+    Threadbasiert, damit ein einziger Limiter für den ganzen Prozess gilt – für synchrone
+    Aufrufe aus den Scheduler-Threads ebenso wie für acall_* (asyncio.to_thread) aus
+    beliebigen Event-Loops.
+    """
+
+    def __init__(self, limit=OLLAMA_NUM_PARALLEL):
+        self.limit = max(1, limit)
+        self._active = 0
+        self._queues = OrderedDict()  # agent -> deque[Ticket], Ticket = [bool] "Slot erhalten"
+        self._cond = threading.Condition()
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def waiting(self):
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def acquire(self, agent_name="default", cancel_event=None):
+        """
+        Blockiert, bis ein Slot frei ist.
+        :param cancel_event: optionales threading.Event; ist es gesetzt, wird das Warten beendet
+        :return: False, wenn cancel_event vor dem Erhalt des Slots gesetzt wurde
+        """
+        with self._cond:
+            if self._active < self.limit and not self._queues:
+                self._active += 1
+                return True
+
+            ticket = [False]
+            self._queues.setdefault(agent_name, deque()).append(ticket)
+            while not ticket[0]:
+                if cancel_event is not None and cancel_event.is_set():
+                    queue = self._queues.get(agent_name)
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[agent_name]
+                    return False
+                self._cond.wait(CANCEL_POLL_SECONDS if cancel_event is not None else None)
+            return True
+
+    def release(self):
+        with self._cond:
+            if self._queues:
+                agent_name, queue = next(iter(self._queues.items()))
+                ticket = queue.popleft()
+                if queue:
+                    self._queues.move_to_end(agent_name)
+                else:
+                    del self._queues[agent_name]
+                ticket[0] = True  # Slot geht direkt an den Wartenden über
+                self._cond.notify_all()
+                return
+            self._active -= 1
+
+    @contextmanager
+    def slot(self, agent_name="default", cancel_event=None):
+        """Wie acquire/release; wirft SlotCancelled, wenn cancel_event vorher gesetzt wird."""
+        if not self.acquire(agent_name, cancel_event):
+            raise SlotCancelled()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_llm_limiter():
+    """Ein Limiter für den ganzen Prozess – OLLAMA_NUM_PARALLEL gilt über alle Threads und Loops."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = FairLimiter()
+        return _limiter
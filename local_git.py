@@ -0,0 +1,166 @@
+"""
+Lokaler Git-Arbeitskopie-Modus (GIT_MODE=local).
+
+Statt jede Datei über die REST-API zu veröffentlichen, wird im Projektverzeichnis local_path
+lokal committet und nur einmal pro Runde bzw. Feature gepusht. Lesezugriffe bedient die
+Arbeitskopie. Als Remote dient GitHub oder – z. B. für Offline-Tests – ein lokales
+Bare-Repository (GIT_REMOTE_URL, "{owner}" und "{repo}" werden ersetzt).
+
+Das Token landet nicht in .git/config: es wird nur beim fetch/pull/push als HTTP-Header
+mitgegeben.
+"""
+
+import os
+import base64
+import threading
+import subprocess
+from github_utils import GITHUB_USERNAME, GITHUB_TOKEN, GITHUB_BRANCH
+from metrics import timed
+
+GIT_MODE = os.getenv("GIT_MODE", "api")  # "api" oder "local"
+GIT_REMOTE_URL = os.getenv("GIT_REMOTE_URL", "https://github.com/{owner}/{repo}.git")
+GIT_COMMIT_NAME = os.getenv("GIT_COMMIT_NAME", "KI-Firma")
+GIT_COMMIT_EMAIL = os.getenv("GIT_COMMIT_EMAIL", "ki-firma@users.noreply.github.com")
+
+
+def log(msg):
+    print(f"🌿 [local_git] {msg}")
+
+def local_mode():
+    return GIT_MODE == "local"
+
+
+class GitError(RuntimeError):
+    pass
+
+
+class WorkingCopy:
+    """Git-Arbeitskopie unter local_path; wird beim ersten Zugriff angelegt bzw. an das Remote gehängt."""
+
+    def __init__(self, repo, local_path, branch=GITHUB_BRANCH, remote_url=None):
+        self.repo = repo
+        self.local_path = os.path.abspath(local_path)
+        self.branch = branch
+        self.remote_url = remote_url or GIT_REMOTE_URL.format(token=GITHUB_TOKEN, owner=GITHUB_USERNAME, repo=repo)
+        self._lock = threading.RLock()
+        self._ensure_repo()
+
+    def _auth_args(self, command):
+        if command not in ("fetch", "pull", "push") or not GITHUB_TOKEN or not self.remote_url.startswith("https://"):
+            return []
+        credentials = base64.b64encode(f"x-access-token:{GITHUB_TOKEN}".encode()).decode()
+        return ["-c", f"http.extraHeader=Authorization: Basic {credentials}"]
+
+    def git(self, *args, check=True):
+        with timed(f"git.{args[0]}"):
+            result = subprocess.run(
+                ["git", "-c", f"user.name={GIT_COMMIT_NAME}", "-c", f"user.email={GIT_COMMIT_EMAIL}",
+                 *self._auth_args(args[0]), *args],
+                cwd=self.local_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+            )
+        if check and result.returncode != 0:
+            raise GitError(f"git {' '.join(args)}: {result.stdout.strip()}")
+        return result
+
+    def _ensure_repo(self):
+        os.makedirs(self.local_path, exist_ok=True)
+        if os.path.isdir(os.path.join(self.local_path, ".git")):
+            # Frühere Versionen haben das Token in die Remote-URL geschrieben – dort entfernen
+            current = self.git("remote", "get-url", "origin", check=False).stdout.strip()
+            if GITHUB_TOKEN and GITHUB_TOKEN in current and GITHUB_TOKEN not in self.remote_url:
+                self.git("remote", "set-url", "origin", self.remote_url)
+                log("🔐 Token aus der Remote-URL in .git/config entfernt")
+            return
+        # Nicht klonen: local_path enthält oft schon das Flutter-Projekt. Stattdessen das Repository
+        # an Ort und Stelle anlegen und auf den Remote-Stand setzen – lokale Dateien bleiben als
+        # uncommittete Änderungen liegen; committet wird nur, was ein Agent schreibt. Beim Rebase
+        # vor dem Push werden sie per --autostash beiseitegelegt und danach wiederhergestellt.
+        log(f"🆕 Arbeitskopie wird in {self.local_path} angelegt")
+        self.git("init", "-q")
+        self.git("symbolic-ref", "HEAD", f"refs/heads/{self.branch}")
+        self.git("remote", "add", "origin", self.remote_url)
+        if self.git("fetch", "-q", "origin", self.branch, check=False).returncode == 0:
+            self.git("reset", "-q", f"origin/{self.branch}")
+            # Nur lokal fehlende Dateien aus dem Remote-Stand holen
+            missing = [p for p in self.git("ls-files", "--deleted", "-z").stdout.split("\0") if p]
+            if missing:
+                self.git("checkout", "--", *missing)
+        else:
+            log("ℹ️ Remote-Branch existiert noch nicht – erster Push legt ihn an.")
+
+    def read_file(self, rel_path):
+        full_path = os.path.join(self.local_path, rel_path)
+        if not os.path.isfile(full_path):
+            return ""
+        with open(full_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def commit(self, files, message):
+        """
+        :param files: {rel_path: content}; None löscht die Datei. Dateien, die schon mit diesem
+                      Inhalt auf der Platte liegen, werden nicht neu geschrieben.
+        :return: True, wenn ein Commit entstanden ist
+        """
+        with self._lock:
+            deleted = [p for p, content in files.items() if content is None]
+            # Löschungen nie versionierter Dateien haben für git keinen Pfad – "add" scheitert sonst
+            # mit "pathspec did not match" und der ganze Batch bliebe für immer vorgemerkt
+            tracked = set()
+            if deleted:
+                tracked = {p for p in self.git("ls-files", "-z", "--", *deleted).stdout.split("\0") if p}
+            for rel_path, content in files.items():
+                full_path = os.path.join(self.local_path, rel_path)
+                if content is None:
+                    if os.path.exists(full_path):
+                        os.remove(full_path)
+                    continue
+                if self.read_file(rel_path) != content:
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    with open(full_path, "w", encoding="utf-8") as f:
+                        f.write(content)
+            paths = [p for p, content in files.items() if content is not None or p in tracked]
+            if paths:
+                self.git("add", "-A", "--", *paths)
+            if self.git("diff", "--cached", "--quiet", check=False).returncode == 0:
+                return False
+            self.git("commit", "-q", "-m", message)
+            return True
+
+    def unpushed(self):
+        """Anzahl lokaler Commits, die noch nicht auf dem Remote liegen (auch aus früheren Läufen)."""
+        result = self.git("rev-list", "--count", "HEAD", "--not", "--remotes=origin", check=False)
+        return int(result.stdout.strip()) if result.returncode == 0 else 0
+
+    def push(self):
+        """Pusht alle lokalen Commits auf einmal; bei abgelehntem Push wird vorher rebased."""
+        with self._lock:
+            unpushed = self.unpushed()
+            if not unpushed:
+                return False
+            result = self.git("push", "-q", "origin", f"HEAD:refs/heads/{self.branch}", check=False)
+            if result.returncode != 0:
+                log("🔀 Push abgelehnt – hole Remote-Stand und rebase")
+                self.git("pull", "-q", "--rebase", "--autostash", "origin", self.branch)
+                self.git("push", "-q", "origin", f"HEAD:refs/heads/{self.branch}")
+            self.git("fetch", "-q", "origin", self.branch, check=False)
+            log(f"⬆️ {unpushed} Commit(s) nach {self.branch} gepusht")
+            return True
+
+
+_copies = {}
+_copies_lock = threading.Lock()
+
+
+def get_working_copy(repo, local_path=None):
+    """
+    Eine Arbeitskopie pro Repository. local_path ist beim ersten Aufruf Pflicht, danach optional.
+    """
+    with _copies_lock:
+        if repo not in _copies:
+            if not local_path:
+                raise GitError(f"Kein lokaler Pfad für Repository '{repo}' bekannt")
+            _copies[repo] = WorkingCopy(repo, local_path)
+        return _copies[repo]
@@ -0,0 +1,669 @@
+"""
+GitHub-Ersatz im Prozess (GITHUB_BACKEND=local): beantwortet die REST-Aufrufe, die github_utils,
+design_agent und devops_agent benutzen, aus einer SQLite-Datenbank statt über das Netz.
+
+Abgedeckt sind Repositories, Issues (mit Paginierung, since, ETag/304), Labels, Kommentare,
+Contents-API, Git-Data-API (Blobs, Trees, Commits, Refs), Releases und Asset-Uploads. GraphQL
+gibt es nicht – Sammel-Operationen laufen dann über REST. Gedacht für Offline-Läufe, Lasttests
+und Benchmarks (siehe benchmark_github.py), nicht als vollständige Nachbildung der API.
+"""
+
+import os
+import re
+import json
+import base64
+import hashlib
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+from metrics import timed
+from sqlite_utils import connect, transaction
+
+GITHUB_LOCAL_DB = os.getenv("GITHUB_LOCAL_DB", ".local_github.db")
+LOCAL_BASE_URL = "http://github.local"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    full_name TEXT PRIMARY KEY,
+    id INTEGER NOT NULL,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    private INTEGER NOT NULL DEFAULT 0,
+    default_branch TEXT NOT NULL DEFAULT 'main',
+    next_issue INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS labels (
+    repo TEXT NOT NULL,
+    name TEXT NOT NULL,
+    color TEXT NOT NULL,
+    PRIMARY KEY (repo, name)
+);
+CREATE TABLE IF NOT EXISTS issues (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL,
+    state TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    comments INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    closed_at TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE INDEX IF NOT EXISTS issues_updated ON issues (repo, updated_at);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    repo TEXT NOT NULL,
+    issue_number INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    user TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, content BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS trees (sha TEXT PRIMARY KEY, entries TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS commits (
+    sha TEXT PRIMARY KEY,
+    tree TEXT NOT NULL,
+    parents TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    repo TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    PRIMARY KEY (repo, name)
+);
+CREATE TABLE IF NOT EXISTS releases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    repo TEXT NOT NULL,
+    tag_name TEXT NOT NULL,
+    name TEXT,
+    body TEXT,
+    target TEXT,
+    draft INTEGER NOT NULL DEFAULT 0,
+    prerelease INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    UNIQUE (repo, tag_name)
+);
+CREATE TABLE IF NOT EXISTS assets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    release_id INTEGER NOT NULL REFERENCES releases (id),
+    name TEXT NOT NULL,
+    content_type TEXT,
+    content BLOB NOT NULL
+);
+"""
+
+
+def log(msg):
+    print(f"🏠 [local_github] {msg}")
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _digest(text):
+    return hashlib.md5(text.encode()).hexdigest()
+
+def _sha(kind, data):
+    # Wie git: Typ und Länge gehen mit in den Hash ein
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha1(f"{kind} {len(data)}\0".encode() + data).hexdigest()
+
+
+class LocalResponse:
+    """Das, was github_utils & Co. von requests.Response benutzen."""
+
+    def __init__(self, status_code, body=None, headers=None, links=None, raw=None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.links = links or {}
+        if raw is not None:
+            self.content = raw
+        else:
+            self.content = b"" if body is None else json.dumps(body).encode()
+            self.headers.setdefault("Content-Type", "application/json; charset=utf-8")
+        self._body = body
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        if self._body is None:
+            raise ValueError("Keine JSON-Antwort")
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Fehler (lokales GitHub): {self.text[:200]}", response=self)
+
+
+class NotFound(Exception):
+    pass
+
+
+class Unprocessable(Exception):
+    def __init__(self, message, status_code=422):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LocalGitHub:
+    """
+    Backend mit derselben Schnittstelle wie github_utils.GitHubClient:
+    request(operation, method, path, **kwargs) → Response-artiges Objekt.
+    """
+
+    supports_graphql = False
+
+    def __init__(self, path=GITHUB_LOCAL_DB, owner=None):
+        self.path = path
+        self.owner = owner or os.getenv("GITHUB_USERNAME") or "local"
+        self.base_url = LOCAL_BASE_URL
+        self.conn = connect(path)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self.routes = [
+            ("POST", r"user/repos", self.create_repo),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)", self.get_repo),
+            ("PATCH", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)", self.update_repo),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/issues", self.list_issues),
+            ("POST", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/issues", self.create_issue),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/issues/(?P<number>\d+)", self.get_issue),
+            ("PATCH", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/issues/(?P<number>\d+)", self.update_issue),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/issues/(?P<number>\d+)/comments", self.list_comments),
+            ("POST", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/issues/(?P<number>\d+)/comments", self.create_comment),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/labels", self.list_labels),
+            ("POST", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/labels", self.create_label),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/contents/(?P<path>.+)", self.get_contents),
+            ("PUT", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/contents/(?P<path>.+)", self.put_contents),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/commits/(?P<ref>.+)", self.get_commit_for_ref),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/git/ref/(?P<ref>heads/.+)", self.get_ref),
+            ("POST", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/git/refs", self.create_ref),
+            ("PATCH", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/git/refs/(?P<ref>heads/.+)", self.update_ref),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/git/commits/(?P<sha>[0-9a-f]+)", self.get_git_commit),
+            ("POST", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/git/commits", self.create_git_commit),
+            ("POST", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/git/blobs", self.create_blob),
+            ("POST", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/git/trees", self.create_tree),
+            ("GET", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/releases", self.list_releases),
+            ("POST", r"repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/releases", self.create_release),
+            ("POST", r"uploads/repos/(?P<owner>[^/]+)/(?P<name>[^/]+)/releases/(?P<release_id>\d+)/assets", self.upload_asset),
+        ]
+        self.routes = [(method, re.compile(pattern + "$"), handler) for method, pattern, handler in self.routes]
+
+    # --- Einstieg ---------------------------------------------------------------------------
+
+    def request(self, operation, method, path, params=None, json=None, data=None, headers=None, **kwargs):
+        method = method.upper()
+        parts = urlsplit(path)
+        route_path = parts.path.lstrip("/") if path.startswith("http") else path.split("?")[0].lstrip("/")
+        query = dict(parse_qsl(parts.query))
+        query.update({k: str(v) for k, v in (params or {}).items()})
+        with timed(f"github.{operation}") as m:
+            m["bytes_sent"] = len(data) if isinstance(data, (bytes, str)) else 0
+            res = self._dispatch(method, route_path, query, json, data, CaseInsensitiveDict(headers or {}))
+            m["bytes_received"] = len(res.content)
+            if res.status_code >= 400:
+                m["errors"] = 1
+        return res
+
+    def _dispatch(self, method, path, query, body, data, headers):
+        matched_path = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            matched_path = True
+            if route_method != method:
+                continue
+            try:
+                with self._lock:
+                    return handler(query=query, body=body or {}, data=data, headers=headers, **match.groupdict())
+            except NotFound as e:
+                return LocalResponse(404, {"message": str(e) or "Not Found"})
+            except Unprocessable as e:
+                return LocalResponse(e.status_code, {"message": str(e)})
+        if matched_path:
+            return LocalResponse(405, {"message": "Method Not Allowed"})
+        return LocalResponse(404, {"message": "Not Found"})
+
+    # --- Repositories -----------------------------------------------------------------------
+
+    def _repo(self, owner, name):
+        row = self.conn.execute("SELECT * FROM repos WHERE full_name = ?", (f"{owner}/{name}",)).fetchone()
+        if row is None:
+            raise NotFound(f"Repository {owner}/{name} nicht gefunden")
+        return row
+
+    def _repo_json(self, row):
+        return {
+            "id": row["id"],
+            "node_id": f"R_{row['id']}",
+            "name": row["name"],
+            "full_name": row["full_name"],
+            "owner": {"login": row["owner"]},
+            "description": row["description"],
+            "private": bool(row["private"]),
+            "default_branch": row["default_branch"],
+            "html_url": f"{self.base_url}/{row['full_name']}",
+        }
+
+    def create_repo(self, body, **_):
+        full_name = f"{self.owner}/{body['name']}"
+        with transaction(self.conn):
+            if self.conn.execute("SELECT 1 FROM repos WHERE full_name = ?", (full_name,)).fetchone():
+                raise Unprocessable("name already exists on this account")
+            repo_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM repos").fetchone()[0]
+            self.conn.execute(
+                "INSERT INTO repos (full_name, id, owner, name, description, private, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (full_name, repo_id, self.owner, body["name"], body.get("description"), int(body.get("private", False)), _now()),
+            )
+        return LocalResponse(201, self._repo_json(self._repo(self.owner, body["name"])))
+
+    def get_repo(self, owner, name, **_):
+        return LocalResponse(200, self._repo_json(self._repo(owner, name)))
+
+    def update_repo(self, owner, name, body, **_):
+        self._repo(owner, name)
+        if "description" in body:
+            with transaction(self.conn):
+                self.conn.execute("UPDATE repos SET description = ? WHERE full_name = ?", (body["description"], f"{owner}/{name}"))
+        return LocalResponse(200, self._repo_json(self._repo(owner, name)))
+
+    # --- Labels -----------------------------------------------------------------------------
+
+    def _label_json(self, repo, name, color="ededed"):
+        return {"node_id": f"LA_{_digest(f'{repo}/{name}')[:12]}", "name": name, "color": color}
+
+    def _ensure_labels(self, repo, names):
+        # Wie bei GitHub legt das Setzen unbekannter Labels sie an
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO labels (repo, name, color) VALUES (?, ?, 'ededed')", [(repo, n) for n in names]
+        )
+
+    def list_labels(self, owner, name, **_):
+        repo = self._repo(owner, name)["full_name"]
+        rows = self.conn.execute("SELECT name, color FROM labels WHERE repo = ? ORDER BY name", (repo,)).fetchall()
+        return LocalResponse(200, [self._label_json(repo, r["name"], r["color"]) for r in rows])
+
+    def create_label(self, owner, name, body, **_):
+        repo = self._repo(owner, name)["full_name"]
+        with transaction(self.conn):
+            if self.conn.execute("SELECT 1 FROM labels WHERE repo = ? AND name = ?", (repo, body["name"])).fetchone():
+                raise Unprocessable("Validation Failed: already_exists")
+            self.conn.execute(
+                "INSERT INTO labels (repo, name, color) VALUES (?, ?, ?)", (repo, body["name"], body.get("color", "ededed"))
+            )
+        return LocalResponse(201, self._label_json(repo, body["name"], body.get("color", "ededed")))
+
+    # --- Issues und Kommentare --------------------------------------------------------------
+
+    def _issue_json(self, repo, row):
+        digest = _digest(f"{repo}#{row['number']}")
+        return {
+            "id": int(digest[:8], 16),
+            "node_id": f"I_{digest[:12]}",
+            "number": row["number"],
+            "title": row["title"],
+            "body": row["body"],
+            "state": row["state"],
+            "labels": [self._label_json(repo, n) for n in json.loads(row["labels"])],
+            "comments": row["comments"],
+            "user": {"login": self.owner},
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "closed_at": row["closed_at"],
+            "html_url": f"{self.base_url}/{repo}/issues/{row['number']}",
+        }
+
+    def _issue_row(self, repo, number):
+        row = self.conn.execute("SELECT * FROM issues WHERE repo = ? AND number = ?", (repo, int(number))).fetchone()
+        if row is None:
+            raise NotFound(f"Issue #{number} nicht gefunden")
+        return row
+
+    def list_issues(self, owner, name, query, headers, **_):
+        repo = self._repo(owner, name)["full_name"]
+        per_page = min(int(query.get("per_page", 30)), 100)
+        page = max(int(query.get("page", 1)), 1)
+        sort = "updated_at" if query.get("sort") == "updated" else "created_at"
+        direction = "ASC" if query.get("direction") == "asc" else "DESC"
+
+        where, args = ["repo = ?"], [repo]
+        state = query.get("state", "open")
+        if state != "all":
+            where.append("state = ?")
+            args.append(state)
+        if query.get("since"):
+            where.append("updated_at >= ?")
+            args.append(query["since"])
+        for label in filter(None, query.get("labels", "").split(",")):
+            where.append("EXISTS (SELECT 1 FROM json_each(issues.labels) WHERE value = ?)")
+            args.append(label.strip())
+        rows = self.conn.execute(
+            f"SELECT * FROM issues WHERE {' AND '.join(where)} ORDER BY {sort} {direction}, number {direction} "
+            f"LIMIT ? OFFSET ?",
+            args + [per_page + 1, (page - 1) * per_page],
+        ).fetchall()
+
+        items = [self._issue_json(repo, r) for r in rows[:per_page]]
+        etag = '"' + hashlib.md5(json.dumps(items).encode()).hexdigest() + '"'
+        if headers.get("If-None-Match") == etag:
+            return LocalResponse(304, headers={"ETag": etag})
+        links = {}
+        if len(rows) > per_page:
+            next_url = f"{self.base_url}/repos/{repo}/issues?{urlencode(dict(query, page=page + 1))}"
+            links["next"] = {"url": next_url, "rel": "next"}
+        response_headers = {"ETag": etag}
+        if links:
+            response_headers["Link"] = f'<{links["next"]["url"]}>; rel="next"'
+        return LocalResponse(200, items, headers=response_headers, links=links)
+
+    def create_issue(self, owner, name, body, **_):
+        repo = self._repo(owner, name)["full_name"]
+        labels = list(dict.fromkeys(body.get("labels") or []))
+        now = _now()
+        with transaction(self.conn):
+            number = self.conn.execute("SELECT next_issue FROM repos WHERE full_name = ?", (repo,)).fetchone()[0]
+            self.conn.execute("UPDATE repos SET next_issue = ? WHERE full_name = ?", (number + 1, repo))
+            self._ensure_labels(repo, labels)
+            self.conn.execute(
+                "INSERT INTO issues (repo, number, title, body, state, labels, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'open', ?, ?, ?)",
+                (repo, number, body["title"], body.get("body") or "", json.dumps(labels), now, now),
+            )
+        return LocalResponse(201, self._issue_json(repo, self._issue_row(repo, number)))
+
+    def get_issue(self, owner, name, number, **_):
+        repo = self._repo(owner, name)["full_name"]
+        return LocalResponse(200, self._issue_json(repo, self._issue_row(repo, number)))
+
+    def update_issue(self, owner, name, number, body, **_):
+        repo = self._repo(owner, name)["full_name"]
+        with transaction(self.conn):
+            row = self._issue_row(repo, number)
+            title = body.get("title", row["title"])
+            text = body.get("body", row["body"])
+            state = body.get("state", row["state"])
+            labels = row["labels"]
+            if "labels" in body:
+                names = list(dict.fromkeys(body["labels"]))
+                self._ensure_labels(repo, names)
+                labels = json.dumps(names)
+            closed_at = row["closed_at"] if state == row["state"] else (_now() if state == "closed" else None)
+            self.conn.execute(
+                "UPDATE issues SET title = ?, body = ?, state = ?, labels = ?, closed_at = ?, updated_at = ? "
+                "WHERE repo = ? AND number = ?",
+                (title, text, state, labels, closed_at, _now(), repo, int(number)),
+            )
+        return LocalResponse(200, self._issue_json(repo, self._issue_row(repo, number)))
+
+    def _comment_json(self, row):
+        return {"id": row["id"], "body": row["body"], "user": {"login": row["user"]}, "created_at": row["created_at"]}
+
+    def list_comments(self, owner, name, number, **_):
+        repo = self._repo(owner, name)["full_name"]
+        self._issue_row(repo, number)
+        rows = self.conn.execute(
+            "SELECT * FROM comments WHERE repo = ? AND issue_number = ? ORDER BY id", (repo, int(number))
+        ).fetchall()
+        return LocalResponse(200, [self._comment_json(r) for r in rows])
+
+    def create_comment(self, owner, name, number, body, **_):
+        repo = self._repo(owner, name)["full_name"]
+        with transaction(self.conn):
+            self._issue_row(repo, number)
+            cursor = self.conn.execute(
+                "INSERT INTO comments (repo, issue_number, body, user, created_at) VALUES (?, ?, ?, ?, ?)",
+                (repo, int(number), body["body"], self.owner, _now()),
+            )
+            self.conn.execute(
+                "UPDATE issues SET comments = comments + 1, updated_at = ? WHERE repo = ? AND number = ?",
+                (_now(), repo, int(number)),
+            )
+        row = self.conn.execute("SELECT * FROM comments WHERE id = ?", (cursor.lastrowid,)).fetchone()
+        return LocalResponse(201, self._comment_json(row))
+
+    # --- Git-Objekte ------------------------------------------------------------------------
+
+    def _put_blob(self, content):
+        sha = _sha("blob", content)
+        self.conn.execute("INSERT OR IGNORE INTO blobs (sha, content) VALUES (?, ?)", (sha, content))
+        return sha
+
+    def _tree(self, sha):
+        row = self.conn.execute("SELECT entries FROM trees WHERE sha = ?", (sha,)).fetchone()
+        if row is None:
+            raise Unprocessable(f"Tree {sha} nicht gefunden")
+        return json.loads(row["entries"])
+
+    def _put_tree(self, entries):
+        # Vereinfachung: ein Tree ist eine flache Zuordnung Pfad → Blob-sha (keine Unterbäume)
+        encoded = json.dumps(entries, sort_keys=True)
+        sha = _sha("tree", encoded)
+        self.conn.execute("INSERT OR IGNORE INTO trees (sha, entries) VALUES (?, ?)", (sha, encoded))
+        return sha
+
+    def _commit(self, sha):
+        row = self.conn.execute("SELECT * FROM commits WHERE sha = ?", (sha,)).fetchone()
+        if row is None:
+            raise NotFound(f"Commit {sha} nicht gefunden")
+        return row
+
+    def _put_commit(self, tree, parents, message):
+        created_at = _now()
+        sha = _sha("commit", json.dumps([tree, parents, message, created_at]))
+        self.conn.execute(
+            "INSERT OR IGNORE INTO commits (sha, tree, parents, message, created_at) VALUES (?, ?, ?, ?, ?)",
+            (sha, tree, json.dumps(parents), message, created_at),
+        )
+        return sha
+
+    def _ref_sha(self, repo, ref):
+        row = self.conn.execute("SELECT sha FROM refs WHERE repo = ? AND name = ?", (repo, ref)).fetchone()
+        return row["sha"] if row else None
+
+    def _is_ancestor(self, ancestor, sha):
+        pending, seen = [sha], set()
+        while pending:
+            current = pending.pop()
+            if current == ancestor:
+                return True
+            if current in seen:
+                continue
+            seen.add(current)
+            pending.extend(json.loads(self._commit(current)["parents"]))
+        return False
+
+    def _resolve(self, repo, ref):
+        """Branchname oder Commit-sha → Commit-sha (None, wenn unbekannt)."""
+        sha = self._ref_sha(repo, f"heads/{ref}")
+        if sha:
+            return sha
+        row = self.conn.execute("SELECT sha FROM commits WHERE sha = ?", (ref,)).fetchone()
+        return row["sha"] if row else None
+
+    def create_blob(self, owner, name, body, **_):
+        self._repo(owner, name)
+        content = body["content"]
+        content = base64.b64decode(content) if body.get("encoding") == "base64" else content.encode()
+        with transaction(self.conn):
+            sha = self._put_blob(content)
+        return LocalResponse(201, {"sha": sha})
+
+    def create_tree(self, owner, name, body, **_):
+        self._repo(owner, name)
+        with transaction(self.conn):
+            entries = dict(self._tree(body["base_tree"])) if body.get("base_tree") else {}
+            for entry in body.get("tree", []):
+                if entry.get("content") is not None:
+                    entries[entry["path"]] = self._put_blob(entry["content"].encode())
+                elif entry.get("sha"):
+                    if not self.conn.execute("SELECT 1 FROM blobs WHERE sha = ?", (entry["sha"],)).fetchone():
+                        raise Unprocessable(f"Blob {entry['sha']} nicht gefunden")
+                    entries[entry["path"]] = entry["sha"]
+                else:
+                    entries.pop(entry["path"], None)
+            sha = self._put_tree(entries)
+        return LocalResponse(201, {"sha": sha})
+
+    def _git_commit_json(self, row):
+        return {
+            "sha": row["sha"],
+            "tree": {"sha": row["tree"]},
+            "parents": [{"sha": p} for p in json.loads(row["parents"])],
+            "message": row["message"],
+            "committer": {"date": row["created_at"]},
+        }
+
+    def create_git_commit(self, owner, name, body, **_):
+        self._repo(owner, name)
+        with transaction(self.conn):
+            self._tree(body["tree"])
+            for parent in body.get("parents", []):
+                self._commit(parent)
+            sha = self._put_commit(body["tree"], body.get("parents", []), body["message"])
+        return LocalResponse(201, self._git_commit_json(self._commit(sha)))
+
+    def get_git_commit(self, owner, name, sha, **_):
+        self._repo(owner, name)
+        return LocalResponse(200, self._git_commit_json(self._commit(sha)))
+
+    def get_commit_for_ref(self, owner, name, ref, **_):
+        repo = self._repo(owner, name)["full_name"]
+        sha = self._resolve(repo, ref)
+        if sha is None:
+            raise Unprocessable(f"No commit found for SHA: {ref}")
+        return LocalResponse(200, {"sha": sha, "commit": self._git_commit_json(self._commit(sha))})
+
+    def _ref_json(self, repo, ref, sha):
+        return {"ref": f"refs/{ref}", "object": {"sha": sha, "type": "commit"}}
+
+    def get_ref(self, owner, name, ref, **_):
+        repo = self._repo(owner, name)["full_name"]
+        sha = self._ref_sha(repo, ref)
+        if sha is None:
+            raise NotFound(f"Ref {ref} nicht gefunden")
+        return LocalResponse(200, self._ref_json(repo, ref, sha))
+
+    def create_ref(self, owner, name, body, **_):
+        repo = self._repo(owner, name)["full_name"]
+        ref = body["ref"].removeprefix("refs/")
+        with transaction(self.conn):
+            if self._ref_sha(repo, ref):
+                raise Unprocessable("Reference already exists")
+            self._commit(body["sha"])
+            self.conn.execute("INSERT INTO refs (repo, name, sha) VALUES (?, ?, ?)", (repo, ref, body["sha"]))
+        return LocalResponse(201, self._ref_json(repo, ref, body["sha"]))
+
+    def update_ref(self, owner, name, ref, body, **_):
+        repo = self._repo(owner, name)["full_name"]
+        with transaction(self.conn):
+            current = self._ref_sha(repo, ref)
+            if current is None:
+                raise Unprocessable("Reference does not exist")
+            self._commit(body["sha"])
+            if not body.get("force") and not self._is_ancestor(current, body["sha"]):
+                raise Unprocessable("Update is not a fast forward")
+            self.conn.execute("UPDATE refs SET sha = ? WHERE repo = ? AND name = ?", (body["sha"], repo, ref))
+        return LocalResponse(200, self._ref_json(repo, ref, body["sha"]))
+
+    # --- Contents-API -----------------------------------------------------------------------
+
+    def _file_json(self, path, sha, content=None):
+        result = {"type": "file", "name": path.rsplit("/", 1)[-1], "path": path, "sha": sha}
+        if content is not None:
+            result.update({"content": base64.b64encode(content).decode(), "encoding": "base64", "size": len(content)})
+        return result
+
+    def get_contents(self, owner, name, path, query, **_):
+        repo = self._repo(owner, name)
+        commit_sha = self._resolve(repo["full_name"], query.get("ref") or repo["default_branch"])
+        if commit_sha is None:
+            raise NotFound("This repository is empty.")
+        blob_sha = self._tree(self._commit(commit_sha)["tree"]).get(path)
+        if blob_sha is None:
+            raise NotFound(f"{path} nicht gefunden")
+        content = self.conn.execute("SELECT content FROM blobs WHERE sha = ?", (blob_sha,)).fetchone()["content"]
+        return LocalResponse(200, self._file_json(path, blob_sha, bytes(content)))
+
+    def put_contents(self, owner, name, path, body, **_):
+        repo = self._repo(owner, name)
+        branch = body.get("branch") or repo["default_branch"]
+        with transaction(self.conn):
+            parent = self._ref_sha(repo["full_name"], f"heads/{branch}")
+            entries = dict(self._tree(self._commit(parent)["tree"])) if parent else {}
+            existing = entries.get(path)
+            if existing and not body.get("sha"):
+                raise Unprocessable('Invalid request. "sha" wasn\'t supplied.')
+            if existing and body["sha"] != existing:
+                raise Unprocessable(f"{path} does not match {body['sha']}", status_code=409)
+            entries[path] = self._put_blob(base64.b64decode(body["content"]))
+            commit_sha = self._put_commit(self._put_tree(entries), [parent] if parent else [], body["message"])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO refs (repo, name, sha) VALUES (?, ?, ?)",
+                (repo["full_name"], f"heads/{branch}", commit_sha),
+            )
+        return LocalResponse(200 if existing else 201, {
+            "content": self._file_json(path, entries[path]),
+            "commit": {"sha": commit_sha, "message": body["message"]},
+        })
+
+    # --- Releases ---------------------------------------------------------------------------
+
+    def _release_json(self, row):
+        repo = row["repo"]
+        return {
+            "id": row["id"],
+            "tag_name": row["tag_name"],
+            "name": row["name"],
+            "body": row["body"],
+            "target_commitish": row["target"],
+            "draft": bool(row["draft"]),
+            "prerelease": bool(row["prerelease"]),
+            "created_at": row["created_at"],
+            "html_url": f"{self.base_url}/{repo}/releases/tag/{row['tag_name']}",
+            "upload_url": f"{self.base_url}/uploads/repos/{repo}/releases/{row['id']}/assets{{?name,label}}",
+        }
+
+    def list_releases(self, owner, name, **_):
+        repo = self._repo(owner, name)["full_name"]
+        rows = self.conn.execute("SELECT * FROM releases WHERE repo = ? ORDER BY id DESC", (repo,)).fetchall()
+        return LocalResponse(200, [self._release_json(r) for r in rows])
+
+    def create_release(self, owner, name, body, **_):
+        repo = self._repo(owner, name)["full_name"]
+        with transaction(self.conn):
+            if self.conn.execute("SELECT 1 FROM releases WHERE repo = ? AND tag_name = ?", (repo, body["tag_name"])).fetchone():
+                raise Unprocessable("Validation Failed: tag_name already_exists")
+            cursor = self.conn.execute(
+                "INSERT INTO releases (repo, tag_name, name, body, target, draft, prerelease, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (repo, body["tag_name"], body.get("name"), body.get("body"), body.get("target_commitish"),
+                 int(body.get("draft", False)), int(body.get("prerelease", False)), _now()),
+            )
+        row = self.conn.execute("SELECT * FROM releases WHERE id = ?", (cursor.lastrowid,)).fetchone()
+        return LocalResponse(201, self._release_json(row))
+
+    def upload_asset(self, owner, name, release_id, query, data, headers, **_):
+        repo = self._repo(owner, name)["full_name"]
+        if not self.conn.execute("SELECT 1 FROM releases WHERE id = ? AND repo = ?", (int(release_id), repo)).fetchone():
+            raise NotFound("Release nicht gefunden")
+        content = data.encode() if isinstance(data, str) else (data or b"")
+        with transaction(self.conn):
+            cursor = self.conn.execute(
+                "INSERT INTO assets (release_id, name, content_type, content) VALUES (?, ?, ?, ?)",
+                (int(release_id), query.get("name", "asset"), headers.get("Content-Type"), content),
+            )
+        return LocalResponse(201, {"id": cursor.lastrowid, "name": query.get("name", "asset"), "size": len(content)})
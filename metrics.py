@@ -0,0 +1,236 @@
+"""
+Laufzeit-Metriken für einen Lauf: Latenz-Histogramme und Zähler pro (Operation, Agent).
+
+Operationen heißen z. B. "llm.generate", "github.get_open_issues", "flutter.test" oder
+"agent.run_qa_agent". Der Agent wird entweder explizit übergeben oder aus dem aktuellen
+Agenten-Kontext genommen, den @agent_entry setzt – so landen auch GitHub-Aufrufe
+beim richtigen Agenten. Am Ende des Laufs schreibt write_run_report() eine JSON-Zusammenfassung
+nach logs/metrics/ und optional eine Datei im Prometheus-Textformat.
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from tracing import span
+
+METRICS_DIR = os.getenv("METRICS_DIR", "logs/metrics")
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE", "")  # leer = keine Prometheus-Datei
+METRICS_REGRESSION_FACTOR = float(os.getenv("METRICS_REGRESSION_FACTOR", "1.25"))
+
+# Obergrenzen der Latenz-Buckets in Millisekunden
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 300000)
+
+COUNTERS = ("prompt_tokens", "completion_tokens", "bytes_sent", "bytes_received", "retries", "errors")
+
+current_agent = contextvars.ContextVar("current_agent", default="-")
+
+
+def log(msg):
+    print(f"📊 [metrics] {msg}")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # letzter Eintrag: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q):
+        """Obergrenze des Buckets, in dem das Quantil liegt (für +Inf: der Maximalwert)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return float(self.buckets[index]) if index < len(self.buckets) else self.max
+        return self.max
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.series = {}  # (operation, agent) -> {"latency": Histogram, "tps_sum", "tps_count", Zähler}
+
+    def _series(self, operation, agent):
+        key = (operation, agent)
+        if key not in self.series:
+            self.series[key] = {"latency": Histogram(), "tps_sum": 0.0, "tps_count": 0}
+            self.series[key].update({name: 0 for name in COUNTERS})
+        return self.series[key]
+
+    def record(self, operation, latency_ms, agent=None, tokens_per_sec=None, **counters):
+        """
+        :param counters: beliebige Teilmenge von COUNTERS, z. B. prompt_tokens=812, retries=1
+        """
+        agent = agent or current_agent.get()
+        with self._lock:
+            series = self._series(operation, agent)
+            series["latency"].observe(latency_ms)
+            if tokens_per_sec:
+                series["tps_sum"] += tokens_per_sec
+                series["tps_count"] += 1
+            for name, value in counters.items():
+                if name in COUNTERS and value:
+                    series[name] += value
+
+    def summary(self):
+        with self._lock:
+            rows = []
+            for (operation, agent), series in sorted(self.series.items()):
+                latency = series["latency"]
+                row = {
+                    "operation": operation,
+                    "agent": agent,
+                    "count": latency.count,
+                    "total_ms": round(latency.sum),
+                    "avg_ms": round(latency.sum / latency.count, 1) if latency.count else 0.0,
+                    "p50_ms": latency.quantile(0.5),
+                    "p95_ms": latency.quantile(0.95),
+                    "max_ms": round(latency.max, 1),
+                    "tokens_per_sec": round(series["tps_sum"] / series["tps_count"], 1) if series["tps_count"] else None,
+                    "buckets": dict(zip([str(b) for b in latency.buckets] + ["+Inf"], latency.counts)),
+                }
+                row.update({name: series[name] for name in COUNTERS})
+                rows.append(row)
+            return {
+                "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "wall_ms": round((time.time() - self.started) * 1000),
+                "series": rows,
+            }
+
+    def prometheus(self):
+        """Prometheus-Textformat (Histogramme kumulativ, Zähler als counter)."""
+        lines = [
+            "# HELP ki_firma_latency_ms Latenz pro Operation und Agent in Millisekunden",
+            "# TYPE ki_firma_latency_ms histogram",
+        ]
+        with self._lock:
+            items = sorted(self.series.items())
+            for (operation, agent), series in items:
+                labels = f'operation="{operation}",agent="{agent}"'
+                latency = series["latency"]
+                cumulative = 0
+                for bound, count in zip([str(b) for b in latency.buckets] + ["+Inf"], latency.counts):
+                    cumulative += count
+                    lines.append(f'ki_firma_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"ki_firma_latency_ms_sum{{{labels}}} {latency.sum:.1f}")
+                lines.append(f"ki_firma_latency_ms_count{{{labels}}} {latency.count}")
+            for name in COUNTERS:
+                lines.append(f"# TYPE ki_firma_{name}_total counter")
+                for (operation, agent), series in items:
+                    if series[name]:
+                        lines.append(f'ki_firma_{name}_total{{operation="{operation}",agent="{agent}"}} {series[name]}')
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    return _registry
+
+def record(operation, latency_ms, agent=None, **fields):
+    _registry.record(operation, latency_ms, agent=agent, **fields)
+
+@contextmanager
+def timed(operation, agent=None):
+    """
+    Misst die Dauer des Blocks. Über das zurückgegebene Dict lassen sich Zähler ergänzen,
+    z. B. `with timed("flutter.test") as m: ...; m["bytes_received"] = len(out)`.
+    Eine Exception im Block zählt als Fehler und wird weitergereicht. Der Block ist zugleich
+    ein Tracing-Span gleichen Namens (siehe tracing).
+    """
+    fields = {}
+    started = time.monotonic()
+    with span(operation, agent=agent or current_agent.get()) as span_args:
+        try:
+            yield fields
+        except Exception:
+            fields["errors"] = fields.get("errors", 0) + 1
+            raise
+        finally:
+            span_args.update(fields)
+            _registry.record(operation, (time.monotonic() - started) * 1000, agent=agent, **fields)
+
+def agent_entry(agent_name):
+    """Dekorator für Agenten-Einstiegspunkte: misst "agent.<Funktionsname>" und setzt den Agenten-Kontext."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = current_agent.set(agent_name)
+            try:
+                with timed(f"agent.{func.__name__}", agent=agent_name):
+                    return func(*args, **kwargs)
+            finally:
+                current_agent.reset(token)
+        return wrapper
+    return decorator
+
+
+def _previous_report():
+    if not os.path.isdir(METRICS_DIR):
+        return None
+    reports = sorted(name for name in os.listdir(METRICS_DIR) if name.startswith("run_") and name.endswith(".json"))
+    if not reports:
+        return None
+    try:
+        with open(os.path.join(METRICS_DIR, reports[-1]), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _log_regressions(summary, previous):
+    before = {(row["operation"], row["agent"]): row for row in previous.get("series", [])}
+    for row in summary["series"]:
+        old = before.get((row["operation"], row["agent"]))
+        if old and old["avg_ms"] and row["count"] and row["avg_ms"] > old["avg_ms"] * METRICS_REGRESSION_FACTOR:
+            log(
+                f"📈 Langsamer als im letzten Lauf: {row['operation']} ({row['agent']}) "
+                f"Ø {old['avg_ms']} → {row['avg_ms']} ms"
+            )
+
+def write_run_report():
+    """Schreibt die Zusammenfassung des Laufs und protokolliert die teuersten Operationen."""
+    summary = _registry.summary()
+    previous = _previous_report()
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    log(f"⏱️ Laufzeit gesamt: {summary['wall_ms'] / 1000:.1f} s – Bericht: {path}")
+    for row in sorted(summary["series"], key=lambda r: r["total_ms"], reverse=True)[:10]:
+        tps = f", {row['tokens_per_sec']} Tokens/s" if row["tokens_per_sec"] else ""
+        log(
+            f"   {row['operation']} ({row['agent']}): {row['count']}× Σ {row['total_ms'] / 1000:.1f} s, "
+            f"p50 {row['p50_ms']:.0f} ms, p95 {row['p95_ms']:.0f} ms{tps}"
+        )
+    if previous:
+        _log_regressions(summary, previous)
+
+    if METRICS_PROMETHEUS_FILE:
+        with open(METRICS_PROMETHEUS_FILE, "w", encoding="utf-8") as f:
+            f.write(_registry.prometheus())
+        log(f"📤 Prometheus-Datei geschrieben: {METRICS_PROMETHEUS_FILE}")
+    return path
@@ -0,0 +1,87 @@
+import os
+import threading
+from contextlib import contextmanager
+from llm_concurrency import SlotCancelled, CANCEL_POLL_SECONDS
+
+OLLAMA_MODEL = os.getenv("OPENAI_MODEL", "deepseek-coder:6.7b")
+
+# Ohne eigene Konfiguration landen alle Stufen beim bisherigen Modell
+MODEL_TIERS = {
+    "small": os.getenv("OLLAMA_MODEL_SMALL", OLLAMA_MODEL),
+    "medium": os.getenv("OLLAMA_MODEL_MEDIUM", OLLAMA_MODEL),
+    "large": os.getenv("OLLAMA_MODEL_LARGE", OLLAMA_MODEL),
+}
+
+# Aufgabentyp -> Stufe. Unbekannte Aufgaben gehen an das große Modell.
+TASK_TIERS = {
+    "code": "large",
+    "test": "large",
+    "docs": "large",
+    "plan": "medium",
+    "design": "medium",
+    "summary": "small",
+    "json_repair": "small",
+    "comment": "small",
+    "diagnosis": "small",
+}
+
+# Fällt ein Modell aus (nicht installiert, Server-Fehler), wird die nächste Stufe versucht
+FALLBACK_CHAIN = {
+    "small": ["small", "medium", "large"],
+    "medium": ["medium", "large"],
+    "large": ["large"],
+}
+
+
+def log(msg):
+    print(f"🧭 [model_router] {msg}")
+
+def _parse_limits(value):
+    limits = {}
+    for part in value.split(","):
+        if "=" in part:
+            tier, limit = part.split("=", 1)
+            limits[tier.strip()] = max(1, int(limit))
+    return limits
+
+_DEFAULT_LIMIT = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+TIER_CONCURRENCY = {tier: _DEFAULT_LIMIT for tier in MODEL_TIERS}
+TIER_CONCURRENCY.update(_parse_limits(os.getenv("OLLAMA_TIER_CONCURRENCY", "")))
+
+_slots = {tier: threading.BoundedSemaphore(limit) for tier, limit in TIER_CONCURRENCY.items()}
+
+
+def log_fallback(model, next_model, error):
+    log(f"↪️ {model} nicht verfügbar ({error}) – weiter mit {next_model}")
+
+def tier_for(task):
+    return TASK_TIERS.get(task, "large")
+
+def route(task):
+    """
+    :return: Liste von (tier, model) in Fallback-Reihenfolge; identische Modelle nur einmal
+    """
+    candidates = []
+    seen = set()
+    for tier in FALLBACK_CHAIN[tier_for(task)]:
+        model = MODEL_TIERS[tier]
+        if model not in seen:
+            seen.add(model)
+            candidates.append((tier, model))
+    return candidates
+
+@contextmanager
+def tier_slot(tier, cancel_event=None):
+    """
+    Begrenzt gleichzeitige Generierungen pro Stufe (OLLAMA_TIER_CONCURRENCY, z. B. "small=4,large=1").
+    :param cancel_event: optionales threading.Event; wird es beim Warten gesetzt, gibt der Aufruf
+                         seinen Platz auf und wirft SlotCancelled (wie FairLimiter.slot)
+    """
+    slot = _slots[tier]
+    while not slot.acquire(timeout=CANCEL_POLL_SECONDS if cancel_event is not None else None):
+        if cancel_event.is_set():
+            raise SlotCancelled()
+    try:
+        yield
+    finally:
+        slot.release()
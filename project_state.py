@@ -0,0 +1,326 @@
+"""
+Projektstatus als SQLite-Datenbank (WAL) statt einer JSON-Datei, die bei jedem Zwischenstand
+komplett neu geschrieben wird.
+
+Datensätze mit festen Spalten:
+    features   – Titel, Beschreibung, Priorität, Status
+    tasks      – ein Eintrag pro Repo und Issue: Feature, Agent, Labels, Zustand, erzeugte Datei
+    files      – von Agenten geschriebene Dateien mit Issue und Agent
+    summaries  – Dateizusammenfassungen für die README (mit Inhalts-Hash, veraltete werden neu erzeugt)
+
+Jede Änderung ist eine eigene kleine Transaktion; mehrere Prozesse (Manager, queue_worker.py)
+können gleichzeitig lesen. load_project_state()/save_project_state() und export_json() liefern
+bzw. schreiben weiterhin das alte Format von project_state.json ({"description", "features"}).
+Beim ersten Start werden project_state.json und .summaries.json übernommen.
+
+    python project_state.py export [Pfad]
+    python project_state.py show
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from sqlite_utils import connect, transaction
+
+PROJECT_STATE_DB = os.getenv("PROJECT_STATE_DB", ".project_state.db")
+PROJECT_STATE_FILE = "project_state.json"
+LEGACY_SUMMARY_CACHE = ".summaries.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS features (
+    title TEXT PRIMARY KEY,
+    description TEXT NOT NULL DEFAULT '',
+    priority INTEGER NOT NULL DEFAULT 3,
+    status TEXT NOT NULL DEFAULT 'offen',
+    position INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    repo TEXT NOT NULL,
+    issue_number INTEGER NOT NULL,
+    feature TEXT,
+    title TEXT NOT NULL DEFAULT '',
+    agent TEXT,
+    labels TEXT NOT NULL DEFAULT '[]',
+    state TEXT NOT NULL DEFAULT 'offen' CHECK (state IN ('offen', 'erledigt', 'fehlgeschlagen')),
+    file TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (repo, issue_number)
+);
+CREATE INDEX IF NOT EXISTS tasks_feature ON tasks (feature);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    issue_number INTEGER,
+    agent TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    path TEXT PRIMARY KEY,
+    digest TEXT,
+    summary TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+FEATURE_FIELDS = ("description", "priority", "status")
+TASK_FIELDS = ("feature", "title", "agent", "labels", "state", "file")
+
+
+def log(msg):
+    print(f"🗂️ [project_state] {msg}")
+
+def content_digest(content):
+    return hashlib.sha1(content.encode("utf-8", errors="replace")).hexdigest()
+
+def _write_json_atomic(path, data):
+    # Erst vollständig schreiben, dann umbenennen – Leser sehen nie eine halbe Datei
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class ProjectStateStore:
+    def __init__(self, path=PROJECT_STATE_DB, json_path=PROJECT_STATE_FILE):
+        self.path = path
+        self.json_path = json_path
+        self.conn = connect(path)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._migrate()
+        self._import_legacy()
+
+    def _migrate(self):
+        columns = {r["name"] for r in self.conn.execute("PRAGMA table_info(tasks)")}
+        if "repo" in columns:
+            return
+        # Alte Datenbank: Tasks nur nach Issue-Nummer. Das Repo ist unbekannt – solche Einträge
+        # zählen für kein Repo als erledigt, die Issues werden höchstens einmal neu eingeplant
+        with self._lock, transaction(self.conn):
+            self.conn.execute("ALTER TABLE tasks RENAME TO tasks_old")
+            self.conn.execute("DROP INDEX IF EXISTS tasks_feature")
+        self.conn.executescript(SCHEMA)
+        with self._lock, transaction(self.conn):
+            self.conn.execute(
+                "INSERT INTO tasks (repo, issue_number, feature, title, agent, labels, state, file, updated_at) "
+                "SELECT '', issue_number, feature, title, agent, labels, state, file, updated_at FROM tasks_old"
+            )
+            self.conn.execute("DROP TABLE tasks_old")
+        log("🔧 Tasks-Tabelle auf (repo, issue_number) umgestellt")
+
+    def _import_legacy(self):
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone():
+                return
+        # Alle Schritte sind idempotent – bricht die Übernahme ab, wird sie beim nächsten Start wiederholt
+        if os.path.exists(self.json_path):
+            with open(self.json_path, "r", encoding="utf-8") as f:
+                self.save(json.load(f))
+            log(f"📥 {self.json_path} übernommen")
+        if os.path.exists(LEGACY_SUMMARY_CACHE):
+            with open(LEGACY_SUMMARY_CACHE, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+            now = time.time()
+            with self._lock, transaction(self.conn):
+                # Ohne Hash: der erste Abruf übernimmt den aktuellen Hash (siehe get_summary)
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO summaries (path, digest, summary, updated_at) VALUES (?, NULL, ?, ?)",
+                    [(path, summary, now) for path, summary in legacy.items()],
+                )
+            log(f"📥 {len(legacy)} Zusammenfassung(en) aus {LEGACY_SUMMARY_CACHE} übernommen")
+        with self._lock:
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('imported', ?)", (str(time.time()),))
+
+    # --- Projekt -------------------------------------------------------------------------
+
+    def get_description(self):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'description'").fetchone()
+        return row["value"] if row else ""
+
+    def set_description(self, description):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('description', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (description or "",),
+            )
+
+    # --- Features ------------------------------------------------------------------------
+
+    def features(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM features ORDER BY position").fetchall()
+        return [dict(r) for r in rows]
+
+    def upsert_features(self, features):
+        """
+        Legt Features an bzw. aktualisiert sie; die Reihenfolge der Liste bleibt erhalten.
+        Ohne "status" bleibt der gespeicherte Status unverändert.
+        """
+        now = time.time()
+        with self._lock, transaction(self.conn):
+            position = self.conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM features").fetchone()[0]
+            for offset, f in enumerate(features):
+                self.conn.execute(
+                    "INSERT INTO features (title, description, priority, status, position, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (title) DO UPDATE SET description = excluded.description, "
+                    "priority = excluded.priority, status = COALESCE(?, status), updated_at = excluded.updated_at",
+                    (f["title"], f.get("description", ""), int(f.get("priority", 3)),
+                     f.get("status", "offen"), position + offset, now, f.get("status")),
+                )
+
+    def update_feature(self, title, **fields):
+        unknown = set(fields) - set(FEATURE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unbekannte Feature-Felder: {sorted(unknown)}")
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self.conn.execute(
+                f"UPDATE features SET {assignments}, updated_at = ? WHERE title = ?",
+                (*fields.values(), time.time(), title),
+            )
+
+    # --- Tasks ---------------------------------------------------------------------------
+
+    def upsert_task(self, repo, issue_number, **fields):
+        """Legt den Task zum Issue des Repos an oder ändert nur die übergebenen Felder."""
+        unknown = set(fields) - set(TASK_FIELDS)
+        if unknown:
+            raise ValueError(f"Unbekannte Task-Felder: {sorted(unknown)}")
+        if "labels" in fields:
+            fields["labels"] = json.dumps(fields["labels"], ensure_ascii=False)
+        columns = ["repo", "issue_number", *fields, "updated_at"]
+        updates = ", ".join(f"{k} = excluded.{k}" for k in [*fields, "updated_at"])
+        with self._lock:
+            self.conn.execute(
+                f"INSERT INTO tasks ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (repo, issue_number) DO UPDATE SET {updates}",
+                (repo, issue_number, *fields.values(), time.time()),
+            )
+
+    def tasks(self, repo=None, feature=None, state=None):
+        query, params = "SELECT * FROM tasks WHERE 1 = 1", []
+        if repo is not None:
+            query += " AND repo = ?"
+            params.append(repo)
+        if feature is not None:
+            query += " AND feature = ?"
+            params.append(feature)
+        if state is not None:
+            query += " AND state = ?"
+            params.append(state)
+        with self._lock:
+            rows = self.conn.execute(query + " ORDER BY repo, issue_number", params).fetchall()
+        return [dict(r, labels=json.loads(r["labels"])) for r in rows]
+
+    # --- Dateien und Zusammenfassungen ----------------------------------------------------
+
+    def record_file(self, path, issue_number=None, agent=None, repo=None):
+        now = time.time()
+        with self._lock, transaction(self.conn):
+            self.conn.execute(
+                "INSERT INTO files (path, issue_number, agent, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET issue_number = excluded.issue_number, "
+                "agent = excluded.agent, updated_at = excluded.updated_at",
+                (path, issue_number, agent, now),
+            )
+            if issue_number is not None and repo is not None:
+                self.conn.execute(
+                    "UPDATE tasks SET file = ?, updated_at = ? WHERE repo = ? AND issue_number = ?",
+                    (path, now, repo, issue_number),
+                )
+
+    def files(self):
+        with self._lock:
+            return [dict(r) for r in self.conn.execute("SELECT * FROM files ORDER BY path")]
+
+    def get_summary(self, path, digest):
+        """:return: gespeicherte Zusammenfassung, solange der Inhalt unverändert ist, sonst None"""
+        with self._lock:
+            row = self.conn.execute("SELECT digest, summary FROM summaries WHERE path = ?", (path,)).fetchone()
+            if row is not None and row["digest"] is None:
+                # Aus .summaries.json übernommen: gilt für den jetzigen Inhalt, ab dann mit Hash
+                self.conn.execute(
+                    "UPDATE summaries SET digest = ? WHERE path = ? AND digest IS NULL", (digest, path))
+                return row["summary"]
+        if row is None or row["digest"] != digest:
+            return None
+        return row["summary"]
+
+    def set_summary(self, path, digest, summary):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO summaries (path, digest, summary, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET digest = excluded.digest, summary = excluded.summary, "
+                "updated_at = excluded.updated_at",
+                (path, digest, summary, time.time()),
+            )
+
+    # --- Altes Format --------------------------------------------------------------------
+
+    def load(self):
+        """Der Projektstatus im Format von project_state.json."""
+        features = [
+            {"title": f["title"], "description": f["description"], "priority": f["priority"], "status": f["status"]}
+            for f in self.features()
+        ]
+        return {"features": features, "description": self.get_description()}
+
+    def save(self, state):
+        """Übernimmt Beschreibung und Features aus einem Status im alten Format (inkrementell)."""
+        if state.get("description"):
+            self.set_description(state["description"])
+        self.upsert_features(state.get("features", []))
+
+    def export_json(self, path=None):
+        path = path or self.json_path
+        _write_json_atomic(path, self.load())
+        return path
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_state_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProjectStateStore()
+        return _store
+
+def load_project_state():
+    return get_state_store().load()
+
+def save_project_state(state):
+    get_state_store().save(state)
+
+def export_project_state(path=None):
+    path = get_state_store().export_json(path)
+    log(f"💾 Projektstatus exportiert: {path}")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Projektstatus anzeigen oder als JSON exportieren")
+    parser.add_argument("command", choices=["show", "export"])
+    parser.add_argument("path", nargs="?", help="export: Zieldatei (Standard: project_state.json)")
+    args = parser.parse_args()
+
+    store = get_state_store()
+    if args.command == "export":
+        export_project_state(args.path)
+    else:
+        print(json.dumps(store.load(), indent=2, ensure_ascii=False))
+        for task in store.tasks():
+            print(f"{task['repo'] or '?'}#{task['issue_number']:<5} {task['state']:<14} {task['agent'] or '-':<9} {task['title']} → {task['file'] or '-'}")
@@ -0,0 +1,72 @@
+"""
+Prompt-Vorlagen mit stabilem Präfix.
+
+Ollama kann den KV-Cache nur wiederverwenden, wenn der Anfang des Prompts byte-identisch
+ist. Deshalb steht alles, was sich innerhalb eines Laufs nicht ändert (Rolle, Projekt-
+beschreibung, Antwortformat), im System-Prompt einer AgentSession. Alles, was sich pro
+Issue ändert (Kontext, Aufgabe), kommt erst danach in die Nutzer-Nachricht.
+"""
+
+import threading
+from gpt_utils import call_ollama, call_gpt_and_parse_json
+from project_state import get_state_store
+
+
+def load_project_description():
+    return get_state_store().get_description()
+
+def build_system_prompt(role, project="", output_format=""):
+    """Stabile Segmente in fester Reihenfolge: Rolle, Projekt, Antwortformat."""
+    parts = [role.strip()]
+    if project:
+        parts.append(f"Projektbeschreibung:\n{project.strip()}")
+    if output_format:
+        parts.append(f"Antwortformat:\n{output_format.strip()}")
+    return "\n\n".join(parts)
+
+def build_user_prompt(sections):
+    """
+    :param sections: Liste von (Überschrift, Text) – vom stabilsten zum variabelsten,
+                     die eigentliche Aufgabe zuletzt. Leere Abschnitte entfallen.
+    """
+    parts = []
+    for heading, text in sections:
+        if text and text.strip():
+            parts.append(f"{heading}:\n{text.strip()}")
+    return "\n\n".join(parts)
+
+
+class AgentSession:
+    """
+    Eine Sitzung pro Agent und Lauf: fester System-Prompt (und damit festes Präfix) sowie
+    feste Aufgabenstufe im Modell-Router. Ollama hält das Modell per keep_alive geladen.
+    """
+
+    def __init__(self, agent_name, role, output_format="", task=None, project=None):
+        self.agent_name = agent_name
+        self.task = task
+        project = load_project_description() if project is None else project
+        self.system = build_system_prompt(role, project, output_format)
+
+    def ask(self, sections, **kwargs):
+        kwargs.setdefault("task", self.task)
+        return call_ollama(build_user_prompt(sections), agent_name=self.agent_name, system=self.system, **kwargs)
+
+    def ask_json(self, sections, schema=None, **kwargs):
+        kwargs.setdefault("task", self.task)
+        return call_gpt_and_parse_json(
+            self.agent_name, build_user_prompt(sections), schema=schema, system=self.system, **kwargs
+        )
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_agent_session(agent_name, role, output_format="", task=None):
+    """Liefert für dieselbe Rolle immer dieselbe Sitzung, damit das Präfix stabil bleibt."""
+    key = (agent_name, role, output_format, task)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = AgentSession(agent_name, role, output_format, task)
+        return _sessions[key]
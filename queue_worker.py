@@ -0,0 +1,73 @@
+"""
+Zusätzlicher Arbeitsprozess für die dauerhafte Warteschlange (task_queue): übernimmt bereite
+Agenten-Schritte eines Projekts, während setup_project läuft – auch auf einem zweiten Rechner
+mit derselben Datenbank (TASK_QUEUE_DB).
+
+    python queue_worker.py <repo>
+    python queue_worker.py <repo> --agents qa --idle 300
+
+Frontend und Backend erzeugen README.md bzw. docs/api_docs.md komplett neu; die Sperren dafür
+(write_utils.file_lock) gelten nur im Prozess. Auf derselben Arbeitskopie wie der Manager
+daher nur Agenten ohne solche Dateien übernehmen (z. B. --agents qa).
+"""
+
+import os
+import time
+import argparse
+from dotenv import load_dotenv
+from json_schemas import AGENT_NAMES
+from task_queue import get_task_queue, WORKER_ID, TASK_WAIT_POLL
+
+load_dotenv()
+QUEUE_WORKER_IDLE = float(os.getenv("QUEUE_WORKER_IDLE", "120"))  # Sekunden ohne Arbeit bis zum Ende
+
+
+def log(msg):
+    print(f"👷 [queue_worker] {msg}")
+
+def run_worker(repo, agents=None, idle_timeout=QUEUE_WORKER_IDLE):
+    """
+    :param agents: nur Schritte dieser Agenten (Standard: alle außer der Planung)
+    :return: Anzahl bearbeiteter Schritte
+    """
+    from agents.manager_agent.main import call_agent_by_name
+
+    queue = get_task_queue()
+    agents = agents or AGENT_NAMES
+    handled = 0
+    idle_since = time.time()
+    log(f"🚀 {WORKER_ID} arbeitet für {repo} ({', '.join(agents)})")
+    while True:
+        task = queue.lease(repo, agents=agents)
+        if task is None:
+            if time.time() - idle_since > idle_timeout:
+                break
+            time.sleep(TASK_WAIT_POLL)
+            continue
+
+        payload = task["payload"]
+        log(f"▶️ {task['task_id']} (Versuch {task['attempts']})")
+        try:
+            with queue.hold(repo, task["task_id"]):
+                ok = call_agent_by_name(task["agent"], repo, payload["local_path"], payload["issue_number"])
+        except Exception as e:
+            ok = False
+            log(f"❌ {task['task_id']}: {e}")
+        if ok:
+            queue.complete(repo, task["task_id"])
+        else:
+            queue.fail(repo, task["task_id"], error="Agent meldete Fehlschlag")
+        handled += 1
+        idle_since = time.time()
+
+    log(f"🏁 Keine Arbeit mehr – {handled} Schritt(e) bearbeitet, Stand: {queue.summary(repo)}")
+    return handled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agenten-Schritte aus der dauerhaften Warteschlange abarbeiten")
+    parser.add_argument("repo")
+    parser.add_argument("--agents", help="kommagetrennt, z. B. frontend,backend")
+    parser.add_argument("--idle", type=float, default=QUEUE_WORKER_IDLE, help="Sekunden ohne Arbeit bis zum Ende")
+    args = parser.parse_args()
+    run_worker(args.repo, args.agents.split(",") if args.agents else None, args.idle)
@@ -1,23 +1,13 @@
 import os
-import json
 from gpt_utils import call_ollama
-from github_utils import push_file_to_repo
-
-SUMMARY_CACHE = ".summaries.json"
+from commit_batcher import stage_file
+from write_utils import file_lock
+from project_state import get_state_store, content_digest
 
 def log(msg):
     print(f"📘 [readme_generator] {msg}")
 
 def summarize_file(path):
-    # Lade Cache
-    summaries = {}
-    if os.path.exists(SUMMARY_CACHE):
-        with open(SUMMARY_CACHE, "r", encoding="utf-8") as f:
-            summaries = json.load(f)
-
-    if path in summaries:
-        return summaries[path]
-
     try:
         with open(path, "r", encoding="utf-8") as f:
             content = f.read()
@@ -25,6 +15,13 @@ def summarize_file(path):
         log(f"[WARN] Datei nicht lesbar: {path}")
         return "Datei konnte nicht gelesen werden."
 
+    # Gespeicherte Zusammenfassung nur, solange sich der Inhalt nicht geändert hat
+    store = get_state_store()
+    digest = content_digest(content)
+    cached = store.get_summary(path, digest)
+    if cached is not None:
+        return cached
+
     prompt = f"""
 Fasse den folgenden Code in 1-3 Sätzen zusammen. Nenne dabei Zweck und Funktion der Datei:
 
@@ -39,15 +36,17 @@ Zusammenfassung:
 \"\"\"
     """
 
-    summary = call_ollama("readme_generator", prompt).strip()
-
-    summaries[path] = summary
-    with open(SUMMARY_CACHE, "w", encoding="utf-8") as f:
-        json.dump(summaries, f, indent=2, ensure_ascii=False)
+    summary = call_ollama(prompt, agent_name="readme_generator", task="summary").strip()
 
+    store.set_summary(path, digest, summary)
     return summary
 
 def generate_readme(project_state, repo_path, repo_name=None):
+    # Mehrere Agenten erzeugen die README parallel neu – nacheinander, damit keine veraltete gewinnt
+    with file_lock(repo_path, "README.md"):
+        _generate_readme(project_state, repo_path, repo_name)
+
+def _generate_readme(project_state, repo_path, repo_name=None):
     log("📄 Generiere README.md...")
 
     lines = []
@@ -99,6 +98,6 @@ def generate_readme(project_state, repo_path, repo_name=None):
 
     # Optional: ins GitHub-Repo pushen
     if repo_name:
-        push_file_to_repo(repo_name, "README.md", content, "📝 Update README")
-        log("📤 README.md ins Repository übertragen.")
+        stage_file(repo_name, "README.md", content, "📝 Update README", repo_path)
+        log("📤 README.md für den nächsten Commit vorgemerkt.")
 
@@ -0,0 +1,87 @@
+"""
+Spielt aufgezeichnete GitHub-Ereignisse erneut ein – für Offline-Tests ohne echtes GitHub.
+
+Eingabe sind die JSONL-Dateien aus logs/events/ (siehe event_queue.record_event) oder einzelne
+Payload-Dateien, wie GitHub sie unter "Recent Deliveries" anzeigt (dann mit --event).
+
+    python replay_events.py logs/events/events_20250101.jsonl
+    python replay_events.py payload.json --event issue_comment --url http://127.0.0.1:8787/webhook
+    python replay_events.py logs/events/*.jsonl --direct
+
+Ohne --direct werden die Ereignisse (signiert mit GITHUB_WEBHOOK_SECRET) an den laufenden
+Webhook-Empfänger geschickt; mit --direct werden sie nur übersetzt und die Arbeitseinträge
+ausgegeben.
+"""
+
+import sys
+import json
+import time
+import uuid
+import argparse
+import requests
+from webhook_server import WEBHOOK_HOST, WEBHOOK_PORT, sign
+
+
+def log(msg):
+    print(f"⏪ [replay_events] {msg}")
+
+def load_events(path, event=None):
+    """:return: Liste von (event, delivery, payload)"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if event:
+        return [(event, None, json.loads(text))]
+    events = []
+    for line in text.splitlines():
+        if line.strip():
+            record = json.loads(line)
+            events.append((record["event"], record.get("delivery"), record["payload"]))
+    return events
+
+def replay(events, url, delay=0.0, keep_delivery=False):
+    """
+    :param keep_delivery: Original-Delivery-ID mitschicken – der Empfänger verwirft dann
+                          Ereignisse, die er schon kennt
+    """
+    session = requests.Session()
+    for event, delivery, payload in events:
+        body = json.dumps(payload).encode()
+        headers = {
+            "Content-Type": "application/json",
+            "X-GitHub-Event": event,
+            "X-GitHub-Delivery": delivery if keep_delivery and delivery else str(uuid.uuid4()),
+            "X-Hub-Signature-256": sign(body),
+        }
+        res = session.post(url, data=body, headers=headers, timeout=10)
+        log(f"{event}: HTTP {res.status_code} {res.text}")
+        if delay:
+            time.sleep(delay)
+
+def replay_direct(events):
+    from event_queue import get_event_queue
+    queue = get_event_queue()
+    for event, delivery, payload in events:
+        for item in queue.submit(event, payload, delivery):
+            print(json.dumps(item, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aufgezeichnete GitHub-Ereignisse erneut einspielen")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--event", help="Ereignistyp, wenn die Dateien einzelne Payloads enthalten")
+    parser.add_argument("--url", default=f"http://{WEBHOOK_HOST}:{WEBHOOK_PORT}/webhook")
+    parser.add_argument("--delay", type=float, default=0.0, help="Pause zwischen Ereignissen in Sekunden")
+    parser.add_argument("--keep-delivery", action="store_true")
+    parser.add_argument("--direct", action="store_true", help="nur übersetzen und ausgeben, nichts senden")
+    args = parser.parse_args()
+
+    events = [e for path in args.files for e in load_events(path, args.event)]
+    log(f"{len(events)} Ereignis(se) geladen")
+    if args.direct:
+        replay_direct(events)
+    else:
+        try:
+            replay(events, args.url, args.delay, args.keep_delivery)
+        except requests.ConnectionError:
+            log(f"❌ Webhook-Empfänger unter {args.url} nicht erreichbar")
+            sys.exit(1)
@@ -0,0 +1,325 @@
+import os
+import json
+import math
+import atexit
+import hashlib
+import threading
+from collections import Counter
+from context_assembler import terms
+
+REPO_INDEX_DIR = os.getenv("REPO_INDEX_DIR", ".repo_index")
+REPO_INDEX_EMBED_MODEL = os.getenv("REPO_INDEX_EMBED_MODEL", "")  # z. B. nomic-embed-text; leer = nur BM25
+REPO_INDEX_EMBED_WEIGHT = float(os.getenv("REPO_INDEX_EMBED_WEIGHT", "0.5"))
+CHUNK_LINES = int(os.getenv("REPO_INDEX_CHUNK_LINES", "40"))
+CHUNK_OVERLAP = 8
+
+INDEXED_EXTENSIONS = (".dart", ".yaml", ".yml", ".md")
+SKIPPED_DIRS = {".git", ".dart_tool", "build", ".idea", ".gradle", "ios", "android", "macos", "windows", "linux"}
+
+
+def log(msg):
+    print(f"🔎 [repo_index] {msg}")
+
+def _file_hash(content):
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+def _chunk(content):
+    """Zerlegt eine Datei in überlappende Zeilenfenster: (start_line, end_line, text), 1-basiert."""
+    lines = content.splitlines()
+    if not lines:
+        return []
+    chunks = []
+    step = max(1, CHUNK_LINES - CHUNK_OVERLAP)
+    for start in range(0, len(lines), step):
+        end = min(len(lines), start + CHUNK_LINES)
+        chunks.append((start + 1, end, "\n".join(lines[start:end])))
+        if end == len(lines):
+            break
+    return chunks
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class RepoIndex:
+    """
+    Inkrementeller Suchindex über das generierte Flutter-Projekt unter local_path.
+
+    Dateien werden anhand von mtime/Größe und notfalls Inhalts-Hash als unverändert erkannt,
+    nur geänderte Dateien werden neu zerlegt. Gesucht wird per BM25 über Zeilenfenster,
+    optional kombiniert mit lokalen Ollama-Embeddings (REPO_INDEX_EMBED_MODEL).
+    """
+
+    def __init__(self, local_path, index_dir=REPO_INDEX_DIR, embed_model=REPO_INDEX_EMBED_MODEL):
+        self.local_path = os.path.abspath(local_path)
+        self.embed_model = embed_model
+        key = hashlib.sha1(self.local_path.encode("utf-8")).hexdigest()[:12]
+        self.index_path = os.path.join(index_dir, f"{key}.json")
+        self.files = {}   # rel_path -> {"mtime", "size", "hash", "chunks": [chunk_id]}
+        self.chunks = {}  # chunk_id -> {"path", "start", "end", "text", "tf", "length", "embedding"}
+        self.df = Counter()
+        self.total_length = 0
+        self.dirty = False
+        self._lock = threading.RLock()
+        self.ready = threading.Event()  # gesetzt nach dem ersten refresh() (siehe get_repo_index)
+        self._load()
+
+    # --- Persistenz ---------------------------------------------------------------------
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            log("⚠️ Index unlesbar – wird neu aufgebaut.")
+            return
+        if data.get("embed_model", "") != self.embed_model:
+            log("ℹ️ Embedding-Modell geändert – Index wird neu aufgebaut.")
+            return
+        self.files = data.get("files", {})
+        self.chunks = data.get("chunks", {})
+        for chunk in self.chunks.values():
+            self.df.update(chunk["tf"].keys())
+            self.total_length += chunk["length"]
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"embed_model": self.embed_model, "files": self.files, "chunks": self.chunks}, f)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+
+    # --- Aktualisierung -----------------------------------------------------------------
+
+    def _eligible(self, rel_path):
+        parts = rel_path.replace("\\", "/").split("/")
+        if any(p in SKIPPED_DIRS or p.startswith(".") for p in parts[:-1]):
+            return False
+        return rel_path.endswith(INDEXED_EXTENSIONS) and not parts[-1].startswith(".")
+
+    def _remove_file(self, rel_path):
+        entry = self.files.pop(rel_path, None)
+        if not entry:
+            return
+        for chunk_id in entry["chunks"]:
+            chunk = self.chunks.pop(chunk_id, None)
+            if chunk:
+                self.df.subtract(chunk["tf"].keys())
+                self.total_length -= chunk["length"]
+        self.df += Counter()  # Einträge mit 0 entfernen
+
+    def _embed(self, text):
+        from gpt_utils import get_ollama_client, OllamaError
+        try:
+            return get_ollama_client().embed(text, self.embed_model)
+        except (OllamaError, OSError) as e:
+            log(f"⚠️ Embedding fehlgeschlagen, nur BM25: {e}")
+            self.embed_model = ""
+            return None
+
+    def update_file(self, rel_path):
+        """
+        Bringt eine einzelne Datei auf den aktuellen Stand (neu, geändert oder gelöscht).
+        :return: True, wenn sich der Index geändert hat
+        """
+        rel_path = os.path.normpath(rel_path).replace("\\", "/")
+        if not self._eligible(rel_path):
+            return False
+        full_path = os.path.join(self.local_path, rel_path)
+
+        with self._lock:
+            if not os.path.isfile(full_path):
+                if rel_path in self.files:
+                    self._remove_file(rel_path)
+                    self.dirty = True
+                    return True
+                return False
+
+            st = os.stat(full_path)
+            entry = self.files.get(rel_path)
+            if entry and entry["mtime"] == st.st_mtime and entry["size"] == st.st_size:
+                return False
+            known_hash = entry["hash"] if entry else None
+
+        # Lesen, Zerlegen und vor allem die Embedding-Aufrufe ohne Sperre – andere Agenten
+        # schreiben und suchen derweil weiter; eingetauscht wird erst am Ende
+        try:
+            with open(full_path, "r", encoding="utf-8") as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return False
+
+        digest = _file_hash(content)
+        chunks = {}
+        if digest != known_hash:
+            for start, end, text in _chunk(content):
+                tf = Counter(terms(f"{rel_path}\n{text}"))
+                chunk = {
+                    "path": rel_path,
+                    "start": start,
+                    "end": end,
+                    "text": text,
+                    "tf": dict(tf),
+                    "length": sum(tf.values()),
+                }
+                if self.embed_model:
+                    chunk["embedding"] = self._embed(text)
+                chunks[f"{rel_path}:{start}"] = chunk
+
+        with self._lock:
+            try:
+                current = os.stat(full_path)
+            except OSError:
+                return False  # inzwischen gelöscht – der nächste Abgleich entfernt die Datei
+            if (current.st_mtime, current.st_size) != (st.st_mtime, st.st_size):
+                return False  # inzwischen erneut geschrieben – der Aufruf dazu indiziert den neuen Stand
+            entry = self.files.get(rel_path)
+            if entry and entry["hash"] == digest:
+                entry["mtime"], entry["size"] = st.st_mtime, st.st_size
+                self.dirty = True
+                return False
+
+            self._remove_file(rel_path)
+            for chunk_id, chunk in chunks.items():
+                self.chunks[chunk_id] = chunk
+                self.df.update(chunk["tf"].keys())
+                self.total_length += chunk["length"]
+            self.files[rel_path] = {
+                "mtime": st.st_mtime, "size": st.st_size, "hash": digest, "chunks": list(chunks),
+            }
+            self.dirty = True
+            return True
+
+    def refresh(self):
+        """Gleicht den Index mit dem Dateisystem ab; unveränderte Dateien kosten nur ein stat()."""
+        changed = 0
+        seen = set()
+        for root, dirs, files in os.walk(self.local_path):
+            dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS and not d.startswith(".")]
+            for name in files:
+                rel_path = os.path.relpath(os.path.join(root, name), self.local_path).replace("\\", "/")
+                if not self._eligible(rel_path):
+                    continue
+                seen.add(rel_path)
+                changed += self.update_file(rel_path)
+        with self._lock:
+            for rel_path in [p for p in self.files if p not in seen]:
+                self._remove_file(rel_path)
+                self.dirty = True
+                changed += 1
+        self.save()
+        if changed:
+            log(f"🔄 {changed} Datei(en) neu indiziert, {len(self.files)} insgesamt.")
+        return changed
+
+    # --- Suche --------------------------------------------------------------------------
+
+    def query(self, text, k=5, extensions=None):
+        """
+        Liefert die k relevantesten Ausschnitte als Dicts mit path, start, end, text, score.
+        :param extensions: optional nur Dateien mit diesen Endungen
+        """
+        query_terms = set(terms(text))
+        # Der Embedding-Aufruf braucht den Index nicht – vor der Sperre erledigen
+        query_embedding = self._embed(text) if self.embed_model else None
+        with self._lock:
+            candidates = [
+                (chunk_id, c) for chunk_id, c in self.chunks.items()
+                if not extensions or c["path"].endswith(tuple(extensions))
+            ]
+            if not candidates:
+                return []
+            n = len(self.chunks)
+            avg_len = self.total_length / n if n else 1.0
+            k1, b = 1.2, 0.75
+
+            scores = {}
+            for chunk_id, chunk in candidates:
+                score = 0.0
+                for term in query_terms:
+                    tf = chunk["tf"].get(term, 0)
+                    if not tf:
+                        continue
+                    df = self.df.get(term, 0)
+                    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                    score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * chunk["length"] / (avg_len or 1.0)))
+                scores[chunk_id] = score
+
+            if query_embedding:
+                top = max(scores.values()) or 1.0
+                for chunk_id, chunk in candidates:
+                    if chunk.get("embedding"):
+                        similarity = _cosine(query_embedding, chunk["embedding"])
+                        scores[chunk_id] = (
+                            (1 - REPO_INDEX_EMBED_WEIGHT) * scores[chunk_id] / top
+                            + REPO_INDEX_EMBED_WEIGHT * similarity
+                        )
+
+            ranked = sorted((cid for cid, _ in candidates), key=lambda cid: scores[cid], reverse=True)
+            results = []
+            used_paths = Counter()
+            for chunk_id in ranked:
+                if scores[chunk_id] <= 0 or len(results) >= k:
+                    break
+                chunk = self.chunks[chunk_id]
+                if used_paths[chunk["path"]] >= 2:
+                    continue  # nicht die ganze Auswahl mit einer einzigen Datei füllen
+                used_paths[chunk["path"]] += 1
+                results.append({
+                    "path": chunk["path"],
+                    "start": chunk["start"],
+                    "end": chunk["end"],
+                    "text": chunk["text"],
+                    "score": round(scores[chunk_id], 4),
+                })
+            return results
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_repo_index(local_path):
+    """Prozessweit eine Index-Instanz pro Projektpfad; beim ersten Zugriff wird abgeglichen."""
+    key = os.path.abspath(local_path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        created = index is None
+        if created:
+            index = RepoIndex(key)
+            _indexes[key] = index
+    # Abgleich ohne die globale Sperre – andere Projekte warten nicht darauf, nur weitere
+    # Zugriffe auf dieses Projekt bis zum Ende des ersten Abgleichs
+    if created:
+        try:
+            index.refresh()
+        finally:
+            index.ready.set()
+    else:
+        index.ready.wait()
+    return index
+
+def update_repo_index(local_path, rel_path):
+    """Nach jedem Schreibzugriff aufrufen; gespeichert wird gesammelt beim Beenden bzw. refresh()."""
+    get_repo_index(local_path).update_file(rel_path)
+
+@atexit.register
+def _save_indexes():
+    for index in list(_indexes.values()):
+        index.save()
+
+def format_snippets(snippets):
+    """Markdown-Darstellung für Prompts – ein Abschnitt pro Ausschnitt (passt zu ContextAssembler)."""
+    blocks = []
+    for s in snippets:
+        language = "dart" if s["path"].endswith(".dart") else ""
+        blocks.append(f"### {s['path']} (Zeilen {s['start']}-{s['end']})\n```{language}\n{s['text']}\n```")
+    return "\n".join(blocks)
@@ -0,0 +1,182 @@
+import os
+import time
+import random
+import threading
+
+LLM_CALL_MAX_ATTEMPTS = int(os.getenv("LLM_CALL_MAX_ATTEMPTS", "4"))
+LLM_RUN_MAX_ATTEMPTS = int(os.getenv("LLM_RUN_MAX_ATTEMPTS", "500"))
+LLM_RUN_MAX_TOKENS = int(os.getenv("LLM_RUN_MAX_TOKENS", "0"))  # 0 = unbegrenzt
+LLM_AGENT_MAX_ATTEMPTS = int(os.getenv("LLM_AGENT_MAX_ATTEMPTS", "150"))
+LLM_AGENT_MAX_TOKENS = int(os.getenv("LLM_AGENT_MAX_TOKENS", "0"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "120"))
+
+
+def log(msg):
+    print(f"🛑 [retry_policy] {msg}")
+
+
+class LLMCallAbandoned(ValueError):
+    """
+    Ein LLM-Aufruf wurde aufgegeben, bevor er das Modell erreicht hat.
+    Erbt von ValueError, damit bestehende Aufrufer ihn wie "kein gültiges JSON" behandeln.
+    """
+
+    def __init__(self, agent_name, reason):
+        super().__init__(f"LLM-Aufruf für '{agent_name}' abgebrochen: {reason}")
+        self.agent_name = agent_name
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """
+    Öffnet nach `threshold` aufeinanderfolgenden Fehlschlägen und lässt dann für `cooldown`
+    Sekunden keine Aufrufe mehr durch. Danach ist genau ein Probeaufruf erlaubt (half-open).
+    """
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class RetryPolicy:
+    """
+    Gemeinsame Wiederholungsregeln für alle Agenten: Versuchs- und Tokenbudgets pro Lauf und
+    pro Agent, exponentielles Backoff mit Jitter und ein Circuit Breaker pro Agent.
+    """
+
+    def __init__(
+        self,
+        call_max_attempts=LLM_CALL_MAX_ATTEMPTS,
+        run_max_attempts=LLM_RUN_MAX_ATTEMPTS,
+        run_max_tokens=LLM_RUN_MAX_TOKENS,
+        agent_max_attempts=LLM_AGENT_MAX_ATTEMPTS,
+        agent_max_tokens=LLM_AGENT_MAX_TOKENS,
+        backoff_base=LLM_BACKOFF_BASE,
+        backoff_max=LLM_BACKOFF_MAX,
+    ):
+        self.call_max_attempts = call_max_attempts
+        self.run_max_attempts = run_max_attempts
+        self.run_max_tokens = run_max_tokens
+        self.agent_max_attempts = agent_max_attempts
+        self.agent_max_tokens = agent_max_tokens
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.run_attempts = 0
+        self.run_tokens = 0
+        self.agent_attempts = {}
+        self.agent_tokens = {}
+        self.breakers = {}
+        self.abandoned = []
+
+    def _breaker(self, agent_name):
+        if agent_name not in self.breakers:
+            self.breakers[agent_name] = CircuitBreaker()
+        return self.breakers[agent_name]
+
+    def _abandon(self, agent_name, reason):
+        self.abandoned.append({"agent": agent_name, "reason": reason, "time": time.time()})
+        log(f"⛔ {agent_name}: {reason}")
+        return LLMCallAbandoned(agent_name, reason)
+
+    def check(self, agent_name):
+        """Wirft LLMCallAbandoned, wenn für diesen Agenten kein weiterer Versuch erlaubt ist."""
+        with self._lock:
+            if self.run_attempts >= self.run_max_attempts:
+                raise self._abandon(agent_name, f"Laufbudget von {self.run_max_attempts} Versuchen erschöpft")
+            if self.run_max_tokens and self.run_tokens >= self.run_max_tokens:
+                raise self._abandon(agent_name, f"Laufbudget von {self.run_max_tokens} Tokens erschöpft")
+            if self.agent_attempts.get(agent_name, 0) >= self.agent_max_attempts:
+                raise self._abandon(agent_name, f"Agentenbudget von {self.agent_max_attempts} Versuchen erschöpft")
+            if self.agent_max_tokens and self.agent_tokens.get(agent_name, 0) >= self.agent_max_tokens:
+                raise self._abandon(agent_name, f"Agentenbudget von {self.agent_max_tokens} Tokens erschöpft")
+            breaker = self._breaker(agent_name)
+            if not breaker.allow():
+                raise self._abandon(
+                    agent_name,
+                    f"Circuit Breaker offen nach {breaker.failures} unbrauchbaren Antworten in Folge",
+                )
+
+    def record_attempt(self, agent_name, tokens=0):
+        with self._lock:
+            self.run_attempts += 1
+            self.run_tokens += tokens
+            self.agent_attempts[agent_name] = self.agent_attempts.get(agent_name, 0) + 1
+            self.agent_tokens[agent_name] = self.agent_tokens.get(agent_name, 0) + tokens
+
+    def record_success(self, agent_name):
+        with self._lock:
+            self._breaker(agent_name).record_success()
+
+    def record_failure(self, agent_name):
+        with self._lock:
+            self._breaker(agent_name).record_failure()
+
+    def give_up(self, agent_name, reason):
+        """Für Aufrufer, die nach max_attempts aufgeben – protokolliert den Grund."""
+        with self._lock:
+            return self._abandon(agent_name, reason)
+
+    def backoff_delay(self, attempt):
+        """Wartezeit vor Versuch Nummer `attempt` (0 = erster Versuch, kein Warten)."""
+        if attempt <= 0:
+            return 0.0
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def report(self):
+        with self._lock:
+            return {
+                "run_attempts": self.run_attempts,
+                "run_tokens": self.run_tokens,
+                "agent_attempts": dict(self.agent_attempts),
+                "agent_tokens": dict(self.agent_tokens),
+                "open_breakers": [a for a, b in self.breakers.items() if b.state != "closed"],
+                "abandoned": list(self.abandoned),
+            }
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_retry_policy():
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = RetryPolicy()
+        return _policy
@@ -0,0 +1,94 @@
+"""
+Regelbasierter Schnellweg für die Planung der nächsten Schritte.
+
+Welcher Agent ein Issue bearbeitet, steht fast immer schon in den Labels, die der Planer
+vergeben hat (frontend/backend/qa/devops, prio1–prio3). Solche Issues werden ohne LLM-Aufruf
+eingeplant – sortiert nach PLANNER_ORDER. Nur Issues ohne Agenten-Label oder mit
+widersprüchlichen Labels (mehrere Agenten bzw. Prioritäten) gehen an das LLM.
+
+Issues, die laut Projektstatus (project_state, Task-Zustand "erledigt") schon erfolgreich
+bearbeitet wurden, werden gar nicht erst eingeplant – weder über die Regeln noch über das LLM.
+Frontend und Backend schließen ihre Issues nicht, ohne diese Regel würde jede Folgerunde sie
+erneut erzeugen. Ausnahme: ein neuer Kommentar (Webhook, "new_comment") bedeutet neue Arbeit.
+
+    PLANNER_ORDER="priority,label,age"       Sortierschlüssel, beliebige Reihenfolge
+    PLANNER_LABEL_ORDER="backend,frontend,qa,devops"
+    PLANNER_AGE="oldest"                     oder "newest"
+"""
+
+import os
+import re
+from json_schemas import AGENT_NAMES
+from project_state import get_state_store
+
+PLANNER_FAST_PATH = os.getenv("PLANNER_FAST_PATH", "1") == "1"
+PLANNER_ORDER = [k.strip() for k in os.getenv("PLANNER_ORDER", "priority,label,age").split(",") if k.strip()]
+PLANNER_LABEL_ORDER = [
+    label.strip() for label in os.getenv("PLANNER_LABEL_ORDER", "backend,frontend,qa,devops").split(",") if label.strip()
+]
+PLANNER_AGE = os.getenv("PLANNER_AGE", "oldest")
+PLANNER_MAX_STEPS = int(os.getenv("PLANNER_MAX_STEPS", "5"))
+
+# Issues mit diesen Labels brauchen keinen weiteren Schritt
+SKIP_LABELS = ("done",)
+PRIORITY_LABEL = re.compile(r"^prio(\d+)$")
+
+
+def log(msg):
+    print(f"📏 [rule_planner] {msg}")
+
+def finished_issues(repo):
+    """Issue-Nummern des Repos, deren Schritt laut Projektstatus erfolgreich abgeschlossen ist."""
+    return {t["issue_number"] for t in get_state_store().tasks(repo=repo, state="erledigt")}
+
+def classify(issue, finished=()):
+    """
+    :param finished: Issue-Nummern, die schon erledigt sind (siehe finished_issues)
+    :return: (Agent, Priorität, Grund) – Agent None, wenn das LLM entscheiden muss;
+             Grund "skip", wenn nichts zu tun ist
+    """
+    labels = issue.get("labels", [])
+    if any(label in SKIP_LABELS for label in labels):
+        return None, None, "skip"
+    if issue["issue_number"] in finished and not issue.get("new_comment"):
+        return None, None, "skip"
+    agents = sorted({label for label in labels if label in AGENT_NAMES})
+    priorities = sorted({int(m.group(1)) for m in map(PRIORITY_LABEL.match, labels) if m})
+    if not agents:
+        return None, None, "kein Agenten-Label"
+    if len(agents) > 1:
+        return None, None, f"mehrere Agenten-Labels: {', '.join(agents)}"
+    if len(priorities) > 1:
+        return None, None, f"mehrere Prioritäten: {', '.join(f'prio{p}' for p in priorities)}"
+    return agents[0], priorities[0] if priorities else 3, None
+
+def _sort_key(step, order):
+    key = []
+    for name in order:
+        if name == "priority":
+            key.append(step["priority"])
+        elif name == "label":
+            agent = step["agent"]
+            key.append(PLANNER_LABEL_ORDER.index(agent) if agent in PLANNER_LABEL_ORDER else len(PLANNER_LABEL_ORDER))
+        elif name == "age":
+            # Issue-Nummern steigen mit dem Anlegen – kleinere Nummer = älteres Issue
+            key.append(step["issue_number"] if PLANNER_AGE == "oldest" else -step["issue_number"])
+    return key
+
+def plan_by_rules(issues, repo, order=None, max_steps=PLANNER_MAX_STEPS, finished=None):
+    """
+    :param finished: erledigte Issue-Nummern; Standard: aus dem Projektstatus des Repos
+    :return: (Schritte {"agent", "issue_number", "priority", "source": "rules"}, Issues für das LLM)
+    """
+    finished = finished_issues(repo) if finished is None else finished
+    steps, escalate = [], []
+    for issue in issues:
+        agent, priority, reason = classify(issue, finished)
+        if reason == "skip":
+            continue
+        if agent is None:
+            escalate.append(dict(issue, escalation=reason))
+            continue
+        steps.append({"agent": agent, "issue_number": issue["issue_number"], "priority": priority, "source": "rules"})
+    steps.sort(key=lambda s: _sort_key(s, order or PLANNER_ORDER))
+    return steps[:max_steps], escalate
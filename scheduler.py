@@ -0,0 +1,199 @@
+"""
+Abhängigkeitsgesteuerter Scheduler: Aufgaben bilden einen DAG, alles, dessen Vorgänger erledigt
+sind, läuft parallel auf einem Thread-Pool – begrenzt durch eine Obergrenze pro Agent
+(z. B. nur ein QA-Lauf gleichzeitig, weil flutter test das Projektverzeichnis belegt).
+
+Knoten dürfen während des Laufs neue Knoten anlegen (z. B. plant ein Feature-Knoten seine
+Aufgaben und hängt die Issue-Knoten an). Schlägt ein Knoten fehl, werden seine Nachfolger
+übersprungen; unabhängige Zweige laufen weiter.
+"""
+
+import os
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tracing import span
+
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+# Obergrenzen pro Agent, z. B. "frontend=2,backend=2,qa=1"; nicht genannte Agenten: SCHEDULER_WORKERS
+SCHEDULER_AGENT_LIMITS = os.getenv("SCHEDULER_AGENT_LIMITS", "frontend=2,backend=2,qa=1,devops=1,readme=1")
+
+# Standard-Abhängigkeiten nach Label/Agent innerhalb einer Gruppe (Feature bzw. Planungsrunde)
+AGENT_AFTER = {
+    "qa": ("frontend", "backend"),
+    "devops": ("frontend", "backend", "qa"),
+}
+
+PENDING, RUNNING, DONE, FAILED, SKIPPED = "pending", "running", "done", "failed", "skipped"
+
+
+def log(msg):
+    print(f"🗓️ [scheduler] {msg}")
+
+def parse_agent_limits(spec=SCHEDULER_AGENT_LIMITS):
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        agent, _, value = part.partition("=")
+        limits[agent.strip()] = max(1, int(value))
+    return limits
+
+
+class DagScheduler:
+    def __init__(self, workers=SCHEDULER_WORKERS, agent_limits=None):
+        self.workers = workers
+        self.agent_limits = parse_agent_limits() if agent_limits is None else agent_limits
+        self.nodes = {}     # id -> {"id", "agent", "run", "deps", "state", "priority", "result", "meta"}
+        self.order = []     # Einfügereihenfolge als Gleichstand-Kriterium
+        self._lock = threading.Lock()
+
+    def add(self, node_id, agent, run, deps=(), priority=3, always=False, **meta):
+        """
+        :param run: Funktion ohne Argumente; ein Rückgabewert False gilt als Fehlschlag
+        :param deps: IDs, die vorher erledigt sein müssen; unbekannte IDs werden ignoriert
+        :param priority: 1 = zuerst (wie die prioN-Labels)
+        :param always: auch ausführen, wenn Vorgänger fehlgeschlagen sind (z. B. Abschlussarbeiten)
+        """
+        with self._lock:
+            if node_id in self.nodes:
+                return False
+            self.nodes[node_id] = {
+                "id": node_id,
+                "agent": agent,
+                "run": run,
+                "deps": set(deps),
+                "state": PENDING,
+                "priority": priority,
+                "always": always,
+                "result": None,
+                "meta": meta,
+            }
+            self.order.append(node_id)
+            return True
+
+    def _drop_unknown_and_cyclic_deps(self):
+        for node in self.nodes.values():
+            unknown = {d for d in node["deps"] if d not in self.nodes}
+            if unknown:
+                log(f"⚠️ {node['id']}: unbekannte Abhängigkeiten ignoriert: {sorted(unknown)}")
+                node["deps"] -= unknown
+        # Kahn: was nach dem Abbau noch Abhängigkeiten hat, liegt in einem Zyklus oder dahinter.
+        # Aufgebrochen wird jeweils beim ersten eingefügten Knoten, dann wird neu abgebaut.
+        remaining = {n["id"]: n["deps"] for n in self.nodes.values() if n["state"] == PENDING}
+        while remaining:
+            changed = True
+            while changed:
+                changed = False
+                for node_id, deps in list(remaining.items()):
+                    if not deps & remaining.keys():
+                        del remaining[node_id]
+                        changed = True
+            if remaining:
+                node_id = next(n for n in self.order if n in remaining)
+                log(f"🔁 {node_id}: zyklische Abhängigkeiten aufgelöst ({sorted(remaining[node_id] & remaining.keys())})")
+                self.nodes[node_id]["deps"].difference_update(remaining.keys())
+
+    def _skip_failed_branches(self):
+        changed = True
+        while changed:
+            changed = False
+            for node in self.nodes.values():
+                if node["state"] != PENDING or node["always"]:
+                    continue
+                if any(self.nodes[d]["state"] in (FAILED, SKIPPED) for d in node["deps"]):
+                    node["state"] = SKIPPED
+                    changed = True
+                    log(f"⏭️ {node['id']} übersprungen – Vorgänger fehlgeschlagen")
+
+    def _ready(self, running_per_agent, slots):
+        """Bereite Knoten nach Priorität, höchstens slots viele und innerhalb der Agenten-Grenzen."""
+        finished = (DONE, FAILED, SKIPPED)
+        ready = [
+            node for node in (self.nodes[node_id] for node_id in self.order)
+            if node["state"] == PENDING
+            and all(self.nodes[d]["state"] in (finished if node["always"] else (DONE,)) for d in node["deps"])
+        ]
+        ready.sort(key=lambda n: n["priority"])  # stabil: bei Gleichstand Einfügereihenfolge
+        selected = []
+        for node in ready:
+            if len(selected) >= slots:
+                break
+            agent = node["agent"]
+            if running_per_agent.get(agent, 0) < self.agent_limits.get(agent, self.workers):
+                running_per_agent[agent] = running_per_agent.get(agent, 0) + 1
+                selected.append(node)
+        return selected
+
+    def _execute(self, node):
+        with span("scheduler.node", node=node["id"], agent=node["agent"]):
+            return node["run"]()
+
+    def run(self):
+        """Arbeitet den DAG ab (auch Knoten, die unterwegs dazukommen). :return: {id: Zustand}"""
+        running = {}  # Future -> Knoten
+        running_per_agent = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scheduler") as pool:
+            while True:
+                with self._lock:
+                    self._drop_unknown_and_cyclic_deps()
+                    self._skip_failed_branches()
+                    for node in self._ready(running_per_agent, self.workers - len(running)):
+                        node["state"] = RUNNING
+                        future = pool.submit(contextvars.copy_context().run, self._execute, node)
+                        running[future] = node
+                    if not running:
+                        break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                with self._lock:
+                    for future in done:
+                        node = running.pop(future)
+                        running_per_agent[node["agent"]] -= 1
+                        try:
+                            node["result"] = future.result()
+                            node["state"] = FAILED if node["result"] is False else DONE
+                        except Exception as e:
+                            node["result"] = e
+                            node["state"] = FAILED
+                            log(f"❌ {node['id']}: {e}")
+        summary = {}
+        for node in self.nodes.values():
+            summary[node["state"]] = summary.get(node["state"], 0) + 1
+        log(f"🏁 DAG abgearbeitet: {summary}")
+        return {node_id: node["state"] for node_id, node in self.nodes.items()}
+
+
+def issue_priority(labels):
+    """prio1..prio3 aus den Labels, ohne Label 3."""
+    for level in (1, 2, 3):
+        if f"prio{level}" in labels:
+            return level
+    return 3
+
+def add_issue_steps(scheduler, steps, run_step, group, after=()):
+    """
+    Hängt Agenten-Schritte für Issues als Knoten an.
+    :param steps: Liste von {"agent", "issue_number", "labels", "depends_on": [Issue-Nummern]}
+    :param run_step: Funktion(step) → Erfolg; wird pro Knoten aufgerufen, step enthält zusätzlich
+                     "node_id" und "deps" (Knoten-IDs der Vorgänger)
+    :param group: Schritte derselben Gruppe (z. B. ein Feature) bekommen die AGENT_AFTER-Abhängigkeiten
+    :param after: Knoten, die vor allen Schritten erledigt sein müssen
+    :return: die angelegten Knoten-IDs
+    """
+    node_ids = {}
+    for step in steps:
+        node_id = f"{step['agent']}#{step['issue_number']}"
+        node_ids.setdefault(step["issue_number"], []).append((step["agent"], node_id))
+    created = []
+    for step in steps:
+        node_id = f"{step['agent']}#{step['issue_number']}"
+        deps = set(after)
+        for number in step.get("depends_on") or []:
+            deps.update(other for _, other in node_ids.get(number, []))
+        for agent, other in (o for entries in node_ids.values() for o in entries):
+            if agent in AGENT_AFTER.get(step["agent"], ()):
+                deps.add(other)
+        deps.discard(node_id)
+        step = dict(step, node_id=node_id, deps=sorted(deps))
+        if scheduler.add(node_id, step["agent"], lambda step=step: run_step(step), deps,
+                         priority=issue_priority(step.get("labels", [])), group=group, step=step):
+            created.append(node_id)
+    return created
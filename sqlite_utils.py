@@ -0,0 +1,41 @@
+"""
+Gemeinsame SQLite-Hilfen: Verbindungen im WAL-Modus (gleichzeitige Leser, ein Schreiber,
+auch über Prozesse hinweg) und Transaktionen, die bei einer Exception zurückgerollt werden.
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
+
+def connect(path, timeout=SQLITE_BUSY_TIMEOUT):
+    """
+    Öffnet die Datenbank im Autocommit-Modus – Transaktionen nur über transaction().
+    Die Verbindung darf aus mehreren Threads benutzt werden; den Zugriff muss der Aufrufer
+    serialisieren (z. B. mit einem Lock).
+    """
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Im WAL-Modus reicht NORMAL: nach einem Absturz fehlen höchstens die letzten Commits
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+@contextmanager
+def transaction(conn, immediate=True):
+    """
+    :param immediate: Schreibsperre gleich zu Beginn holen – verhindert, dass zwei Prozesse
+                      erst lesen und dann beim Schreiben aneinander scheitern
+    """
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
@@ -0,0 +1,366 @@
+"""
+Dauerhafte Arbeitswarteschlange (SQLite, WAL): jede Aufgabe – Feature-Planung, Agenten-Schritt,
+Planungsrunde – wird mit Zustand, Versuchen und Ergebnis festgehalten.
+
+Ein neu gestarteter setup_project überspringt, was schon erledigt ist, und setzt dort fort, wo
+der letzte Lauf stehen geblieben ist. Aufgaben werden per Lease vergeben: mehrere Prozesse
+(z. B. zusätzliche queue_worker.py) können aus derselben Warteschlange arbeiten, ohne eine
+Aufgabe doppelt auszuführen. Stirbt ein Prozess, läuft sein Lease ab und ein anderer übernimmt.
+
+    python task_queue.py status <repo>
+    python task_queue.py reset <repo> [--failed]
+"""
+
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+from contextlib import contextmanager
+from sqlite_utils import connect, transaction
+
+TASK_QUEUE_DB = os.getenv("TASK_QUEUE_DB", ".task_queue.db")
+TASK_LEASE_SECONDS = float(os.getenv("TASK_LEASE_SECONDS", "600"))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "2"))
+TASK_WAIT_POLL = float(os.getenv("TASK_WAIT_POLL", "2"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    queue TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    deps TEXT NOT NULL DEFAULT '[]',
+    priority INTEGER NOT NULL DEFAULT 3,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (queue, task_id)
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (queue, state, priority, created_at);
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    worker TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    state TEXT NOT NULL,
+    error TEXT
+);
+"""
+
+
+def log(msg):
+    print(f"📥 [task_queue] {msg}")
+
+def _owner_alive(owner):
+    """Leases von abgestürzten Prozessen auf diesem Rechner nicht erst ablaufen lassen."""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True  # fremder Rechner: nur das Lease-Ende zählt
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+def _task(row):
+    if row is None:
+        return None
+    task = dict(row)
+    task["payload"] = json.loads(task["payload"])
+    task["deps"] = json.loads(task["deps"])
+    task["result"] = json.loads(task["result"]) if task["result"] is not None else None
+    return task
+
+
+class TaskQueue:
+    def __init__(self, path=TASK_QUEUE_DB, lease_seconds=TASK_LEASE_SECONDS, max_attempts=TASK_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = connect(path)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    def enqueue(self, queue, task_id, agent, payload=None, deps=(), priority=3):
+        """
+        Legt eine Aufgabe an, falls es sie noch nicht gibt (idempotent – beim Fortsetzen
+        bleiben Zustand und Ergebnis erhalten).
+        :return: True, wenn die Aufgabe neu ist
+        """
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO tasks (queue, task_id, agent, payload, deps, priority, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (queue, task_id, agent, json.dumps(payload or {}, ensure_ascii=False),
+                 json.dumps(sorted(deps)), priority, now, now),
+            )
+            return cur.rowcount == 1
+
+    def get(self, queue, task_id):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM tasks WHERE queue = ? AND task_id = ?", (queue, task_id)).fetchone()
+        return _task(row)
+
+    def _leasable(self, row, now):
+        if row["state"] == PENDING:
+            return True
+        # Abgelaufene Leases zählen nicht als Fehlversuch – der Prozess ist weg, nicht die Aufgabe kaputt
+        return row["state"] == LEASED and (row["lease_until"] < now or not _owner_alive(row["lease_owner"]))
+
+    def _claim(self, row, worker, now):
+        if row["state"] == LEASED:
+            log(f"♻️ {row['task_id']}: Lease von {row['lease_owner']} übernommen")
+            self.conn.execute(
+                "UPDATE attempts SET state = 'abandoned', finished_at = ? "
+                "WHERE queue = ? AND task_id = ? AND state = 'running'",
+                (now, row["queue"], row["task_id"]),
+            )
+            attempts = row["attempts"]
+        else:
+            attempts = row["attempts"] + 1
+        self.conn.execute(
+            "UPDATE tasks SET state = ?, attempts = ?, lease_owner = ?, lease_until = ?, updated_at = ? "
+            "WHERE queue = ? AND task_id = ?",
+            (LEASED, attempts, worker, now + self.lease_seconds, now, row["queue"], row["task_id"]),
+        )
+        self.conn.execute(
+            "INSERT INTO attempts (queue, task_id, attempt, worker, started_at, state) VALUES (?, ?, ?, ?, ?, 'running')",
+            (row["queue"], row["task_id"], attempts, worker, now),
+        )
+
+    def lease_task(self, queue, task_id, worker=WORKER_ID):
+        """
+        Versucht, genau diese Aufgabe zu übernehmen.
+        :return: (Status, Aufgabe) – Status "acquired", "done", "failed", "busy" (anderer Prozess)
+                 oder "missing"
+        """
+        now = time.time()
+        with self._lock, transaction(self.conn):
+            row = self.conn.execute("SELECT * FROM tasks WHERE queue = ? AND task_id = ?", (queue, task_id)).fetchone()
+            if row is None:
+                return "missing", None
+            if row["state"] in (DONE, FAILED):
+                return row["state"], _task(row)
+            if row["state"] == LEASED and row["lease_owner"] == worker:
+                return "acquired", _task(row)
+            if not self._leasable(row, now):
+                return "busy", _task(row)
+            self._claim(row, worker, now)
+        return "acquired", self.get(queue, task_id)
+
+    def lease(self, queue, worker=WORKER_ID, agents=None):
+        """
+        Nächste bereite Aufgabe (alle Vorgänger erledigt) nach Priorität und Alter.
+        :param agents: nur Aufgaben dieser Agenten
+        :return: Aufgabe oder None
+        """
+        now = time.time()
+        with self._lock, transaction(self.conn):
+            rows = self.conn.execute(
+                "SELECT * FROM tasks WHERE queue = ? AND state IN (?, ?) ORDER BY priority, created_at",
+                (queue, PENDING, LEASED),
+            ).fetchall()
+            if not rows:
+                return None
+            done = {r["task_id"] for r in self.conn.execute(
+                "SELECT task_id FROM tasks WHERE queue = ? AND state = ?", (queue, DONE))}
+            for row in rows:
+                if agents and row["agent"] not in agents:
+                    continue
+                if not self._leasable(row, now) or not set(json.loads(row["deps"])) <= done:
+                    continue
+                self._claim(row, worker, now)
+                task_id = row["task_id"]
+                break
+            else:
+                return None
+        return self.get(queue, task_id)
+
+    def heartbeat(self, queue, task_id, worker=WORKER_ID):
+        """Verlängert das Lease. :return: False, wenn es inzwischen ein anderer Prozess hält"""
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE tasks SET lease_until = ?, updated_at = ? "
+                "WHERE queue = ? AND task_id = ? AND state = ? AND lease_owner = ?",
+                (time.time() + self.lease_seconds, time.time(), queue, task_id, LEASED, worker),
+            )
+            return cur.rowcount == 1
+
+    def _finish(self, queue, task_id, worker, state, result=None, error=None):
+        now = time.time()
+        with self._lock, transaction(self.conn):
+            cur = self.conn.execute(
+                "UPDATE tasks SET state = ?, result = ?, error = ?, lease_owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE queue = ? AND task_id = ? AND state = ? AND lease_owner = ?",
+                (state, None if result is None else json.dumps(result, ensure_ascii=False), error, now,
+                 queue, task_id, LEASED, worker),
+            )
+            if cur.rowcount != 1:
+                log(f"⚠️ {task_id}: Lease verloren – Ergebnis von {worker} verworfen")
+                return False
+            self.conn.execute(
+                "UPDATE attempts SET state = ?, finished_at = ?, error = ? "
+                "WHERE queue = ? AND task_id = ? AND worker = ? AND state = 'running'",
+                (DONE if state == DONE else FAILED, now, error, queue, task_id, worker),
+            )
+            return True
+
+    def complete(self, queue, task_id, worker=WORKER_ID, result=None):
+        """:param result: JSON-serialisierbar; wird beim Fortsetzen statt einer Neuausführung zurückgegeben"""
+        return self._finish(queue, task_id, worker, DONE, result=result)
+
+    def fail(self, queue, task_id, worker=WORKER_ID, error=None):
+        """Fehlversuch: zurück in die Warteschlange, bis TASK_MAX_ATTEMPTS erreicht ist. :return: neuer Zustand"""
+        task = self.get(queue, task_id)
+        state = FAILED if task and task["attempts"] >= self.max_attempts else PENDING
+        self._finish(queue, task_id, worker, state, error=error)
+        return state
+
+    @contextmanager
+    def hold(self, queue, task_id, worker=WORKER_ID):
+        """Hält das Lease während langer Agenten-Läufe am Leben."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.heartbeat(queue, task_id, worker):
+                    return
+
+        thread = threading.Thread(target=beat, name=f"lease-{task_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def wait(self, queue, task_id, timeout=None, poll=TASK_WAIT_POLL):
+        """
+        Wartet, bis ein anderer Prozess die Aufgabe abgeschlossen hat – oder bis sie wieder
+        übernommen werden kann (Lease abgelaufen bzw. Prozess beendet).
+        :return: Aufgabe
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            task = self.get(queue, task_id)
+            if task is None or task["state"] in (DONE, FAILED, PENDING) or self._leasable(task, time.time()):
+                return task
+            if deadline is not None and time.time() >= deadline:
+                return task
+            time.sleep(poll)
+
+    def run(self, queue, task_id, agent, func, payload=None, deps=(), priority=3, worker=WORKER_ID):
+        """
+        Führt func() höchstens einmal erfolgreich aus: Erledigtes wird übersprungen (gespeichertes
+        Ergebnis), eine Aufgabe in Arbeit bei einem anderen Prozess wird abgewartet.
+        Ein Rückgabewert False oder eine Exception zählt als Fehlversuch.
+        :return: Ergebnis von func() bzw. das gespeicherte Ergebnis; False bei Fehlschlag
+        """
+        self.enqueue(queue, task_id, agent, payload, deps, priority)
+        while True:
+            status, task = self.lease_task(queue, task_id, worker)
+            if status == "missing":
+                # zwischenzeitlich zurückgesetzt (reset/forget): neu anlegen
+                self.enqueue(queue, task_id, agent, payload, deps, priority)
+                continue
+            if status == "busy":
+                log(f"⏳ {task_id} läuft bei {task['lease_owner']} – warte")
+                task = self.wait(queue, task_id)
+                if task is None or task["state"] in (PENDING, LEASED):
+                    continue  # der andere Prozess ist gescheitert oder weg: selbst versuchen
+                status = task["state"]
+            if status == DONE:
+                log(f"⏭️ {task_id} bereits erledigt")
+                return True if task["result"] is None else task["result"]
+            if status == FAILED:
+                log(f"⛔ {task_id} nach {task['attempts']} Versuch(en) aufgegeben: {task['error']}")
+                return False
+            break
+
+        try:
+            with self.hold(queue, task_id, worker):
+                result = func()
+        except Exception as e:
+            self.fail(queue, task_id, worker, str(e))
+            raise
+        if result is False:
+            self.fail(queue, task_id, worker, "Agent meldete Fehlschlag")
+            return False
+        self.complete(queue, task_id, worker, None if result is True else result)
+        return result
+
+    def summary(self, queue):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT state, COUNT(*) AS n FROM tasks WHERE queue = ? GROUP BY state", (queue,)).fetchall()
+        return {r["state"]: r["n"] for r in rows}
+
+    def tasks(self, queue):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM tasks WHERE queue = ? ORDER BY created_at", (queue,)).fetchall()
+        return [_task(r) for r in rows]
+
+    def forget(self, queue, task_id):
+        """Entfernt eine einzelne Aufgabe, z. B. einen leeren Plan, der beim Fortsetzen neu entstehen soll."""
+        with self._lock, transaction(self.conn):
+            self.conn.execute("DELETE FROM attempts WHERE queue = ? AND task_id = ?", (queue, task_id))
+            self.conn.execute("DELETE FROM tasks WHERE queue = ? AND task_id = ?", (queue, task_id))
+
+    def reset(self, queue, states=None):
+        """Löscht Aufgaben (alle oder nur in den angegebenen Zuständen), z. B. für einen Neustart."""
+        states = list(states or (PENDING, LEASED, DONE, FAILED))
+        marks = ", ".join("?" * len(states))
+        with self._lock, transaction(self.conn):
+            ids = [r["task_id"] for r in self.conn.execute(
+                f"SELECT task_id FROM tasks WHERE queue = ? AND state IN ({marks})", (queue, *states))]
+            self.conn.executemany("DELETE FROM attempts WHERE queue = ? AND task_id = ?", [(queue, i) for i in ids])
+            self.conn.execute(f"DELETE FROM tasks WHERE queue = ? AND state IN ({marks})", (queue, *states))
+        return len(ids)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_task_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = TaskQueue()
+        return _queue
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dauerhafte Arbeitswarteschlange anzeigen oder zurücksetzen")
+    parser.add_argument("command", choices=["status", "reset"])
+    parser.add_argument("repo")
+    parser.add_argument("--failed", action="store_true", help="reset: nur fehlgeschlagene Aufgaben löschen")
+    args = parser.parse_args()
+
+    task_queue = get_task_queue()
+    if args.command == "status":
+        for task in task_queue.tasks(args.repo):
+            owner = f" ({task['lease_owner']})" if task["lease_owner"] else ""
+            error = f" – {task['error']}" if task["error"] else ""
+            print(f"{task['state']:<8} {task['attempts']}× {task['task_id']}{owner}{error}")
+        log(f"{args.repo}: {task_queue.summary(args.repo)}")
+    else:
+        removed = task_queue.reset(args.repo, [FAILED] if args.failed else None)
+        log(f"{removed} Aufgabe(n) aus {args.repo} entfernt")
@@ -0,0 +1,136 @@
+"""
+Leichtgewichtiges Tracing im Prozess: verschachtelte Spans (Manager → Feature → Runde →
+Planschritt → Agent → LLM/GitHub) mit Export im Chrome-Trace-Event-Format.
+
+Die Datei lässt sich in chrome://tracing oder https://ui.perfetto.dev als Zeitleiste öffnen.
+Der aktuelle Span steht in einer ContextVar; asyncio.to_thread übernimmt ihn automatisch,
+für eigene Thread-Pools muss der Kontext mit contextvars.copy_context() mitgegeben werden.
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") != "0"
+TRACE_DIR = os.getenv("TRACE_DIR", "logs/traces")
+TRACE_MAX_EVENTS = int(os.getenv("TRACE_MAX_EVENTS", "500000"))
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def log(msg):
+    print(f"🧵 [tracing] {msg}")
+
+
+class Tracer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = []
+        self.dropped = 0
+        self.exported = 0
+        self.threads = {}  # threading.get_ident() -> (tid, name)
+        self.origin = time.perf_counter()
+        self.started = datetime.now()
+        self.pid = os.getpid()
+
+    def _tid(self):
+        ident = threading.get_ident()
+        if ident not in self.threads:
+            self.threads[ident] = (len(self.threads) + 1, threading.current_thread().name)
+        return self.threads[ident][0]
+
+    def now_us(self):
+        return (time.perf_counter() - self.origin) * 1_000_000
+
+    def add(self, name, category, start_us, args):
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round(start_us, 1),
+            "dur": round(self.now_us() - start_us, 1),
+            "pid": self.pid,
+            "args": args,
+        }
+        with self._lock:
+            event["tid"] = self._tid()
+            if len(self.events) >= TRACE_MAX_EVENTS:
+                self.dropped += 1
+                return
+            self.events.append(event)
+
+    def export(self, path=None):
+        """Schreibt alle bisherigen Spans als JSON-Objekt mit "traceEvents"."""
+        path = path or os.path.join(TRACE_DIR, f"trace_{self.started.strftime('%Y%m%d_%H%M%S')}.json")
+        with self._lock:
+            metadata = [
+                {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self.threads.values()
+            ]
+            events = metadata + sorted(self.events, key=lambda e: e["ts"])
+            dropped = self.dropped
+            self.exported = len(self.events)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        if dropped:
+            log(f"⚠️ {dropped} Spans verworfen (TRACE_MAX_EVENTS={TRACE_MAX_EVENTS})")
+        return path
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    return _tracer
+
+def current_span():
+    """Das Dict des aktuell offenen Spans (oder None) – z. B. um nachträglich args zu ergänzen."""
+    return _current_span.get()
+
+@contextmanager
+def span(name, category=None, **args):
+    """
+    Öffnet einen Span als Kind des aktuellen Spans.
+    :param category: Gruppierung in der Zeitleiste; Standard ist der Teil vor dem ersten Punkt
+    :param args: beliebige Zusatzinfos (Agent, Issue-Nummer, Modell, …), landen in "args"
+    """
+    if not TRACE_ENABLED:
+        yield {}
+        return
+    parent = _current_span.get()
+    current = {"name": name, "args": dict(args)}
+    if parent is not None:
+        current["args"]["parent"] = parent["name"]
+    token = _current_span.set(current)
+    start_us = _tracer.now_us()
+    try:
+        yield current["args"]
+    except Exception as e:
+        current["args"]["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        _tracer.add(name, category or name.split(".")[0], start_us, current["args"])
+
+def write_trace(path=None):
+    if not TRACE_ENABLED or len(_tracer.events) == _tracer.exported:
+        return None
+    path = _tracer.export(path)
+    log(f"🗺️ Trace mit {len(_tracer.events)} Spans geschrieben: {path}")
+    return path
+
+@atexit.register
+def _export_on_exit():
+    # Auch bei Abbruch mitten im Lauf soll die bisherige Zeitleiste erhalten bleiben
+    try:
+        write_trace()
+    except OSError:
+        pass
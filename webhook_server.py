@@ -0,0 +1,80 @@
+"""
+Lokaler Webhook-Empfänger für GitHub (FastAPI).
+
+Nimmt issues-, issue_comment-, push- und workflow_run-Ereignisse unter POST /webhook entgegen,
+prüft die Signatur (GITHUB_WEBHOOK_SECRET), protokolliert das Rohereignis für replay_events
+und legt die übersetzten Arbeitseinträge in die event_queue.
+
+Der Manager startet den Empfänger mit WEBHOOK_ENABLED=1 selbst in einem Hintergrund-Thread.
+Damit GitHub ihn erreicht, braucht es eine Weiterleitung (z. B. smee.io oder einen Tunnel)
+auf http://WEBHOOK_HOST:WEBHOOK_PORT/webhook. Eigenständig (python webhook_server.py) gibt
+er die Arbeitseinträge nur aus – praktisch zusammen mit replay_events.
+"""
+
+import os
+import hmac
+import json
+import hashlib
+import threading
+import uvicorn
+from fastapi import FastAPI, Request, Header, HTTPException
+from event_queue import get_event_queue, record_event
+
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8787"))
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")
+
+app = FastAPI(title="KI-Firma Webhook-Empfänger")
+
+
+def log(msg):
+    print(f"🪝 [webhook_server] {msg}")
+
+def sign(body, secret=GITHUB_WEBHOOK_SECRET):
+    """Wert für X-Hub-Signature-256 (auch von replay_events benutzt)."""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "received": get_event_queue().received}
+
+@app.post("/webhook", status_code=202)
+async def webhook(
+    request: Request,
+    x_github_event: str = Header(...),
+    x_github_delivery: str = Header(None),
+    x_hub_signature_256: str = Header(None),
+):
+    body = await request.body()
+    if GITHUB_WEBHOOK_SECRET and not hmac.compare_digest(x_hub_signature_256 or "", sign(body)):
+        raise HTTPException(status_code=401, detail="Ungültige Signatur")
+    if x_github_event == "ping":
+        return {"status": "pong"}
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Kein gültiges JSON")
+
+    record_event(x_github_event, x_github_delivery, payload)
+    work = get_event_queue().submit(x_github_event, payload, x_github_delivery)
+    for item in work:
+        log(f"📥 {x_github_event} → {item['type']} ({item['repo']}"
+            + (f" #{item['issue_number']})" if item.get("issue_number") else ")"))
+    return {"queued": len(work)}
+
+
+def start_webhook_server(host=WEBHOOK_HOST, port=WEBHOOK_PORT):
+    """Startet den Empfänger in einem Daemon-Thread und gibt den uvicorn-Server zurück."""
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="webhook-server", daemon=True)
+    thread.start()
+    log(f"👂 Lausche auf http://{host}:{port}/webhook")
+    if not GITHUB_WEBHOOK_SECRET:
+        log("⚠️ GITHUB_WEBHOOK_SECRET ist nicht gesetzt – Signaturen werden nicht geprüft.")
+    return server
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
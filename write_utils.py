@@ -1,9 +1,27 @@
 import os
-from github_utils import push_file_to_repo
+import threading
+from commit_batcher import stage_file
+from github_utils import get_file_from_repo
+from local_git import local_mode, get_working_copy
+from repo_index import update_repo_index
+
+_file_locks = {}
+_file_locks_lock = threading.Lock()
+
+def file_lock(local_repo_path: str, rel_path: str):
+    """
+    Sperre für Dateien, die komplett neu erzeugt werden (lesen → generieren → schreiben), z. B.
+    docs/api_docs.md und README.md. Parallel laufende Agenten würden sich sonst gegenseitig
+    überschreiben.
+    """
+    key = os.path.abspath(os.path.join(local_repo_path, rel_path))
+    with _file_locks_lock:
+        return _file_locks.setdefault(key, threading.Lock())
 
 def write_and_commit_file(repo_name: str, local_repo_path: str, rel_path: str, content: str, commit_message: str = None):
     """
-    Speichert die Datei lokal im Projekt und pusht sie ins GitHub-Repository.
+    Speichert die Datei lokal im Projekt und merkt sie für den nächsten gebündelten Commit vor
+    (siehe commit_batcher; veröffentlicht wird spätestens mit flush_commits()).
 
     :param repo_name: Name des GitHub-Repos
     :param local_repo_path: Lokaler Pfad des Projekts
@@ -19,7 +37,18 @@ def write_and_commit_file(repo_name: str, local_repo_path: str, rel_path: str, c
     with open(full_path, "w", encoding="utf-8") as f:
         f.write(content)
 
-    # Push an GitHub
-    push_file_to_repo(repo_name, rel_path, content, commit_message or f"📝 Update {rel_path}")
+    # Suchindex inkrementell nachziehen
+    update_repo_index(local_repo_path, rel_path)
+
+    # Für den nächsten Commit vormerken
+    stage_file(repo_name, rel_path, content, commit_message or f"📝 Update {rel_path}", local_repo_path)
 
     return full_path
+
+def read_repo_file(repo_name: str, local_repo_path: str, rel_path: str):
+    """
+    Liest eine Datei des Projekts – im lokalen Git-Modus aus der Arbeitskopie, sonst über die API.
+    """
+    if local_mode():
+        return get_working_copy(repo_name, local_repo_path).read_file(rel_path)
+    return get_file_from_repo(repo_name, rel_path)